@@ -33,6 +33,9 @@ if not VERIFICATION_GROUP_ID:
 # Database
 DB_FILE = 'data/cargo.db'
 
+# FSM holatlari (alohida fayl - asosiy baza writer navbatiga tushmaydi)
+FSM_DB_FILE = 'data/fsm.db'
+
 # Template rasmlar
 PASSPORT_TEMPLATE = 'templates/pasport raqam.jpg'
 PINFL_TEMPLATE = 'templates/pinfluz.jpg'
@@ -47,11 +50,79 @@ FEEDBACK_FILE = 'data/feedback.txt'
 # Log fayl
 LOG_FILE = 'logs/bot.log'
 
+# ==================== DATABASE SOZLAMALARI ====================
+
+# O'qish uchun doimiy ulanishlar soni (yozish uchun bitta alohida ulanish)
+DB_READER_POOL_SIZE = 4
+
+# Har bir ulanish uchun PRAGMA qiymatlari
+DB_CACHE_SIZE_KB = 16384              # Sahifa keshi (KB)
+DB_MMAP_SIZE = 128 * 1024 * 1024      # Memory-mapped I/O (bayt)
+DB_BUSY_TIMEOUT_MS = 5000             # Lock kutish vaqti (ms)
+
+# Group commit: yozish so'rovlari shu oyna ichida bitta tranzaksiyaga yig'iladi
+DB_GROUP_COMMIT_WINDOW_MS = 3
+DB_GROUP_COMMIT_MAX_BATCH = 256
+
+# Foydalanuvchilar keshi (telegram_id va id bo'yicha, har bir update da so'raladi)
+USER_CACHE_SIZE = 10000
+USER_CACHE_TTL = 300                  # Soniya - keshni chetlab o'zgargan qator shuncha vaqtda yangilanadi
+USER_CACHE_MISS_TTL = 30              # Ro'yxatdan o'tmagan telegram_id eslab qolinadigan vaqt
+
+# FSM holatlari: 'sqlite' - qayta ishga tushganda saqlanadi, 'memory' - faqat xotirada (cheklangan)
+FSM_STORAGE = 'sqlite'
+FSM_FLUSH_INTERVAL = 1.0              # sqlite: xotiradagi o'zgarishlar shu oraliqda bitta tranzaksiyada yoziladi
+FSM_MEMORY_MAX_KEYS = 50000           # memory: kalitlar chegarasi (eng uzoq ishlatilmagani chiqariladi)
+FSM_STATE_TTL = 7 * 24 * 3600         # Shuncha vaqt ishlatilmagan holat (tashlab ketilgan ro'yxat) o'chiriladi
+
+# Yuklar importi: fayldan o'qiladigan va executemany ga beriladigan bo'lak hajmi (qatorlar)
+SHIPMENT_IMPORT_CHUNK_SIZE = 5000
+
+# Foydalanuvchilar importi: fayldan bir martada o'qiladigan qatorlar
+USER_IMPORT_CHUNK_SIZE = 1000
+
+# Fayllarni o'qish va tekshirish alohida jarayonda (event loop bloklanmaydi)
+IMPORT_WORKER_PROCESSES = 1           # Hisobot yozish uchun process pool hajmi
+IMPORT_WORKER_QUEUE_SIZE = 4          # Worker oldindan tayyorlab qo'yadigan bo'laklar soni
+
+# Import ishlari navbati (import_jobs jadvali)
+IMPORT_JOB_WORKERS = 1                # Bir vaqtda bajariladigan importlar soni
+IMPORT_CHECKPOINT_ROWS = 5000         # Har shuncha qatordan keyin holat saqlanadi (qayta ishga tushsa davom etadi)
+IMPORT_PROGRESS_INTERVAL = 3.0        # Progress xabarini tahrirlash oralig'i (soniya)
+IMPORT_FILES_DIR = 'data/imports'     # Navbatdagi import fayllari (ish tugaguncha saqlanadi)
+
+# Yuklangan fayllar shu hajmgacha xotirada qoladi (diskka yozilmaydi).
+# Kattaroqlari IMPORT_FILES_DIR ga yoziladi - bot qayta ishga tushsa ham davom ettiriladi
+IMPORT_MEMORY_MAX_BYTES = 10 * 1024 * 1024
+
+# Xato qatorlar hisoboti: 'xlsx' yoki 'csv' (CSV ancha tez yoziladi)
+IMPORT_REPORT_FORMAT = 'xlsx'
+IMPORT_REPORT_XLSX_MAX_ROWS = 20000   # Bundan ko'p xato qator bo'lsa hisobot baribir CSV
+
+# Broadcast fonda yuboriladi, har bir qabul qiluvchining holati saqlanadi (qayta ishga tushsa davom etadi)
+BROADCAST_RATE = 28                   # Xabar/soniya - Telegram umumiy chegarasi ~30
+BROADCAST_CONCURRENCY = 20            # Bir vaqtda kutilayotgan sendMessage so'rovlari
+BROADCAST_BATCH_SIZE = 500            # Qabul qiluvchilar bazadan shu bo'laklarda o'qiladi
+BROADCAST_PROGRESS_INTERVAL = 5.0     # Progress xabarini tahrirlash oralig'i (soniya)
+
+# Barcha chiquvchi xabarlar OutboundMiddleware orqali: umumiy va har bir chat uchun token bucket
+OUTBOUND_GLOBAL_RATE = 30             # Xabar/soniya - butun bot
+OUTBOUND_PRIVATE_RATE = 1.0           # Shaxsiy chat: xabar/soniya
+OUTBOUND_PRIVATE_BURST = 3            # Shaxsiy chatga ketma-ket darhol ketadigan xabarlar
+OUTBOUND_GROUP_RATE = 20 / 60         # Guruh (VERIFICATION_GROUP_ID va h.k.): 20 xabar/daqiqa
+OUTBOUND_GROUP_BURST = 5
+OUTBOUND_CHAT_BUCKETS = 10000         # Xotirada saqlanadigan chat bucket lari (eng eskisi o'chiriladi)
+OUTBOUND_RETRY_ATTEMPTS = 3           # RetryAfter dan keyin qayta urinishlar
+OUTBOUND_MAX_RETRY_AFTER = 60         # Bundan uzoq kutish kerak bo'lsa - xato qaytariladi
+
 
 
 
 # ==================== BOT KONSTANTALARI ====================
 
+# Ro'yxat javoblari (yuklar, foydalanuvchilar) kartalar bir nechta xabarga jamlanadi
+MY_SHIPMENTS_PAGE_SIZE = 10           # "Mening yuklarim" - bitta sahifadagi yuklar
+
 # Client code boshlang'ich qiymati
 CLIENT_CODE_START = 600
 CLIENT_CODE_PREFIX = "AKB"
@@ -110,6 +181,7 @@ def ensure_directories():
     directories = [
         'data',
         'data/passport_photos',
+        IMPORT_FILES_DIR,
         'templates',
         'logs'
     ]
@@ -0,0 +1,157 @@
+"""
+Foydalanuvchilar keshi - har bir update da so'raladigan users qatorlari xotirada
+"""
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from config import DB_FILE, USER_CACHE_MISS_TTL, USER_CACHE_SIZE, USER_CACHE_TTL
+
+MISSING = object()  # Keshda yo'q (None - bazada yo'q)
+
+
+class UserCache:
+    """
+    LRU + TTL kesh: id va telegram_id bo'yicha
+
+    Har bir foydalanuvchi bitta yozuv (id bo'yicha), telegram_id undan
+    indeks orqali topiladi - bitta invalidatsiya ikkala kalitni ham tozalaydi.
+    Ro'yxatdan o'tmagan telegram_id ham qisqa muddat (USER_CACHE_MISS_TTL)
+    eslab qolinadi: /start bosgan yangi foydalanuvchi har xabarda bazaga
+    so'rov yubormaydi.
+
+    Bazadan o'qish va invalidatsiya bir vaqtda bo'lsa, eskirgan qator
+    keshga yozilmasligi uchun generation ishlatiladi: o'qishdan oldin
+    olinadi, put() da o'zgarmagan bo'lsa yoziladi.
+    """
+
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL,
+                 miss_ttl: float = USER_CACHE_MISS_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self._rows: 'OrderedDict[int, Tuple[float, Dict]]' = OrderedDict()
+        self._ids_by_telegram: Dict[int, int] = {}
+        self._missing: 'OrderedDict[int, float]' = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    # ==================== O'QISH ====================
+
+    def get_by_id(self, user_id: int):
+        """Keshdagi qator nusxasi yoki MISSING"""
+        entry = self._rows.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._drop(user_id)
+            self.misses += 1
+            return MISSING
+
+        self._rows.move_to_end(user_id)
+        self.hits += 1
+        return dict(entry[1])
+
+    def get_by_telegram_id(self, telegram_id: int):
+        """Keshdagi qator nusxasi, None (ro'yxatdan o'tmagan) yoki MISSING"""
+        expires = self._missing.get(telegram_id)
+        if expires is not None:
+            if expires >= time.monotonic():
+                self.hits += 1
+                return None
+            del self._missing[telegram_id]
+
+        user_id = self._ids_by_telegram.get(telegram_id)
+        if user_id is None:
+            self.misses += 1
+            return MISSING
+        return self.get_by_id(user_id)
+
+    # ==================== YOZISH ====================
+
+    def put(self, row: Dict, generation: int):
+        """Bazadan o'qilgan qatorni saqlash (o'qish davomida invalidatsiya bo'lmagan bo'lsa)"""
+        if generation != self.generation:
+            return
+
+        self._drop(row['id'])
+        self._rows[row['id']] = (time.monotonic() + self.ttl, dict(row))
+        if row.get('telegram_id') is not None:
+            self._missing.pop(row['telegram_id'], None)
+            self._ids_by_telegram[row['telegram_id']] = row['id']
+
+        while len(self._rows) > self.maxsize:
+            self._drop(next(iter(self._rows)))
+
+    def put_missing(self, telegram_id: int, generation: int):
+        """telegram_id bo'yicha faol foydalanuvchi yo'q"""
+        if generation != self.generation:
+            return
+
+        self._missing[telegram_id] = time.monotonic() + self.miss_ttl
+        self._missing.move_to_end(telegram_id)
+        while len(self._missing) > self.maxsize:
+            self._missing.popitem(last=False)
+
+    def invalidate(self, user_id: Optional[int] = None, telegram_id: Optional[int] = None):
+        """Foydalanuvchi o'zgarganda (ikkala kalit bo'yicha ham)"""
+        self.generation += 1
+        if telegram_id is not None:
+            self._missing.pop(telegram_id, None)
+            user_id_by_telegram = self._ids_by_telegram.get(telegram_id)
+            if user_id_by_telegram is not None:
+                self._drop(user_id_by_telegram)
+        if user_id is not None:
+            self._drop(user_id)
+
+    def clear(self):
+        """Ko'p qator o'zgarganda (import, o'chirish)"""
+        self.generation += 1
+        self._rows.clear()
+        self._ids_by_telegram.clear()
+        self._missing.clear()
+
+    def _drop(self, user_id: int):
+        entry = self._rows.pop(user_id, None)
+        if entry is not None:
+            telegram_id = entry[1].get('telegram_id')
+            if self._ids_by_telegram.get(telegram_id) == user_id:
+                del self._ids_by_telegram[telegram_id]
+
+    # ==================== STATISTIKA ====================
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._rows),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+_caches: Dict[str, UserCache] = {}
+
+
+def get_user_cache(db_path: str = DB_FILE) -> UserCache:
+    """Fayl bo'yicha umumiy kesh (har bir handler moduli o'z DatabaseManager iga ega)"""
+    cache = _caches.get(db_path)
+    if cache is None:
+        cache = UserCache()
+        _caches[db_path] = cache
+    return cache
+
+
+if __name__ == "__main__":
+    # Tezlik: python -m database.cache
+    import random
+
+    cache = UserCache(maxsize=10_000)
+    for i in range(10_000):
+        cache.put({'id': i, 'telegram_id': 1_000_000 + i, 'fullname': 'X'}, cache.generation)
+
+    started = time.perf_counter()
+    for _ in range(200_000):
+        cache.get_by_telegram_id(1_000_000 + random.randrange(12_000))
+    elapsed = time.perf_counter() - started
+    print(f"200000 o'qish: {elapsed * 1000:.0f} ms, {cache.stats()}")
@@ -0,0 +1,111 @@
+"""
+Client code ketma-ketligi - AKB600, AKB601, ... kodlarni atomik berish
+"""
+import logging
+from typing import Optional
+
+import aiosqlite
+
+from config import CLIENT_CODE_PREFIX, CLIENT_CODE_START
+
+logger = logging.getLogger(__name__)
+
+
+def parse_client_code_number(code: Optional[str]) -> Optional[int]:
+    """
+    Client code dan raqam qismini ajratish
+    'akb601' -> 601, 'XYZ12' -> None
+    """
+    if not code:
+        return None
+
+    code = str(code).strip().upper()
+    if not code.startswith(CLIENT_CODE_PREFIX):
+        return None
+
+    number = code[len(CLIENT_CODE_PREFIX):]
+    return int(number) if number.isdigit() else None
+
+
+def format_client_code(number: int) -> str:
+    """601 -> 'AKB601'"""
+    return f"{CLIENT_CODE_PREFIX}{number:03d}"
+
+
+async def seed_client_code_seq(db: aiosqlite.Connection):
+    """
+    Ketma-ketlik jadvalini yaratish va mavjud eng katta koddan boshlash
+    (faqat birinchi marta - migratsiya vaqtida)
+    """
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS client_code_seq (
+            prefix TEXT PRIMARY KEY,
+            next_value INTEGER NOT NULL
+        )
+    ''')
+
+    async with db.execute(
+        'SELECT 1 FROM client_code_seq WHERE prefix = ?',
+        (CLIENT_CODE_PREFIX,)
+    ) as cursor:
+        if await cursor.fetchone():
+            return
+
+    max_number = CLIENT_CODE_START - 1
+    async with db.execute('SELECT client_code FROM users') as cursor:
+        async for row in cursor:
+            number = parse_client_code_number(row[0])
+            if number is not None and number > max_number:
+                max_number = number
+
+    await db.execute(
+        'INSERT INTO client_code_seq (prefix, next_value) VALUES (?, ?)',
+        (CLIENT_CODE_PREFIX, max_number + 1)
+    )
+    logger.info(f"Client code sequence seeded: next = {format_client_code(max_number + 1)}")
+
+
+async def allocate_client_code(db: aiosqlite.Connection) -> str:
+    """
+    Keyingi client code ni olish (writer tranzaksiyasi ichida chaqiriladi)
+
+    Yozish faqat bitta writer orqali bo'lgani uchun UPDATE va SELECT
+    orasida boshqa tranzaksiya aralasha olmaydi.
+    """
+    while True:
+        await db.execute(
+            'UPDATE client_code_seq SET next_value = next_value + 1 WHERE prefix = ?',
+            (CLIENT_CODE_PREFIX,)
+        )
+        async with db.execute(
+            'SELECT next_value - 1 FROM client_code_seq WHERE prefix = ?',
+            (CLIENT_CODE_PREFIX,)
+        ) as cursor:
+            row = await cursor.fetchone()
+
+        if row is None:
+            # Jadval hali to'ldirilmagan bo'lsa
+            await seed_client_code_seq(db)
+            continue
+
+        client_code = format_client_code(row[0])
+
+        # Qo'lda kiritilgan kod bilan to'qnashmaslik uchun
+        async with db.execute(
+            'SELECT 1 FROM users WHERE UPPER(client_code) = ?',
+            (client_code,)
+        ) as cursor:
+            if not await cursor.fetchone():
+                return client_code
+
+
+async def reserve_client_code(db: aiosqlite.Connection, client_code: str):
+    """Tashqaridan kelgan kod (Excel import) dan keyin ketma-ketlikni surish"""
+    number = parse_client_code_number(client_code)
+    if number is None:
+        return
+
+    await db.execute(
+        'UPDATE client_code_seq SET next_value = MAX(next_value, ?) WHERE prefix = ?',
+        (number + 1, CLIENT_CODE_PREFIX)
+    )
@@ -1,204 +1,460 @@
 """
 Database Manager - Barcha CRUD operatsiyalar
 """
+import os
+import re
+import json
+import time
+import asyncio
 import aiosqlite
 import logging
-from typing import Optional, List, Dict, Tuple
+from typing import AsyncIterator, Iterable, Optional, List, Dict, Set, Tuple
 from datetime import datetime
-import pandas as pd
 
 from config import (
     DB_FILE, 
-    CLIENT_CODE_PREFIX, 
-    CLIENT_CODE_START,
+    SHIPMENT_IMPORT_CHUNK_SIZE,
     VerificationStatus
 )
-from utils.excel import ExcelUserImporter
+from database.cache import MISSING, get_user_cache
+from database.client_codes import (
+    allocate_client_code,
+    seed_client_code_seq
+)
+from database.pool import get_pool
+from database.writer import WriteResult
+from utils.formatters import normalize_code, normalize_phone, phone_search_keys
+from utils.file_reader import MissingColumnsError, TableSource, source_name
+from utils.import_jobs import JOB_SHIPMENTS, ImportCancelled, ImportJob
+from utils.process_pool import stream_in_process
+from utils.shipment_import import (
+    INSERT_COLUMNS as SHIPMENT_INSERT_COLUMNS,
+    ShipmentImportStats,
+    iter_shipment_batches,
+    format_import_errors
+)
 
 logger = logging.getLogger(__name__)
 
+# Yuklar jadvali (staging va oldingi avlod jadvallari ham shu tuzilishda)
+SHIPMENTS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tracking_code TEXT NOT NULL,
+        shipping_name TEXT,
+        package_number TEXT,
+        weight REAL,
+        quantity INTEGER,
+        flight TEXT,
+        customer_code TEXT,
+        tracking_code_norm TEXT,
+        customer_code_norm TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+SHIPMENT_INDEXES = [
+    ('idx_tracking_code_norm', 'CREATE INDEX IF NOT EXISTS {name} ON {table}(tracking_code_norm)'),
+    # weight - "Mening yuklarim" sarlavhasidagi COUNT/SUM faqat indeksdan o'qiladi
+    ('idx_customer_code_page', 'CREATE INDEX IF NOT EXISTS {name} ON {table}(customer_code_norm, id DESC, weight)'),
+]
+
+# O'rniga boshqasi qo'yilgan indekslar (avlod suffiksi bilan ham o'chiriladi)
+OBSOLETE_SHIPMENT_INDEXES = ['idx_customer_code_norm']
+
+# PRAGMA user_version: bir martalik ma'lumot tuzatishlari bajarilganini belgilaydi
+# (1 - normallashtirilgan kodlar Python normalize_code bilan qayta hisoblangan)
+SCHEMA_VERSION = 1
+
+# IN (...) ro'yxatidagi parametrlar soni (SQLite chegarasi eski versiyalarda 999)
+SQL_IN_CHUNK_SIZE = 500
+
+# Bir vaqtda faqat bitta yuklar importi (staging jadvali bitta)
+_shipment_import_lock = asyncio.Lock()
+
 
 class DatabaseManager:
     """Asinxron database boshqaruvchi"""
     
     def __init__(self, db_path: str = DB_FILE):
         self.db_path = db_path
+        self.pool = get_pool(db_path)
+        self.user_cache = get_user_cache(db_path)
+    
+    async def open(self):
+        """Ulanishlar pulini ochish (bot ishga tushganda)"""
+        await self.pool.open()
+    
+    async def close(self):
+        """Ulanishlar pulini yopish (bot to'xtaganda)"""
+        await self.pool.close()
+    
+    async def _fetchone(self, sql: str, params: tuple = ()) -> Optional[aiosqlite.Row]:
+        """Bitta qatorni o'qish"""
+        async with self.pool.read() as db:
+            async with db.execute(sql, params) as cursor:
+                return await cursor.fetchone()
+    
+    async def _fetchall(self, sql: str, params: tuple = ()) -> List[aiosqlite.Row]:
+        """Barcha qatorlarni o'qish"""
+        async with self.pool.read() as db:
+            async with db.execute(sql, params) as cursor:
+                return await cursor.fetchall()
+    
+    async def _execute(self, sql: str, params: tuple = ()) -> WriteResult:
+        """Bitta yozish so'rovi (writer navbati orqali, group commit)"""
+        return await self.pool.execute(sql, params)
     
     async def init_db(self):
         """Database jadvallarini yaratish"""
-        async with aiosqlite.connect(self.db_path) as db:
-            # Users jadvali
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    telegram_id INTEGER UNIQUE,
-                    client_code TEXT UNIQUE NOT NULL,
-                    fullname TEXT NOT NULL,
-                    phone TEXT NOT NULL,
-                    passport_number TEXT NOT NULL,
-                    birth_date TEXT NOT NULL,
-                    passport_expiry_date TEXT,
-                    pinfl TEXT NOT NULL,
-                    address TEXT NOT NULL,
-                    china_address_confirmed BOOLEAN DEFAULT 0,
-                    passport_front_photo TEXT,
-                    passport_back_photo TEXT,
-                    passport_front_file_id TEXT,
-                    passport_back_file_id TEXT,
-                    passport_front_file_unique_id TEXT,
-                    passport_back_file_unique_id TEXT,
-                    verification_status TEXT DEFAULT 'pending',
-                    rejection_reason TEXT,
-                    is_active BOOLEAN DEFAULT 1,
-                    language TEXT DEFAULT 'uz',
-                    registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    verified_at TIMESTAMP,
-                    last_login TIMESTAMP
-                )
-            ''')
-            
-            # Shipments jadvali
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS shipments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    tracking_code TEXT NOT NULL,
-                    shipping_name TEXT,
-                    package_number TEXT,
-                    weight REAL,
-                    quantity INTEGER,
-                    flight TEXT,
-                    customer_code TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Feedbacks jadvali
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS feedbacks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    telegram_id INTEGER NOT NULL,
-                    message TEXT NOT NULL,
-                    admin_reply TEXT,
-                    replied_at TIMESTAMP,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            
-            # Verification queue jadvali
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS verification_queue (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    telegram_message_id INTEGER,
-                    submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            
-            # Indexlar
-            await db.execute('CREATE INDEX IF NOT EXISTS idx_telegram_id ON users(telegram_id)')
-            await db.execute('CREATE INDEX IF NOT EXISTS idx_client_code ON users(client_code)')
-            await db.execute('CREATE INDEX IF NOT EXISTS idx_phone ON users(phone)')
-            await db.execute('CREATE INDEX IF NOT EXISTS idx_tracking_code ON shipments(tracking_code)')
-            await db.execute('CREATE INDEX IF NOT EXISTS idx_customer_code ON shipments(customer_code)')
+        await self.pool.transaction(self._create_schema)
+        logger.info("Database initialized successfully")
+    
+    async def _create_schema(self, db: aiosqlite.Connection):
+        """Jadval va indekslarni yaratish (writer tranzaksiyasi ichida)"""
+        # Users jadvali
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                telegram_id INTEGER UNIQUE,
+                client_code TEXT UNIQUE NOT NULL,
+                fullname TEXT NOT NULL,
+                phone TEXT NOT NULL,
+                passport_number TEXT NOT NULL,
+                birth_date TEXT NOT NULL,
+                passport_expiry_date TEXT,
+                pinfl TEXT NOT NULL,
+                address TEXT NOT NULL,
+                china_address_confirmed BOOLEAN DEFAULT 0,
+                passport_front_photo TEXT,
+                passport_back_photo TEXT,
+                passport_front_file_id TEXT,
+                passport_back_file_id TEXT,
+                passport_front_file_unique_id TEXT,
+                passport_back_file_unique_id TEXT,
+                verification_status TEXT DEFAULT 'pending',
+                rejection_reason TEXT,
+                is_active BOOLEAN DEFAULT 1,
+                language TEXT DEFAULT 'uz',
+                phone_digits TEXT,
+                phone_rev TEXT,
+                registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                verified_at TIMESTAMP,
+                last_login TIMESTAMP
+            )
+        ''')
+        
+        # Shipments jadvali
+        await db.execute(SHIPMENTS_TABLE_SQL.format(table='shipments'))
+        
+        # Yuklar importlari tarixi (har bir import - yangi avlod)
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS shipment_imports (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                file_name TEXT,
+                status TEXT DEFAULT 'loading',
+                mode TEXT DEFAULT 'full',
+                row_count INTEGER DEFAULT 0,
+                skipped_count INTEGER DEFAULT 0,
+                inserted_count INTEGER DEFAULT 0,
+                updated_count INTEGER DEFAULT 0,
+                unchanged_count INTEGER DEFAULT 0,
+                removed_count INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Import ishlari navbati (bot qayta ishga tushsa checkpoint dan davom etadi)
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS import_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                file_name TEXT,
+                options TEXT DEFAULT '{}',
+                admin_id INTEGER NOT NULL,
+                message_id INTEGER,
+                status TEXT DEFAULT 'queued',
+                rows_done INTEGER DEFAULT 0,
+                success_count INTEGER DEFAULT 0,
+                failed_count INTEGER DEFAULT 0,
+                state TEXT DEFAULT '{}',
+                result TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        ''')
+        
+        # Import ishidagi xato qatorlar (hisobot davom ettirilgandan keyin ham to'liq bo'lishi uchun)
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS import_job_errors (
+                job_id INTEGER NOT NULL,
+                row_number INTEGER,
+                row_data TEXT,
+                reason TEXT,
+                FOREIGN KEY (job_id) REFERENCES import_jobs(id)
+            )
+        ''')
+        
+        # Broadcast lar va har bir qabul qiluvchi holati (bot qayta ishga tushsa davom etadi)
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS broadcasts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                admin_id INTEGER NOT NULL,
+                message_id INTEGER,
+                text TEXT NOT NULL,
+                status TEXT DEFAULT 'queued',
+                total INTEGER DEFAULT 0,
+                sent INTEGER DEFAULT 0,
+                failed INTEGER DEFAULT 0,
+                blocked INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        ''')
+        
+        # status: pending / sent / failed / blocked
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS broadcast_recipients (
+                broadcast_id INTEGER NOT NULL,
+                telegram_id INTEGER NOT NULL,
+                status TEXT DEFAULT 'pending',
+                PRIMARY KEY (broadcast_id, telegram_id)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Bir marta yuklangan template rasmlar file_id si (fayl o'zgarsa qayta yuklanadi)
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS media_cache (
+                path TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Feedbacks jadvali
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS feedbacks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                telegram_id INTEGER NOT NULL,
+                message TEXT NOT NULL,
+                admin_reply TEXT,
+                replied_at TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        ''')
+        
+        # Verification queue jadvali
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS verification_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                telegram_message_id INTEGER,
+                album_message_id INTEGER,
+                submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        ''')
+        
+        # Eski bazalar uchun migratsiya
+        await self._migrate_schema(db)
+        
+        # Client code ketma-ketligi (mavjud eng katta koddan boshlanadi)
+        await seed_client_code_seq(db)
+        
+        # Indexlar
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_telegram_id ON users(telegram_id)')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_client_code ON users(client_code)')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_client_code_upper ON users(UPPER(client_code))')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_pinfl ON users(pinfl)')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_phone_digits ON users(phone_digits)')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_phone_rev ON users(phone_rev)')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_import_job_errors_job ON import_job_errors(job_id, row_number)')
+        await self._ensure_shipment_indexes(db)
+        
+        # LOWER(...) qidiruvlari o'rniga normalize ustunlar ishlatiladi
+        await db.execute('DROP INDEX IF EXISTS idx_tracking_code')
+        await db.execute('DROP INDEX IF EXISTS idx_customer_code')
+        await db.execute('DROP INDEX IF EXISTS idx_phone')
+        
+        await db.execute('PRAGMA optimize')
+    
+    async def _ensure_shipment_indexes(self, db: aiosqlite.Connection):
+        """
+        shipments indekslarini yaratish (agar yo'q bo'lsa)
+        
+        Import avlodlari almashganda indekslar jadval bilan birga ko'chadi va
+        nomi avlod raqami bilan tugaydi, shuning uchun prefiks bo'yicha tekshiriladi.
+        """
+        async with db.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'shipments'"
+        ) as cursor:
+            existing = [row['name'] for row in await cursor.fetchall()]
+        
+        for name, sql in SHIPMENT_INDEXES:
+            if not any(index.startswith(name) for index in existing):
+                await db.execute(sql.format(name=name, table='shipments'))
+        
+        for index in existing:
+            if any(index.startswith(name) for name in OBSOLETE_SHIPMENT_INDEXES):
+                await db.execute(f'DROP INDEX IF EXISTS {index}')
+    
+    @staticmethod
+    async def _normalize_shipment_codes(db: aiosqlite.Connection, where: str = '') -> int:
+        """*_norm ustunlarini normalize_code bilan to'ldirish (yangi qatorlar bilan bir xil qoida)"""
+        async with db.execute(f'SELECT id, tracking_code, customer_code FROM shipments {where}') as cursor:
+            rows = await cursor.fetchall()
+        
+        updates = [
+            (normalize_code(row['tracking_code']), normalize_code(row['customer_code']), row['id'])
+            for row in rows
+        ]
+        await db.executemany(
+            'UPDATE shipments SET tracking_code_norm = ?, customer_code_norm = ? WHERE id = ?',
+            updates
+        )
+        return len(updates)
+    
+    async def _migrate_schema(self, db: aiosqlite.Connection):
+        """Yangi ustunlarni qo'shish va ularni to'ldirish"""
+        async with db.execute('PRAGMA user_version') as cursor:
+            version = (await cursor.fetchone())[0]
+        
+        async with db.execute('PRAGMA table_info(shipments)') as cursor:
+            shipment_columns = {row['name'] for row in await cursor.fetchall()}
+        
+        if 'tracking_code_norm' not in shipment_columns:
+            await db.execute('ALTER TABLE shipments ADD COLUMN tracking_code_norm TEXT')
+            await db.execute('ALTER TABLE shipments ADD COLUMN customer_code_norm TEXT')
+            count = await self._normalize_shipment_codes(db)
+            logger.info(f"Migrated shipments: normalized code columns added ({count} rows)")
+        elif version < 1:
+            # Oldingi migratsiya SQL UPPER(TRIM()) bilan to'ldirgan: u faqat ASCII harflarni
+            # va bo'sh joyni biladi - farq faqat bosma ASCII dan tashqari belgili kodlarda
+            count = await self._normalize_shipment_codes(
+                db, "WHERE tracking_code GLOB '*[^ -~]*' OR customer_code GLOB '*[^ -~]*'"
+            )
+            if count:
+                logger.info(f"Migrated shipments: {count} normalized codes recomputed")
+        
+        async with db.execute('PRAGMA table_info(shipment_imports)') as cursor:
+            import_columns = {row['name'] for row in await cursor.fetchall()}
+        
+        if 'inserted_count' not in import_columns:
+            await db.execute("ALTER TABLE shipment_imports ADD COLUMN mode TEXT DEFAULT 'full'")
+            for column in ('inserted_count', 'updated_count', 'unchanged_count', 'removed_count'):
+                await db.execute(f'ALTER TABLE shipment_imports ADD COLUMN {column} INTEGER DEFAULT 0')
+            logger.info("Migrated shipment_imports: diff counters added")
+        
+        async with db.execute('PRAGMA table_info(users)') as cursor:
+            user_columns = {row['name'] for row in await cursor.fetchall()}
+        
+        if 'phone_digits' not in user_columns:
+            await db.execute('ALTER TABLE users ADD COLUMN phone_digits TEXT')
+            await db.execute('ALTER TABLE users ADD COLUMN phone_rev TEXT')
             
-            await db.commit()
-            logger.info("Database initialized successfully")
+            async with db.execute('SELECT id, phone FROM users') as cursor:
+                rows = await cursor.fetchall()
+            await db.executemany(
+                'UPDATE users SET phone_digits = ?, phone_rev = ? WHERE id = ?',
+                [(*phone_search_keys(row['phone']), row['id']) for row in rows]
+            )
+            logger.info(f"Migrated users: phone search columns added ({len(rows)} rows)")
+        
+        async with db.execute('PRAGMA table_info(verification_queue)') as cursor:
+            queue_columns = {row['name'] for row in await cursor.fetchall()}
+        
+        if 'album_message_id' not in queue_columns:
+            await db.execute('ALTER TABLE verification_queue ADD COLUMN album_message_id INTEGER')
+            logger.info("Migrated verification_queue: album_message_id added")
+        
+        if version < SCHEMA_VERSION:
+            # Butun jadvalni skanerlaydigan tuzatishlar keyingi init_db da takrorlanmaydi
+            await db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
     
     # ==================== USER MANAGEMENT ====================
     
     async def is_user_registered(self, telegram_id: int) -> bool:
-        """Foydalanuvchi ro'yxatdan o'tganmi?"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute(
-                'SELECT id FROM users WHERE telegram_id = ? AND is_active = 1',
-                (telegram_id,)
-            )
-            result = await cursor.fetchone()
-            return result is not None
+        """Foydalanuvchi ro'yxatdan o'tganmi? (keshdan - keyingi get_user_by_telegram_id ham so'rovsiz)"""
+        return await self.get_user_by_telegram_id(telegram_id) is not None
     
     async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[Dict]:
-        """Telegram ID bo'yicha foydalanuvchini olish"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
-                'SELECT * FROM users WHERE telegram_id = ? AND is_active = 1',
-                (telegram_id,)
-            )
-            row = await cursor.fetchone()
-            return dict(row) if row else None
+        """Telegram ID bo'yicha foydalanuvchini olish (user_cache orqali)"""
+        user = self.user_cache.get_by_telegram_id(telegram_id)
+        if user is not MISSING:
+            return user
+        
+        generation = self.user_cache.generation
+        row = await self._fetchone(
+            'SELECT * FROM users WHERE telegram_id = ? AND is_active = 1',
+            (telegram_id,)
+        )
+        if row is None:
+            self.user_cache.put_missing(telegram_id, generation)
+            return None
+        
+        user = dict(row)
+        self.user_cache.put(user, generation)
+        return user
     
     async def get_user_by_id(self, user_id: int) -> Optional[Dict]:
-        """ID bo'yicha foydalanuvchini olish"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
-                'SELECT * FROM users WHERE id = ? AND is_active = 1',
-                (user_id,)
-            )
-            row = await cursor.fetchone()
-            return dict(row) if row else None
+        """ID bo'yicha foydalanuvchini olish (user_cache orqali)"""
+        user = self.user_cache.get_by_id(user_id)
+        if user is not MISSING:
+            return user
+        
+        generation = self.user_cache.generation
+        row = await self._fetchone(
+            'SELECT * FROM users WHERE id = ? AND is_active = 1',
+            (user_id,)
+        )
+        if row is None:
+            return None
+        
+        user = dict(row)
+        self.user_cache.put(user, generation)
+        return user
     
     async def get_user_by_client_code(self, client_code: str) -> Optional[Dict]:
         """Mijoz kodi bo'yicha foydalanuvchini olish"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
-                'SELECT * FROM users WHERE UPPER(client_code) = UPPER(?) AND is_active = 1',
-                (client_code,)
-            )
-            row = await cursor.fetchone()
-            return dict(row) if row else None
+        row = await self._fetchone(
+            'SELECT * FROM users WHERE UPPER(client_code) = ? AND is_active = 1',
+            (normalize_code(client_code),)
+        )
+        return dict(row) if row else None
     
     async def search_users(self, query: str) -> List[Dict]:
-        """Foydalanuvchilarni qidirish (client_code yoki phone)"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            
-            # Telefon raqam bo'lishi mumkin
-            clean_query = query.replace('+', '').replace(' ', '').replace('-', '')
-            
-            cursor = await db.execute('''
+        """
+        Foydalanuvchilarni qidirish (client_code yoki phone)
+        
+        Telefon to'liq raqam yoki oxirgi raqamlari bo'yicha qidiriladi
+        (masalan, oxirgi 7 ta raqam). Ikkalasi ham indeks orqali.
+        """
+        # Telefon raqam bo'lishi mumkin
+        clean_query = re.sub(r'[\s+\-()]', '', query)
+        
+        if clean_query.isdigit() and len(clean_query) >= 4:
+            phone_digits = normalize_phone(clean_query)
+            rows = await self._fetchall('''
                 SELECT * FROM users 
-                WHERE (UPPER(client_code) = UPPER(?) OR phone LIKE ?)
+                WHERE (UPPER(client_code) = ? OR phone_digits = ? OR phone_rev GLOB ?)
                 AND is_active = 1
                 ORDER BY registered_at DESC
-            ''', (query, f'%{clean_query}%'))
-            
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
-    
-    async def generate_client_code(self) -> str:
-        """Yangi client code generatsiya qilish"""
-        async with aiosqlite.connect(self.db_path) as db:
-            # Barcha client_code larni olish va raqamli qiymatni topish
-            cursor = await db.execute('''
-                SELECT client_code FROM users
-                WHERE UPPER(client_code) LIKE UPPER(?)
-            ''', (f'{CLIENT_CODE_PREFIX}%',))
-            rows = await cursor.fetchall()
-
-            if rows:
-                # Barcha raqamlarni ajratib olish va eng kattasini topish
-                max_number = CLIENT_CODE_START - 1
-                for row in rows:
-                    try:
-                        code = row[0].upper()  # Katta harfga o'tkazish
-                        number = int(code.replace(CLIENT_CODE_PREFIX, ''))
-                        if number > max_number:
-                            max_number = number
-                    except:
-                        continue
-
-                next_number = max_number + 1
-            else:
-                # Agar hech kim bo'lmasa, boshlang'ich qiymatdan boshlash
-                next_number = CLIENT_CODE_START
-
-            # AKB600, AKB601, ...
-            return f"{CLIENT_CODE_PREFIX}{next_number:03d}"
+            ''', (normalize_code(query), phone_digits, clean_query[::-1] + '*'))
+        else:
+            rows = await self._fetchall('''
+                SELECT * FROM users 
+                WHERE UPPER(client_code) = ?
+                AND is_active = 1
+                ORDER BY registered_at DESC
+            ''', (normalize_code(query),))
+        
+        return [dict(row) for row in rows]
     
     async def register_user(self, telegram_id: int, user_data: Dict) -> Tuple[bool, str, str]:
         """
@@ -207,47 +463,44 @@ class DatabaseManager:
         Returns:
             (success, message, client_code)
         """
-        try:
-            client_code = await self.generate_client_code()
+        async def insert_user(db: aiosqlite.Connection) -> str:
+            # Kod va foydalanuvchi bitta tranzaksiyada - poyga holati yo'q
+            client_code = await allocate_client_code(db)
             
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute('''
-                    INSERT INTO users
-                    (telegram_id, client_code, fullname, phone, passport_number,
-                     birth_date, passport_expiry_date, pinfl, address,
-                     passport_front_photo, passport_back_photo,
-                     passport_front_file_id, passport_back_file_id,
-                     passport_front_file_unique_id, passport_back_file_unique_id,
-                     language, verification_status)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    telegram_id,
-                    client_code,
-                    user_data['fullname'],
-                    user_data['phone'],
-                    user_data['passport_number'],
-                    user_data['birth_date'],
-                    user_data.get('passport_expiry_date'),
-                    user_data['pinfl'],
-                    user_data['address'],
-                    user_data.get('passport_front_photo'),
-                    user_data.get('passport_back_photo'),
-                    user_data.get('passport_front_file_id'),
-                    user_data.get('passport_back_file_id'),
-                    user_data.get('passport_front_file_unique_id'),
-                    user_data.get('passport_back_file_unique_id'),
-                    user_data.get('language', 'uz'),
-                    VerificationStatus.PENDING
-                ))
-                await db.commit()
-                
-                # User ID ni olish
-                cursor = await db.execute(
-                    'SELECT id FROM users WHERE client_code = ?',
-                    (client_code,)
-                )
-                row = await cursor.fetchone()
-                user_id = row[0]
+            await db.execute('''
+                INSERT INTO users
+                (telegram_id, client_code, fullname, phone, passport_number,
+                 birth_date, passport_expiry_date, pinfl, address,
+                 passport_front_photo, passport_back_photo,
+                 passport_front_file_id, passport_back_file_id,
+                 passport_front_file_unique_id, passport_back_file_unique_id,
+                 language, verification_status, phone_digits, phone_rev)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                telegram_id,
+                client_code,
+                user_data['fullname'],
+                user_data['phone'],
+                user_data['passport_number'],
+                user_data['birth_date'],
+                user_data.get('passport_expiry_date'),
+                user_data['pinfl'],
+                user_data['address'],
+                user_data.get('passport_front_photo'),
+                user_data.get('passport_back_photo'),
+                user_data.get('passport_front_file_id'),
+                user_data.get('passport_back_file_id'),
+                user_data.get('passport_front_file_unique_id'),
+                user_data.get('passport_back_file_unique_id'),
+                user_data.get('language', 'uz'),
+                VerificationStatus.PENDING,
+                *phone_search_keys(user_data['phone'])
+            ))
+            return client_code
+        
+        try:
+            client_code = await self.pool.transaction(insert_user)
+            self.user_cache.invalidate(telegram_id=telegram_id)
             
             logger.info(f"User registered: {telegram_id} -> {client_code}")
             return True, "Success", client_code
@@ -258,42 +511,53 @@ class DatabaseManager:
     
     async def verify_login(self, client_code: str, phone: str) -> Optional[Dict]:
         """Login ma'lumotlarini tekshirish"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            
-            # Telefon raqamini normalize qilish
-            clean_phone = phone.replace('+', '').replace(' ', '').replace('-', '')
-            
-            cursor = await db.execute('''
-                SELECT * FROM users 
-                WHERE UPPER(client_code) = UPPER(?) 
-                AND phone LIKE ? 
-                AND is_active = 1
-            ''', (client_code, f'%{clean_phone}%'))
-            
-            row = await cursor.fetchone()
-            
-            if row:
-                # Last login ni yangilash
-                await db.execute(
-                    'UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?',
-                    (row['id'],)
-                )
-                await db.commit()
-            
-            return dict(row) if row else None
+        # Telefon raqamini normalize qilish
+        clean_phone = normalize_phone(phone)
+        
+        row = await self._fetchone('''
+            SELECT * FROM users 
+            WHERE UPPER(client_code) = ? 
+            AND phone_digits = ? 
+            AND is_active = 1
+        ''', (normalize_code(client_code), clean_phone))
+        
+        if row:
+            # Last login ni yangilash
+            await self._execute(
+                'UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?',
+                (row['id'],)
+            )
+            self.user_cache.invalidate(user_id=row['id'])
+        
+        return dict(row) if row else None
+    
+    async def update_user_language(self, user_id: int, language: str) -> bool:
+        """Foydalanuvchi tilini saqlash"""
+        try:
+            await self._execute(
+                'UPDATE users SET language = ? WHERE id = ?',
+                (language, user_id)
+            )
+            self.user_cache.invalidate(user_id=user_id)
+            return True
+        except Exception as e:
+            logger.error(f"Update language error: {e}")
+            return False
     
     # ==================== VERIFICATION ====================
     
-    async def add_to_verification_queue(self, user_id: int, message_id: int) -> bool:
-        """Verification queuega qo'shish"""
+    async def add_to_verification_queue(
+        self,
+        user_id: int,
+        message_id: int,
+        album_message_id: Optional[int] = None
+    ) -> bool:
+        """Verification queuega qo'shish (message_id - tugmali xabar, album_message_id - rasmlar)"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute('''
-                    INSERT INTO verification_queue (user_id, telegram_message_id)
-                    VALUES (?, ?)
-                ''', (user_id, message_id))
-                await db.commit()
+            await self._execute('''
+                INSERT INTO verification_queue (user_id, telegram_message_id, album_message_id)
+                VALUES (?, ?, ?)
+            ''', (user_id, message_id, album_message_id))
             return True
         except Exception as e:
             logger.error(f"Add to queue error: {e}")
@@ -302,15 +566,14 @@ class DatabaseManager:
     async def approve_user(self, user_id: int) -> bool:
         """Foydalanuvchini tasdiqlash"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute('''
-                    UPDATE users 
-                    SET verification_status = ?, 
-                        verified_at = CURRENT_TIMESTAMP,
-                        rejection_reason = NULL
-                    WHERE id = ?
-                ''', (VerificationStatus.APPROVED, user_id))
-                await db.commit()
+            await self._execute('''
+                UPDATE users 
+                SET verification_status = ?, 
+                    verified_at = CURRENT_TIMESTAMP,
+                    rejection_reason = NULL
+                WHERE id = ?
+            ''', (VerificationStatus.APPROVED, user_id))
+            self.user_cache.invalidate(user_id=user_id)
             
             logger.info(f"User {user_id} approved")
             return True
@@ -321,14 +584,13 @@ class DatabaseManager:
     async def reject_user(self, user_id: int, reason: str) -> bool:
         """Foydalanuvchini rad etish"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute('''
-                    UPDATE users 
-                    SET verification_status = ?, 
-                        rejection_reason = ?
-                    WHERE id = ?
-                ''', (VerificationStatus.REJECTED, reason, user_id))
-                await db.commit()
+            await self._execute('''
+                UPDATE users 
+                SET verification_status = ?, 
+                    rejection_reason = ?
+                WHERE id = ?
+            ''', (VerificationStatus.REJECTED, reason, user_id))
+            self.user_cache.invalidate(user_id=user_id)
             
             logger.info(f"User {user_id} rejected: {reason}")
             return True
@@ -339,12 +601,11 @@ class DatabaseManager:
     async def confirm_china_address(self, user_id: int) -> bool:
         """Xitoy manzilini tasdiqlash"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute(
-                    'UPDATE users SET china_address_confirmed = 1 WHERE id = ?',
-                    (user_id,)
-                )
-                await db.commit()
+            await self._execute(
+                'UPDATE users SET china_address_confirmed = 1 WHERE id = ?',
+                (user_id,)
+            )
+            self.user_cache.invalidate(user_id=user_id)
             return True
         except Exception as e:
             logger.error(f"China address confirm error: {e}")
@@ -354,85 +615,709 @@ class DatabaseManager:
     
     async def search_by_tracking_code(self, code: str) -> List[Dict]:
         """Trek kodi bo'yicha qidirish"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute('''
-                SELECT * FROM shipments 
-                WHERE LOWER(tracking_code) = LOWER(?)
-            ''', (code.strip(),))
-            
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        rows = await self._fetchall('''
+            SELECT * FROM shipments 
+            WHERE tracking_code_norm = ?
+        ''', (normalize_code(code),))
+        
+        return [dict(row) for row in rows]
+    
+    async def search_by_tracking_codes(self, codes: Iterable[str]) -> Tuple[Dict[str, List[Dict]], Set[str]]:
+        """
+        Bir nechta trek kodi bo'yicha bitta so'rovda qidirish
+        
+        Kodlar normalize qilinadi va takrorlari tashlanadi. IN (...) ro'yxati
+        SQL_IN_CHUNK_SIZE dan oshsa bo'laklanadi - hammasi bitta ulanishda,
+        idx_tracking_code_norm indeksi orqali.
+        
+        Returns:
+            (found, not_found) - found: {kiritilgan_kod: [yuklar]} (kiritilgan
+            tartibda), not_found: topilmagan kodlar
+        """
+        # Normalize kod -> foydalanuvchi yozgan ko'rinishi (birinchisi)
+        inputs: Dict[str, str] = {}
+        for code in codes:
+            norm = normalize_code(code)
+            if norm and norm not in inputs:
+                inputs[norm] = code.strip()
+        
+        grouped: Dict[str, List[Dict]] = {}
+        norms = list(inputs)
+        async with self.pool.read() as db:
+            for start in range(0, len(norms), SQL_IN_CHUNK_SIZE):
+                chunk = norms[start:start + SQL_IN_CHUNK_SIZE]
+                placeholders = ', '.join('?' * len(chunk))
+                async with db.execute(f'''
+                    SELECT * FROM shipments
+                    WHERE tracking_code_norm IN ({placeholders})
+                    ORDER BY id
+                ''', chunk) as cursor:
+                    async for row in cursor:
+                        grouped.setdefault(row['tracking_code_norm'], []).append(dict(row))
+        
+        found = {inputs[norm]: grouped[norm] for norm in norms if norm in grouped}
+        not_found = {inputs[norm] for norm in norms if norm not in grouped}
+        return found, not_found
     
     async def search_by_customer_code(self, code: str) -> List[Dict]:
         """Mijoz kodi bo'yicha qidirish"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute('''
-                SELECT * FROM shipments 
-                WHERE LOWER(customer_code) = LOWER(?)
-                ORDER BY id DESC
-            ''', (code.strip(),))
-            
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        rows = await self._fetchall('''
+            SELECT * FROM shipments 
+            WHERE customer_code_norm = ?
+            ORDER BY id DESC
+        ''', (normalize_code(code),))
+        
+        return [dict(row) for row in rows]
+    
+    async def get_customer_shipments_summary(self, code: str) -> Tuple[int, float]:
+        """Mijoz yuklari soni va jami vazni (SQL da hisoblanadi)"""
+        row = await self._fetchone('''
+            SELECT COUNT(*), COALESCE(SUM(weight), 0) FROM shipments
+            WHERE customer_code_norm = ?
+        ''', (normalize_code(code),))
+        
+        return row[0], row[1]
+    
+    async def get_shipments_generation(self) -> int:
+        """
+        Faol yuklar avlodi (to'liq import yoki rollback da o'zgaradi)
+        
+        Yangi avlodda ID lar boshqa qatorlarga tegishli - sahifa kursorlari
+        shu raqam bilan birga beriladi.
+        """
+        row = await self._fetchone(
+            "SELECT COALESCE(MAX(id), 0) FROM shipment_imports WHERE status = 'active'"
+        )
+        return row[0] if row else 0
+    
+    async def get_customer_shipments_page(
+        self,
+        code: str,
+        cursor: Optional[int] = None,
+        direction: str = 'n',
+        limit: int = 10
+    ) -> Tuple[List[Dict], bool, bool]:
+        """
+        Mijoz yuklarining bitta sahifasi - keyset pagination
+        
+        Tartib: id DESC, (customer_code_norm, id DESC) indeksi bo'yicha -
+        OFFSET yo'q, har qanday sahifa limit + 1 qator o'qiydi.
+        
+        Args:
+            cursor: 'n' da oldingi sahifaning oxirgi id si, 'p' da keyingi
+                sahifaning birinchi id si (None - birinchi sahifa)
+            direction: 'n' - keyingi sahifa, 'p' - oldingi sahifa
+        
+        Returns:
+            (yuklar, oldingi_bormi, keyingi_bormi)
+        """
+        norm = normalize_code(code)
+        
+        if cursor is None:
+            rows = await self._fetchall('''
+                SELECT * FROM shipments WHERE customer_code_norm = ?
+                ORDER BY id DESC LIMIT ?
+            ''', (norm, limit + 1))
+            return [dict(row) for row in rows[:limit]], False, len(rows) > limit
+        
+        if direction == 'p':
+            rows = await self._fetchall('''
+                SELECT * FROM shipments WHERE customer_code_norm = ? AND id > ?
+                ORDER BY id ASC LIMIT ?
+            ''', (norm, cursor, limit + 1))
+            page = [dict(row) for row in reversed(rows[:limit])]
+            return page, len(rows) > limit, True
+        
+        rows = await self._fetchall('''
+            SELECT * FROM shipments WHERE customer_code_norm = ? AND id < ?
+            ORDER BY id DESC LIMIT ?
+        ''', (norm, cursor, limit + 1))
+        return [dict(row) for row in rows[:limit]], True, len(rows) > limit
     
-    async def import_shipments_from_file(self, file_path: str) -> Tuple[bool, str]:
-        """Excel yoki CSV fayldan yuklar import qilish"""
+    async def import_shipments_from_file(
+        self,
+        source: TableSource,
+        incremental: bool = False,
+        remove_missing: bool = False,
+        job: Optional[ImportJob] = None
+    ) -> Tuple[bool, str]:
+        """
+        Excel yoki CSV fayldan yuklar import qilish
+        
+        To'liq rejim: yangi ma'lumotlar shipments_staging jadvaliga yoziladi,
+        indekslari quriladi va bitta qisqa tranzaksiyada nomi almashtiriladi.
+        Import davomida mijozlar eski jadvaldan qidiraveradi. Oldingi avlod
+        shipments_prev sifatida saqlanadi (rollback_shipments).
+        
+        Incremental rejim: faqat yangi va o'zgargan qatorlar yoziladi
+        (kalit - trek kodi + paket raqami). remove_missing=True bo'lsa,
+        faylda yo'q yuklar o'chiriladi.
+        
+        job - import_jobs navbatidan. To'liq rejimda staging yuklanishi
+        checkpoint qilinadi va bot qayta ishga tushsa davom ettiriladi;
+        incremental rejim (TEMP jadval) boshidan boshlanadi.
+        
+        source - fayl yo'li yoki xotiradagi fayl (TableBuffer)
+        """
+        stream = None
+        job = job or ImportJob(JOB_SHIPMENTS, source)
         try:
-            if file_path.endswith('.csv'):
-                df = pd.read_csv(file_path, encoding='utf-8')
-            elif file_path.endswith(('.xlsx', '.xls')):
-                df = pd.read_excel(file_path)
-            else:
+            started = time.perf_counter()
+            
+            file_name = os.path.basename(source_name(source))
+            if not file_name.endswith(('.csv', '.xlsx', '.xls')):
                 return False, "Noto'g'ri fayl formati"
             
-            required_columns = ['Shipment Tracking Code', 'Customer code']
-            if not all(col in df.columns for col in required_columns):
-                return False, f"Kerakli ustunlar topilmadi: {required_columns}"
+            if job.rows_done and (incremental or not await self._staging_resumable(job.state.get('generation'))):
+                logger.info(f"Import job #{job.id}: checkpoint is not resumable, starting over")
+                job.rows_done = job.checkpointed_rows = job.started_rows = 0
+                job.state = {}
             
-            df = df.fillna('')
+            stats = ShipmentImportStats()
+            stats.restore(job.state.get('stats'))
             
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute('DELETE FROM shipments')
-                
-                for _, row in df.iterrows():
-                    await db.execute('''
-                        INSERT INTO shipments 
-                        (tracking_code, shipping_name, package_number, 
-                         weight, quantity, flight, customer_code)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        str(row.get('Shipment Tracking Code', '')).strip(),
-                        str(row.get('Shipping Name', '')).strip(),
-                        str(row.get('Package Number', '')).strip(),
-                        float(row.get('Weight/KG', 0) or 0),
-                        int(row.get('Quantity', 0) or 0),
-                        str(row.get('Flight', '')).strip(),
-                        str(row.get('Customer code', '')).strip()
-                    ))
-                
-                await db.commit()
-                count = len(df)
-                logger.info(f"Imported {count} shipments")
-                return True, f"{count} ta yuk yuklandi"
+            # Fayl alohida jarayonda bo'laklab o'qiladi va tozalanadi -
+            # event loop bloklanmaydi, xotira fayl hajmiga bog'liq emas
+            stream = stream_in_process(iter_shipment_batches, source, SHIPMENT_IMPORT_CHUNK_SIZE, job.rows_done)
+            try:
+                first = await anext(stream)
+            except MissingColumnsError as e:
+                return False, str(e)
+            
+            async def batches():
+                batch = first
+                while batch is not None:
+                    job.check_cancelled()
+                    chunk_size, rows, errors = batch
+                    stats.add(chunk_size, rows, errors)
+                    job.rows_done = stats.read_count
+                    if rows:
+                        yield rows
+                    batch = await anext(stream, None)
+            
+            async with _shipment_import_lock:
+                if incremental:
+                    diff = await self._merge_shipments(file_name, batches(), stats, remove_missing)
+                else:
+                    await self._load_shipments_generation(file_name, batches(), stats, job)
+            
+            count = stats.row_count
+            elapsed = time.perf_counter() - started
+            rate = stats.read_count / elapsed if elapsed > 0 else 0
+            
+            if incremental:
+                logger.info(
+                    f"Merged {count} shipments in {elapsed:.2f}s, {rate:.0f} rows/s: "
+                    f"{diff['inserted']} inserted, {diff['updated']} updated, "
+                    f"{diff['unchanged']} unchanged, {diff['removed']} removed"
+                )
+                msg = (
+                    f"{count} ta qator tekshirildi ({rate:.0f} qator/s)\n"
+                    f"➕ Yangi: {diff['inserted']}\n"
+                    f"✏️ O'zgargan: {diff['updated']}\n"
+                    f"▫️ O'zgarmagan: {diff['unchanged']}\n"
+                    f"➖ O'chirilgan: {diff['removed']}"
+                )
+            else:
+                logger.info(f"Imported {count} shipments ({stats.error_count} skipped) in {elapsed:.2f}s, {rate:.0f} rows/s")
+                msg = f"{count} ta yuk yuklandi ({rate:.0f} qator/s)"
+            
+            if stats.error_count:
+                msg += (
+                    f"\n\n⚠️ {stats.error_count} ta qator o'tkazib yuborildi:\n"
+                    f"{format_import_errors(stats.errors, total=stats.error_count)}"
+                )
+            if not incremental:
+                msg += "\n\n↩️ Oldingi bazaga qaytish: /rollback_shipments"
+            return True, msg
+        
+        except ImportCancelled:
+            logger.info(f"Shipment import cancelled after {job.rows_done} rows")
+            raise
         
         except Exception as e:
             logger.error(f"Import error: {e}")
             return False, str(e)
+        
+        finally:
+            # Worker jarayonini to'xtatish (o'qish oxirigacha yetmagan bo'lsa ham)
+            if stream is not None:
+                await stream.aclose()
+    
+    async def _load_shipments_generation(
+        self,
+        file_name: str,
+        batches: AsyncIterator[List[tuple]],
+        stats: ShipmentImportStats,
+        job: ImportJob
+    ):
+        """
+        Yangi avlodni staging jadvaliga yuklash va atomik almashtirish
+        
+        Har IMPORT_CHECKPOINT_ROWS qatorda job holatiga avlod raqami va
+        staging dagi qatorlar soni yoziladi - davom ettirilganda
+        checkpoint dan keyin yozilgan qatorlar o'chiriladi.
+        """
+        generation = job.state.get('generation')
+        
+        if job.rows_done:
+            async def trim_staging(db: aiosqlite.Connection):
+                await db.execute('''
+                    DELETE FROM shipments_staging
+                    WHERE id NOT IN (SELECT id FROM shipments_staging ORDER BY id LIMIT ?)
+                ''', (job.state['staging_rows'],))
+            
+            await self.pool.transaction(trim_staging)
+            logger.info(f"Resuming shipments generation {generation} from row {job.rows_done}")
+        else:
+            result = await self._execute(
+                'INSERT INTO shipment_imports (file_name) VALUES (?)',
+                (file_name,)
+            )
+            generation = result.lastrowid
+            
+            async def create_staging(db: aiosqlite.Connection):
+                # Oldingi muvaffaqiyatsiz importdan qolgan bo'lishi mumkin
+                await db.execute('DROP TABLE IF EXISTS shipments_staging')
+                await db.execute(SHIPMENTS_TABLE_SQL.format(table='shipments_staging'))
+            
+            await self.pool.transaction(create_staging)
+        
+        # Har bir bo'lak alohida tranzaksiya - boshqa yozishlar orada bajariladi
+        insert_sql = f'''
+            INSERT INTO shipments_staging ({', '.join(SHIPMENT_INSERT_COLUMNS)})
+            VALUES ({', '.join('?' * len(SHIPMENT_INSERT_COLUMNS))})
+        '''
+        try:
+            async for rows in batches:
+                await self.pool.executemany(insert_sql, rows)
+                
+                if job.needs_checkpoint:
+                    job.state = {
+                        'generation': generation,
+                        'staging_rows': stats.row_count,
+                        'stats': stats.to_state(),
+                    }
+                    await self.save_import_checkpoint(job)
+            
+            # Indekslar ma'lumot yuklangandan keyin (tezroq)
+            async def build_indexes(db: aiosqlite.Connection):
+                for name, sql in SHIPMENT_INDEXES:
+                    await db.execute(sql.format(name=f'{name}_g{generation}', table='shipments_staging'))
+            
+            await self.pool.transaction(build_indexes)
+        except Exception:
+            await self._execute("UPDATE shipment_imports SET status = 'failed' WHERE id = ?", (generation,))
+            await self._execute('DROP TABLE IF EXISTS shipments_staging')
+            raise
+        
+        async def swap(db: aiosqlite.Connection):
+            await db.execute('DROP TABLE IF EXISTS shipments_prev')
+            await db.execute('ALTER TABLE shipments RENAME TO shipments_prev')
+            await db.execute('ALTER TABLE shipments_staging RENAME TO shipments')
+            await db.execute("UPDATE shipment_imports SET status = 'retired' WHERE status = 'previous'")
+            await db.execute("UPDATE shipment_imports SET status = 'previous' WHERE status = 'active'")
+            await db.execute(
+                "UPDATE shipment_imports SET status = 'active', row_count = ?, skipped_count = ? WHERE id = ?",
+                (stats.row_count, stats.error_count, generation)
+            )
+        
+        await self.pool.transaction(swap)
+    
+    async def _staging_resumable(self, generation: Optional[int]) -> bool:
+        """To'xtab qolgan avlodni davom ettirish mumkinmi (staging jadvali joyida)"""
+        if generation is None:
+            return False
+        row = await self._fetchone('''
+            SELECT 1 FROM shipment_imports
+            WHERE id = ? AND status = 'loading'
+              AND EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'shipments_staging')
+        ''', (generation,))
+        return row is not None
+    
+    async def _merge_shipments(
+        self,
+        file_name: str,
+        batches: AsyncIterator[List[tuple]],
+        stats: ShipmentImportStats,
+        remove_missing: bool
+    ) -> Dict[str, int]:
+        """
+        Faylni mavjud shipments jadvali bilan solishtirib yozish
+        
+        Qatorlar avval writer ulanishidagi TEMP jadvalga bo'laklab yoziladi
+        (bir xil kalitli qatorlardan oxirgisi qoladi), so'ng farqlar bitta
+        tranzaksiyada qo'llanadi. O'zgarmagan qatorlar umuman yozilmaydi.
+        
+        inserted / updated / unchanged - fayl qatorlari bo'yicha (yig'indisi
+        faylning yagona kalitlari soni). shipments da bir kalit bir necha marta
+        bo'lsa ham, fayl qatori bir marta "o'zgargan" hisoblanadi.
+        """
+        result = await self._execute(
+            "INSERT INTO shipment_imports (file_name, mode) VALUES (?, 'diff')",
+            (file_name,)
+        )
+        import_id = result.lastrowid
+        
+        columns = ', '.join(SHIPMENT_INSERT_COLUMNS)
+        key_match = (
+            's.tracking_code_norm = i.tracking_code_norm '
+            'AND s.package_number IS i.package_number'
+        )
+        values_differ = (
+            '(s.tracking_code IS NOT i.tracking_code '
+            'OR s.shipping_name IS NOT i.shipping_name '
+            'OR s.weight IS NOT i.weight '
+            'OR s.quantity IS NOT i.quantity '
+            'OR s.flight IS NOT i.flight '
+            'OR s.customer_code IS NOT i.customer_code)'
+        )
+        
+        async def create_incoming(db: aiosqlite.Connection):
+            await db.execute('DROP TABLE IF EXISTS temp.shipments_incoming')
+            await db.execute(f'''
+                CREATE TEMP TABLE shipments_incoming (
+                    {columns},
+                    UNIQUE (tracking_code_norm, package_number) ON CONFLICT REPLACE
+                )
+            ''')
+        
+        async def apply_diff(db: aiosqlite.Connection) -> Dict[str, int]:
+            async with db.execute(f'''
+                SELECT COUNT(*) FROM shipments_incoming i
+                WHERE EXISTS (SELECT 1 FROM shipments s WHERE {key_match})
+            ''') as cursor:
+                matched = (await cursor.fetchone())[0]
+            
+            # Kamida bitta mos qatori farq qiladigan fayl qatorlari (UPDATE dan oldin)
+            async with db.execute(f'''
+                SELECT COUNT(*) FROM shipments_incoming i
+                WHERE EXISTS (SELECT 1 FROM shipments s WHERE {key_match} AND {values_differ})
+            ''') as cursor:
+                updated = (await cursor.fetchone())[0]
+            
+            removed = 0
+            if remove_missing:
+                cursor = await db.execute(f'''
+                    DELETE FROM shipments AS s
+                    WHERE NOT EXISTS (SELECT 1 FROM shipments_incoming i WHERE {key_match})
+                ''')
+                removed = cursor.rowcount
+            
+            # Faqat haqiqatan o'zgargan qatorlar yangilanadi
+            await db.execute(f'''
+                UPDATE shipments AS s
+                SET tracking_code = i.tracking_code,
+                    shipping_name = i.shipping_name,
+                    weight = i.weight,
+                    quantity = i.quantity,
+                    flight = i.flight,
+                    customer_code = i.customer_code,
+                    customer_code_norm = i.customer_code_norm
+                FROM shipments_incoming i
+                WHERE {key_match} AND {values_differ}
+            ''')
+            
+            cursor = await db.execute(f'''
+                INSERT INTO shipments ({columns})
+                SELECT {columns} FROM shipments_incoming i
+                WHERE NOT EXISTS (SELECT 1 FROM shipments s WHERE {key_match})
+            ''')
+            inserted = cursor.rowcount
+            
+            diff = {
+                'inserted': inserted,
+                'updated': updated,
+                'unchanged': matched - updated,
+                'removed': removed,
+            }
+            await db.execute('''
+                UPDATE shipment_imports
+                SET status = 'merged', row_count = ?, skipped_count = ?,
+                    inserted_count = ?, updated_count = ?,
+                    unchanged_count = ?, removed_count = ?
+                WHERE id = ?
+            ''', (stats.row_count, stats.error_count, inserted, updated, diff['unchanged'], removed, import_id))
+            await db.execute('DROP TABLE temp.shipments_incoming')
+            return diff
+        
+        insert_sql = f'''
+            INSERT INTO shipments_incoming ({columns})
+            VALUES ({', '.join('?' * len(SHIPMENT_INSERT_COLUMNS))})
+        '''
+        try:
+            await self.pool.transaction(create_incoming)
+            async for rows in batches:
+                await self.pool.executemany(insert_sql, rows)
+            return await self.pool.transaction(apply_diff)
+        except Exception:
+            await self._execute("UPDATE shipment_imports SET status = 'failed' WHERE id = ?", (import_id,))
+            await self._execute('DROP TABLE IF EXISTS temp.shipments_incoming')
+            raise
+    
+    async def rollback_shipments(self) -> Tuple[bool, str]:
+        """
+        Oldingi yuklar bazasiga qaytish (shipments <-> shipments_prev)
+        
+        Qayta chaqirilsa, yangi bazaga qaytadi. Oxirgi almashtirishdan keyin
+        incremental import (status 'merged') qilingan bo'lsa, rad etiladi -
+        u shipments ni joyida o'zgartirgan va almashtirish uni yo'qotadi.
+        """
+        async def swap_back(db: aiosqlite.Connection) -> Optional[str]:
+            async with db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'shipments_prev'"
+            ) as cursor:
+                if not await cursor.fetchone():
+                    return "Oldingi yuklar bazasi topilmadi"
+            
+            async with db.execute('''
+                SELECT COUNT(*) FROM shipment_imports
+                WHERE status = 'merged' AND id > (
+                    SELECT COALESCE(MAX(id), 0) FROM shipment_imports
+                    WHERE status IN ('active', 'previous')
+                )
+            ''') as cursor:
+                merged = (await cursor.fetchone())[0]
+            if merged:
+                return (
+                    f"Oxirgi to'liq importdan keyin {merged} ta o'zgarishlar importi qilingan - "
+                    "qaytish ularni yo'qotadi. Kerakli faylni to'liq rejimda qayta yuklang."
+                )
+            
+            await db.execute('ALTER TABLE shipments RENAME TO shipments_swap')
+            await db.execute('ALTER TABLE shipments_prev RENAME TO shipments')
+            await db.execute('ALTER TABLE shipments_swap RENAME TO shipments_prev')
+            await db.execute('''
+                UPDATE shipment_imports
+                SET status = CASE status WHEN 'active' THEN 'previous' ELSE 'active' END
+                WHERE status IN ('active', 'previous')
+            ''')
+            return None
+        
+        try:
+            async with _shipment_import_lock:
+                refused = await self.pool.transaction(swap_back)
+            
+            if refused:
+                return False, refused
+            
+            count = await self.get_shipment_count()
+            logger.info(f"Shipments rolled back, {count} rows active")
+            return True, f"Oldingi yuklar bazasi tiklandi ({count} ta yuk)"
+        
+        except Exception as e:
+            logger.error(f"Rollback error: {e}")
+            return False, str(e)
+    
+    async def get_shipment_count(self) -> int:
+        """Yuklar soni"""
+        row = await self._fetchone('SELECT COUNT(*) FROM shipments')
+        return row[0] if row else 0
+    
+    # ==================== IMPORT ISHLARI ====================
+    
+    async def create_import_job(
+        self,
+        kind: str,
+        file_path: str,
+        file_name: str,
+        options: str,
+        admin_id: int
+    ) -> int:
+        """Yangi import ishi (navbatda). file_path bo'sh - fayl faqat xotirada"""
+        result = await self._execute('''
+            INSERT INTO import_jobs (kind, file_path, file_name, options, admin_id)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (kind, file_path, file_name, options, admin_id))
+        return result.lastrowid
+    
+    async def set_import_job_message(self, job_id: int, message_id: int):
+        """Progress ko'rsatiladigan xabar"""
+        await self._execute(
+            'UPDATE import_jobs SET message_id = ? WHERE id = ?',
+            (message_id, job_id)
+        )
+    
+    async def get_unfinished_import_jobs(self) -> List[aiosqlite.Row]:
+        """Navbatdagi va to'xtab qolgan ishlar (yaratilish tartibida)"""
+        return await self._fetchall(
+            "SELECT * FROM import_jobs WHERE status IN ('queued', 'running') ORDER BY id"
+        )
+    
+    async def start_import_job(self, job_id: int):
+        await self._execute('''
+            UPDATE import_jobs
+            SET status = 'running', started_at = COALESCE(started_at, CURRENT_TIMESTAMP)
+            WHERE id = ?
+        ''', (job_id,))
+    
+    async def save_import_checkpoint(self, job: ImportJob):
+        """
+        Ish holatini saqlash: ishlangan qatorlar, hisoblagichlar va shu
+        oraliqdagi xato qatorlar bitta tranzaksiyada yoziladi
+        """
+        if job.id is None:
+            return
+        
+        errors = [
+            (job.id, row_number, json.dumps(row, ensure_ascii=False, default=str), reason)
+            for row_number, row, reason in job.errors
+        ]
+        state = json.dumps(job.state)
+        
+        async def save(db: aiosqlite.Connection):
+            if errors:
+                await db.executemany(
+                    'INSERT INTO import_job_errors (job_id, row_number, row_data, reason) VALUES (?, ?, ?, ?)',
+                    errors
+                )
+            await db.execute('''
+                UPDATE import_jobs
+                SET rows_done = ?, success_count = ?, failed_count = ?, state = ?
+                WHERE id = ?
+            ''', (job.rows_done, job.success_count, job.failed_count, state, job.id))
+        
+        await self.pool.transaction(save)
+        del job.errors[:len(errors)]
+        job.checkpointed_rows = job.rows_done
+    
+    async def get_import_job_errors(self, job_id: int) -> Tuple[List[Dict], List[str]]:
+        """Saqlangan xato qatorlar (hisobot uchun): (rows, reasons)"""
+        rows = await self._fetchall(
+            'SELECT row_data, reason FROM import_job_errors WHERE job_id = ? ORDER BY row_number',
+            (job_id,)
+        )
+        return [json.loads(row['row_data']) for row in rows], [row['reason'] for row in rows]
+    
+    async def finish_import_job(self, job: ImportJob, status: str, result: str):
+        """Ishni yopish (done / failed / cancelled), xato qatorlar endi kerak emas"""
+        async def finish(db: aiosqlite.Connection):
+            await db.execute('''
+                UPDATE import_jobs
+                SET status = ?, result = ?, rows_done = ?, success_count = ?, failed_count = ?,
+                    finished_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (status, result, job.rows_done, job.success_count, job.failed_count, job.id))
+            await db.execute('DELETE FROM import_job_errors WHERE job_id = ?', (job.id,))
+        
+        await self.pool.transaction(finish)
+    
+    # ==================== BROADCAST ====================
+    
+    async def create_broadcast(self, admin_id: int, text: str) -> Tuple[int, int]:
+        """
+        Yangi broadcast: qabul qiluvchilar (faol, tasdiqlangan) shu paytdagi
+        holatda broadcast_recipients ga yoziladi
+        
+        Returns:
+            (broadcast_id, qabul qiluvchilar soni)
+        """
+        async def create(db: aiosqlite.Connection) -> Tuple[int, int]:
+            cursor = await db.execute(
+                'INSERT INTO broadcasts (admin_id, text) VALUES (?, ?)',
+                (admin_id, text)
+            )
+            broadcast_id = cursor.lastrowid
+            cursor = await db.execute('''
+                INSERT OR IGNORE INTO broadcast_recipients (broadcast_id, telegram_id)
+                SELECT ?, telegram_id FROM users
+                WHERE is_active = 1 AND verification_status = ? AND telegram_id IS NOT NULL
+            ''', (broadcast_id, VerificationStatus.APPROVED))
+            total = cursor.rowcount
+            await db.execute('UPDATE broadcasts SET total = ? WHERE id = ?', (total, broadcast_id))
+            return broadcast_id, total
+        
+        return await self.pool.transaction(create)
+    
+    async def set_broadcast_message(self, broadcast_id: int, message_id: int):
+        """Progress ko'rsatiladigan xabar"""
+        await self._execute(
+            'UPDATE broadcasts SET message_id = ? WHERE id = ?',
+            (message_id, broadcast_id)
+        )
+    
+    async def get_unfinished_broadcasts(self) -> List[aiosqlite.Row]:
+        """Navbatdagi va to'xtab qolgan broadcast lar (yaratilish tartibida)"""
+        return await self._fetchall(
+            "SELECT * FROM broadcasts WHERE status IN ('queued', 'running') ORDER BY id"
+        )
+    
+    async def start_broadcast(self, broadcast_id: int):
+        await self._execute('''
+            UPDATE broadcasts
+            SET status = 'running', started_at = COALESCE(started_at, CURRENT_TIMESTAMP)
+            WHERE id = ?
+        ''', (broadcast_id,))
+    
+    async def get_broadcast_counts(self, broadcast_id: int) -> Dict[str, int]:
+        """Qabul qiluvchilar holati bo'yicha soni: {'sent': .., 'pending': ..}"""
+        rows = await self._fetchall('''
+            SELECT status, COUNT(*) FROM broadcast_recipients
+            WHERE broadcast_id = ? GROUP BY status
+        ''', (broadcast_id,))
+        return {row[0]: row[1] for row in rows}
+    
+    async def get_pending_broadcast_recipients(
+        self,
+        broadcast_id: int,
+        after: int = 0,
+        limit: int = 500
+    ) -> List[int]:
+        """Hali yuborilmagan telegram_id lar - keyset (PRIMARY KEY bo'yicha)"""
+        rows = await self._fetchall('''
+            SELECT telegram_id FROM broadcast_recipients
+            WHERE broadcast_id = ? AND telegram_id > ? AND status = 'pending'
+            ORDER BY telegram_id LIMIT ?
+        ''', (broadcast_id, after, limit))
+        return [row[0] for row in rows]
+    
+    async def set_broadcast_recipient_status(self, broadcast_id: int, telegram_id: int, status: str):
+        """Bitta qabul qiluvchi natijasi (writer navbatida boshqalari bilan bitta commit)"""
+        await self._execute(
+            'UPDATE broadcast_recipients SET status = ? WHERE broadcast_id = ? AND telegram_id = ?',
+            (status, broadcast_id, telegram_id)
+        )
+    
+    async def finish_broadcast(self, broadcast_id: int, status: str, counts: Dict[str, int]):
+        """Broadcast ni yopish (done / cancelled / failed)"""
+        await self._execute('''
+            UPDATE broadcasts
+            SET status = ?, sent = ?, failed = ?, blocked = ?, finished_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (status, counts.get('sent', 0), counts.get('failed', 0), counts.get('blocked', 0), broadcast_id))
+    
+    # ==================== MEDIA CACHE ====================
+    
+    async def get_media_file(self, path: str) -> Optional[Tuple[str, str]]:
+        """Saqlangan (content_hash, file_id) yoki None"""
+        row = await self._fetchone(
+            'SELECT content_hash, file_id FROM media_cache WHERE path = ?',
+            (path,)
+        )
+        return (row['content_hash'], row['file_id']) if row else None
+    
+    async def save_media_file(self, path: str, content_hash: str, file_id: str):
+        await self._execute('''
+            INSERT INTO media_cache (path, content_hash, file_id) VALUES (?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                content_hash = excluded.content_hash,
+                file_id = excluded.file_id,
+                updated_at = CURRENT_TIMESTAMP
+        ''', (path, content_hash, file_id))
+    
+    async def delete_media_file(self, path: str):
+        await self._execute('DELETE FROM media_cache WHERE path = ?', (path,))
     
     # ==================== FEEDBACK ====================
     
     async def save_feedback(self, user_id: int, telegram_id: int, message: str) -> Optional[int]:
         """Feedbackni saqlash"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                cursor = await db.execute('''
-                    INSERT INTO feedbacks (user_id, telegram_id, message)
-                    VALUES (?, ?, ?)
-                ''', (user_id, telegram_id, message))
-                await db.commit()
-                return cursor.lastrowid
+            cursor = await self._execute('''
+                INSERT INTO feedbacks (user_id, telegram_id, message)
+                VALUES (?, ?, ?)
+            ''', (user_id, telegram_id, message))
+            return cursor.lastrowid
         except Exception as e:
             logger.error(f"Save feedback error: {e}")
             return None
@@ -440,13 +1325,11 @@ class DatabaseManager:
     async def save_feedback_reply(self, feedback_id: int, reply: str) -> bool:
         """Feedbackga admin javobini saqlash"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute('''
-                    UPDATE feedbacks 
-                    SET admin_reply = ?, replied_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (reply, feedback_id))
-                await db.commit()
+            await self._execute('''
+                UPDATE feedbacks 
+                SET admin_reply = ?, replied_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (reply, feedback_id))
             return True
         except Exception as e:
             logger.error(f"Save reply error: {e}")
@@ -455,11 +1338,10 @@ class DatabaseManager:
     async def sdel(self) -> bool:
         """Feedbackga admin javobini saqlash"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute('''
-                    DELETE FROM users
-                ''')
-                await db.commit()
+            await self._execute('''
+                DELETE FROM users
+            ''')
+            self.user_cache.clear()
             return True
         except Exception as e:
             logger.error(f"delete users error: {e}")
@@ -467,108 +1349,38 @@ class DatabaseManager:
     
     async def get_feedback_by_id(self, feedback_id: int) -> Optional[Dict]:
         """Feedback ni ID bo'yicha olish"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
-                'SELECT * FROM feedbacks WHERE id = ?',
-                (feedback_id,)
-            )
-            row = await cursor.fetchone()
-            return dict(row) if row else None
+        row = await self._fetchone(
+            'SELECT * FROM feedbacks WHERE id = ?',
+            (feedback_id,)
+        )
+        return dict(row) if row else None
     
     # ==================== STATISTICS ====================
     
     async def get_all_active_users(self) -> List[Dict]:
         """Barcha faol foydalanuvchilar"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute('''
-                SELECT * FROM users 
-                WHERE is_active = 1 AND verification_status = ?
-                ORDER BY registered_at DESC
-            ''', (VerificationStatus.APPROVED,))
-            
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        rows = await self._fetchall('''
+            SELECT * FROM users 
+            WHERE is_active = 1 AND verification_status = ?
+            ORDER BY registered_at DESC
+        ''', (VerificationStatus.APPROVED,))
+        
+        return [dict(row) for row in rows]
+    
+    async def checkpoint(self):
+        """WAL dagi o'zgarishlarni asosiy database fayliga yozish"""
+        async def wal_checkpoint(db: aiosqlite.Connection):
+            await db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        
+        # Checkpoint tranzaksiya ichida ishlamaydi
+        await self.pool.run_standalone(wal_checkpoint)
     
     async def get_user_count(self) -> int:
         """Foydalanuvchilar soni"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute(
-                'SELECT COUNT(*) FROM users WHERE is_active = 1'
-            )
-            row = await cursor.fetchone()
-            return row[0] if row else 0
-
-
-    async def import_users_excel_background(
-        self,
-        file_path: str,
-        bot,
-        admin_id: int
-    ) -> None:
-        """
-        Background taskda foydalanuvchilarni import qilish
-        """
-        import os
-        from aiogram.types import FSInputFile
-        
-        try:
-            await bot.send_message(
-                admin_id,
-                "📥 Excel fayl import qilish boshlandi...\n"
-                "Bu biroz vaqt olishi mumkin."
-            )
-            
-            importer = ExcelUserImporter(self)
-            success_count, failed_count, failed_file = await importer.import_users_from_excel(file_path)
-            
-            # Natijani adminga yuborish
-            result_message = (
-                f"✅ Import yakunlandi!\n\n"
-                f"✅ Muvaffaqiyatli: {success_count} ta\n"
-                f"❌ Xatolik: {failed_count} ta"
-            )
-            
-            await bot.send_message(admin_id, result_message)
-            
-            # Agar muvaffaqiyatsiz qatorlar bo'lsa, Excel faylni yuborish
-            if failed_file and os.path.exists(failed_file):
-                document = FSInputFile(failed_file)
-                await bot.send_document(
-                    admin_id,
-                    document,
-                    caption=f"❌ Bu faylda {failed_count} ta foydalanuvchi ro'yxati (xatoliklar bilan)"
-                )
-
-                # Faylni o'chirish
-                os.remove(failed_file)
-
-            # 2. Baza faylini zaxira nusxasi sifatida yuborish (oxirida, har holda!)
-            try:
-                database_file = FSInputFile(self.db_path)
-                await bot.send_document(
-                    admin_id,
-                    database_file,
-                    caption=f"💾 Yangilangan bazaning zaxira nusxasi"
-                )
-                logger.info("Database backup sent successfully")
-            except Exception as e:
-                logger.error(f"Database send error: {str(e)}")
-                try:
-                    await bot.send_message(
-                        admin_id,
-                        f"⚠️ Bazani yuborishda xatolik: {str(e)}"
-                    )
-                except:
-                    pass
-
-        except Exception as e:
-            logger.error(f"Background import error: {str(e)}")
-            await bot.send_message(
-                admin_id,
-                f"❌ Import jarayonida xatolik yuz berdi:\n{str(e)}"
-            )
+        row = await self._fetchone(
+            'SELECT COUNT(*) FROM users WHERE is_active = 1'
+        )
+        return row[0] if row else 0
 
 
 if __name__ == "__main__":
@@ -578,5 +1390,6 @@ if __name__ == "__main__":
         db_manager = DatabaseManager()
         await db_manager.init_db()
         print("Database initialized for testing.")
+        await db_manager.close()
 
     asyncio.run(test())
@@ -0,0 +1,406 @@
+"""
+FSM Storage - holat va ma'lumotlar: SQLite da (bot qayta ishga tushsa ham saqlanadi)
+yoki faqat xotirada (hajmi va TTL bilan cheklangan)
+"""
+import asyncio
+import json
+import logging
+import time
+from abc import abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import aiosqlite
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from config import FSM_DB_FILE, FSM_FLUSH_INTERVAL, FSM_MEMORY_MAX_KEYS, FSM_STATE_TTL
+from database.pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+_UNSET = object()
+
+# SQLiteStorage: o'qishda touched shundan eski bo'lsa yangilanadi va bazaga yoziladi (soniya)
+TOUCH_RESOLUTION = 60
+
+
+class FSMRecord:
+    """Bitta kalitning holati, ma'lumotlari va oxirgi ishlatilgan vaqti"""
+
+    __slots__ = ('state', 'data', 'touched')
+
+    def __init__(self, state: Optional[str] = None, data: Optional[Dict[str, Any]] = None, touched: float = 0.0):
+        self.state = state
+        self.data = data if data is not None else {}
+        self.touched = touched
+
+    @property
+    def empty(self) -> bool:
+        return self.state is None and not self.data
+
+
+def storage_key_id(key: StorageKey) -> str:
+    """StorageKey -> jadval kaliti"""
+    return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:{key.destiny}"
+
+
+class _RecordStorage(BaseStorage):
+    """FSMRecord lar ustidagi umumiy BaseStorage metodlari (_get / _put)"""
+
+    @abstractmethod
+    def _get(self, key: StorageKey) -> Optional[FSMRecord]:
+        """Kalit yozuvi (yo'q yoki eskirgan bo'lsa - None)"""
+
+    @abstractmethod
+    def _put(self, key: StorageKey, state: Any = _UNSET, data: Any = _UNSET):
+        """Berilgan maydonlarni yozish (_UNSET - o'zgarmaydi)"""
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        self._put(key, state=state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self._get(key)
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        self._put(key, data=data.copy())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._get(key)
+        return record.data.copy() if record else {}
+
+
+class BoundedMemoryStorage(_RecordStorage):
+    """
+    aiogram MemoryStorage o'rniga - xotira ko'rgan foydalanuvchilar soni bilan o'smaydi
+
+    MemoryStorage har bir kalitni abadiy saqlaydi (til tanlab ketgan
+    foydalanuvchi ham). Bu yerda: bo'sh holat (state yo'q, data bo'sh) darhol
+    o'chiriladi, FSM_STATE_TTL davomida ishlatilmagan holat eskiradi, kalitlar
+    soni FSM_MEMORY_MAX_KEYS dan oshsa - eng uzoq ishlatilmagani chiqariladi
+    (LRU). OrderedDict oxirgi ishlatilish tartibida - tozalash faqat boshidan.
+    """
+
+    def __init__(self, max_keys: int = FSM_MEMORY_MAX_KEYS, ttl: float = FSM_STATE_TTL):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._records: 'OrderedDict[str, FSMRecord]' = OrderedDict()
+        self.expired = 0
+        self.evicted = 0
+
+    async def open(self):
+        """SQLiteStorage bilan bir xil interfeys (ochiladigan narsa yo'q)"""
+
+    async def close(self):
+        self._records.clear()
+
+    def _get(self, key: StorageKey) -> Optional[FSMRecord]:
+        key_id = storage_key_id(key)
+        record = self._records.get(key_id)
+        if record is None:
+            return None
+
+        now = time.time()
+        if now - record.touched > self.ttl:
+            del self._records[key_id]
+            self.expired += 1
+            return None
+        record.touched = now
+        self._records.move_to_end(key_id)
+        return record
+
+    def _put(self, key: StorageKey, state: Any = _UNSET, data: Any = _UNSET):
+        key_id = storage_key_id(key)
+        record = self._get(key) or FSMRecord()
+        if state is not _UNSET:
+            record.state = state
+        if data is not _UNSET:
+            record.data = data
+
+        if record.empty:
+            self._records.pop(key_id, None)
+            return
+
+        now = time.time()
+        record.touched = now
+        self._records[key_id] = record
+        self._records.move_to_end(key_id)
+        self._evict(now)
+
+    def _evict(self, now: float):
+        """Boshidan: avval muddati o'tganlar, keyin chegaradan oshganlar"""
+        records = self._records
+        while records and now - next(iter(records.values())).touched > self.ttl:
+            records.popitem(last=False)
+            self.expired += 1
+        while len(records) > self.max_keys:
+            records.popitem(last=False)
+            self.evicted += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'live': len(self._records),
+            'max_keys': self.max_keys,
+            'expired': self.expired,
+            'evicted': self.evicted,
+        }
+
+
+class SQLiteStorage(_RecordStorage):
+    """
+    aiogram BaseStorage - xotirada issiq nusxa, SQLite da doimiy nusxa
+
+    O'qish faqat xotiradan (ishga tushganda hammasi yuklanadi). Yozish
+    xotirani darhol yangilaydi va kalitni "dirty" deb belgilaydi - fon task
+    FSM_FLUSH_INTERVAL da bir marta barcha o'zgarishlarni bitta tranzaksiyada
+    yozadi (write-behind). Qulasa - oxirgi oraliqdagi o'zgarishlar yo'qoladi.
+
+    FSM_STATE_TTL davomida ishlatilmagan (o'qilmagan ham, yozilmagan ham)
+    holat - tashlab ketilgan ro'yxat - o'chiriladi. O'qish touched ni
+    TOUCH_RESOLUTION aniqlikda yangilaydi: har bir update da yozuv bo'lmaydi,
+    bazadagi vaqt esa xotiradagidan ortda qolmaydi. Alohida faylda
+    (FSM_DB_FILE) - asosiy baza bilan writer navbati bo'lishilmaydi.
+    """
+
+    def __init__(
+        self,
+        db_path: str = FSM_DB_FILE,
+        flush_interval: float = FSM_FLUSH_INTERVAL,
+        ttl: float = FSM_STATE_TTL
+    ):
+        self.pool = ConnectionPool(db_path, size=1)
+        self.flush_interval = flush_interval
+        self.ttl = ttl
+        self._records: Dict[str, FSMRecord] = {}
+        self._dirty: set = set()
+        self._flusher: Optional[asyncio.Task] = None
+        self._last_sweep = 0.0
+        self.flushes = 0
+        self.expired = 0
+        self.unserializable = 0
+
+    async def open(self):
+        """Jadvalni yaratish va tirik holatlarni xotiraga yuklash"""
+        await self.pool.open()
+        await self.pool.transaction(self._create_schema)
+
+        now = time.time()
+        async with self.pool.read() as db:
+            async with db.execute(
+                'SELECT key, state, data, touched FROM fsm_states WHERE touched >= ?',
+                (now - self.ttl,)
+            ) as cursor:
+                async for row in cursor:
+                    self._records[row['key']] = FSMRecord(row['state'], json.loads(row['data']), row['touched'])
+
+        await self.pool.execute('DELETE FROM fsm_states WHERE touched < ?', (now - self.ttl,))
+        self._last_sweep = now
+        self._flusher = asyncio.create_task(self._flush_loop())
+        logger.info(f"FSM storage opened: {len(self._records)} live states")
+
+    @staticmethod
+    async def _create_schema(db: aiosqlite.Connection):
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS fsm_states (
+                key TEXT PRIMARY KEY,
+                state TEXT,
+                data TEXT NOT NULL DEFAULT '{}',
+                touched REAL NOT NULL
+            )
+        ''')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_fsm_states_touched ON fsm_states(touched)')
+
+    async def close(self):
+        """Qolgan o'zgarishlarni yozish va ulanishlarni yopish"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        if self.pool.is_open:
+            await self.flush()
+            await self.pool.close()
+
+    # ==================== HOLATLAR ====================
+
+    def _get(self, key: StorageKey) -> Optional[FSMRecord]:
+        key_id = storage_key_id(key)
+        record = self._records.get(key_id)
+        if record is None:
+            return None
+
+        now = time.time()
+        if now - record.touched > self.ttl:
+            del self._records[key_id]
+            self._dirty.add(key_id)
+            self.expired += 1
+            return None
+        if now - record.touched > TOUCH_RESOLUTION:
+            record.touched = now
+            self._dirty.add(key_id)
+        return record
+
+    def _put(self, key: StorageKey, state: Any = _UNSET, data: Any = _UNSET):
+        key_id = storage_key_id(key)
+        record = self._get(key) or FSMRecord()
+        if state is not _UNSET:
+            record.state = state
+        if data is not _UNSET:
+            record.data = data
+        record.touched = time.time()
+
+        if record.empty:
+            self._records.pop(key_id, None)
+        else:
+            self._records[key_id] = record
+        self._dirty.add(key_id)
+
+    # ==================== WRITE-BEHIND ====================
+
+    async def flush(self):
+        """
+        Dirty kalitlarni bitta tranzaksiyada yozish
+
+        JSON ga aylanmaydigan data (datetime, set ...) li kalit o'tkazib
+        yuboriladi - xotirada qoladi, keyingi o'zgarishida yana urinib
+        ko'riladi. Yozish xatosida barcha kalitlar dirty ga qaytadi.
+        """
+        if not self._dirty:
+            return
+
+        dirty, self._dirty = self._dirty, set()
+        upserts: List[tuple] = []
+        deletes: List[tuple] = []
+        skipped = set()
+        try:
+            for key_id in dirty:
+                record = self._records.get(key_id)
+                if record is None:
+                    deletes.append((key_id,))
+                    continue
+                try:
+                    data = json.dumps(record.data, ensure_ascii=False)
+                except (TypeError, ValueError) as e:
+                    skipped.add(key_id)
+                    self.unserializable += 1
+                    logger.error(f"FSM state {key_id} not persisted, data is not JSON serializable: {e}")
+                    continue
+                upserts.append((key_id, record.state, data, record.touched))
+        except Exception:
+            self._dirty |= dirty
+            raise
+
+        async def write(db: aiosqlite.Connection):
+            if upserts:
+                await db.executemany('''
+                    INSERT INTO fsm_states (key, state, data, touched) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        state = excluded.state, data = excluded.data, touched = excluded.touched
+                ''', upserts)
+            if deletes:
+                await db.executemany('DELETE FROM fsm_states WHERE key = ?', deletes)
+
+        try:
+            await self.pool.transaction(write)
+            self.flushes += 1
+        except BaseException as e:
+            # Keyingi urinishda qayta yoziladi (close() dagi flush ham)
+            self._dirty |= dirty - skipped
+            if not isinstance(e, Exception):
+                raise
+            logger.error(f"FSM storage flush error: {e}")
+
+    def _sweep(self, now: float):
+        """Muddati o'tgan holatlarni xotiradan olib tashlash (bazadan flush da o'chadi)"""
+        expired = [key_id for key_id, record in self._records.items() if now - record.touched > self.ttl]
+        for key_id in expired:
+            del self._records[key_id]
+            self._dirty.add(key_id)
+        self.expired += len(expired)
+        self._last_sweep = now
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                now = time.time()
+                if now - self._last_sweep >= 3600:
+                    self._sweep(now)
+                await self.flush()
+            except Exception as e:
+                # Bitta xato butun saqlashni to'xtatmasin
+                logger.error(f"FSM storage flush loop error: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'live': len(self._records),
+            'dirty': len(self._dirty),
+            'flushes': self.flushes,
+            'expired': self.expired,
+            'unserializable': self.unserializable,
+        }
+
+
+if __name__ == "__main__":
+    # Benchmark: python -m database.fsm_storage [kalitlar]
+    import os
+    import sys
+    import tempfile
+    import tracemalloc
+
+    from aiogram.fsm.storage.memory import MemoryStorage
+
+    async def bench(storage: BaseStorage, keys: List[StorageKey], steps: int) -> float:
+        """Ro'yxatdan o'tishga o'xshash: har bir kalit uchun set_state + update_data + get_data"""
+        start = time.perf_counter()
+        for step in range(steps):
+            for key in keys:
+                await storage.set_state(key, f"RegistrationStates:step{step}")
+                await storage.update_data(key, {f"field{step}": "x" * 20})
+                await storage.get_data(key)
+        return (time.perf_counter() - start) / (steps * len(keys)) * 1e6
+
+    async def main():
+        count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+        steps = 11
+        keys = [StorageKey(bot_id=1, chat_id=i, user_id=i) for i in range(1, count + 1)]
+
+        memory = MemoryStorage()
+        print(f"MemoryStorage: {await bench(memory, keys, steps):.1f} us / qadam")
+        bounded = BoundedMemoryStorage(max_keys=count)
+        print(f"BoundedMemoryStorage: {await bench(bounded, keys, steps):.1f} us / qadam")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'fsm.db')
+            storage = SQLiteStorage(path)
+            await storage.open()
+            per_step = await bench(storage, keys, steps)
+            start = time.perf_counter()
+            await storage.flush()
+            flush_ms = (time.perf_counter() - start) * 1000
+            print(f"SQLiteStorage: {per_step:.1f} us / qadam, flush {len(keys)} kalit: {flush_ms:.0f} ms")
+            await storage.close()
+
+            # Qayta ochilganda holatlar tiklanadi
+            reopened = SQLiteStorage(path)
+            start = time.perf_counter()
+            await reopened.open()
+            print(f"Qayta ochish: {(time.perf_counter() - start) * 1000:.0f} ms, "
+                  f"{len(reopened._records)} holat, "
+                  f"oxirgi kalit: {await reopened.get_state(keys[-1])}, {len(await reopened.get_data(keys[-1]))} maydon")
+            await reopened.close()
+
+        # Xotira: 10x ko'p foydalanuvchi til tanlab ketadi (state qoladi, data bo'sh)
+        for storage in (MemoryStorage(), BoundedMemoryStorage(max_keys=count)):
+            tracemalloc.start()
+            for i in range(1, count * 10 + 1):
+                key = StorageKey(bot_id=1, chat_id=i, user_id=i)
+                await storage.set_state(key, "RegistrationStates:waiting_for_phone")
+                await storage.update_data(key, {'lang': 'uz'})
+                await storage.set_state(key, None)
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            extra = f", {storage.stats()}" if isinstance(storage, BoundedMemoryStorage) else ""
+            print(f"{type(storage).__name__}: {count * 10} foydalanuvchi - {size / 1024 / 1024:.1f} MB{extra}")
+
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+"""
+SQLite ulanishlar puli - doimiy reader ulanishlar va yagona writer
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterable, Optional
+
+import aiosqlite
+
+from config import (
+    DB_FILE,
+    DB_READER_POOL_SIZE,
+    DB_CACHE_SIZE_KB,
+    DB_MMAP_SIZE,
+    DB_BUSY_TIMEOUT_MS
+)
+from database.writer import GroupCommitWriter, WriteFn, WriteResult
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    Uzoq yashovchi aiosqlite ulanishlari
+
+    Har bir ulanish o'z thread'ini ochadi, shuning uchun ular bot ishga
+    tushganda bir marta ochiladi va to'xtaganda yopiladi.
+    """
+
+    def __init__(self, db_path: str = DB_FILE, size: int = DB_READER_POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._readers: Optional[asyncio.Queue] = None
+        self._reader_conns = []
+        self._writer_conn: Optional[aiosqlite.Connection] = None
+        self.writer: Optional[GroupCommitWriter] = None
+        self._open_lock = asyncio.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.writer is not None
+
+    async def _connect(self, readonly: bool) -> aiosqlite.Connection:
+        """Yangi ulanish ochish va PRAGMA larni sozlash"""
+        # Writer tranzaksiyalarni o'zi boshqaradi (BEGIN/COMMIT)
+        conn = await aiosqlite.connect(
+            self.db_path,
+            isolation_level='' if readonly else None
+        )
+        conn.row_factory = aiosqlite.Row
+
+        if not readonly:
+            # WAL rejimi faylda saqlanadi, writer ochilganda bir marta yetarli
+            await conn.execute('PRAGMA journal_mode = WAL')
+
+        await conn.execute('PRAGMA synchronous = NORMAL')
+        await conn.execute(f'PRAGMA cache_size = -{DB_CACHE_SIZE_KB}')
+        await conn.execute(f'PRAGMA mmap_size = {DB_MMAP_SIZE}')
+        await conn.execute('PRAGMA temp_store = MEMORY')
+        await conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+
+        if readonly:
+            await conn.execute('PRAGMA query_only = ON')
+
+        return conn
+
+    async def open(self):
+        """Barcha ulanishlarni ochish"""
+        async with self._open_lock:
+            if self.is_open:
+                return
+
+            # Writer birinchi - WAL rejimini yoqadi
+            self._writer_conn = await self._connect(readonly=False)
+            self.writer = GroupCommitWriter(self._writer_conn)
+            self.writer.start()
+
+            self._readers = asyncio.Queue()
+            for _ in range(self.size):
+                conn = await self._connect(readonly=True)
+                self._reader_conns.append(conn)
+                self._readers.put_nowait(conn)
+
+            logger.info(f"Connection pool opened: {self.db_path} ({self.size} readers + 1 writer)")
+
+    async def close(self):
+        """Barcha ulanishlarni yopish"""
+        async with self._open_lock:
+            if not self.is_open:
+                return
+
+            # Navbatdagi yozishlar commit qilinadi
+            await self.writer.stop()
+            self.writer = None
+
+            for conn in self._reader_conns:
+                await conn.close()
+            self._reader_conns = []
+            self._readers = None
+
+            await self._writer_conn.close()
+            self._writer_conn = None
+
+            logger.info(f"Connection pool closed: {self.db_path}")
+
+    @asynccontextmanager
+    async def read(self):
+        """O'qish uchun ulanish olish"""
+        if not self.is_open:
+            await self.open()
+
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    async def _get_writer(self) -> GroupCommitWriter:
+        if not self.is_open:
+            await self.open()
+        return self.writer
+
+    async def execute(self, sql: str, params: tuple = ()) -> WriteResult:
+        """Bitta yozish so'rovi (writer navbati orqali)"""
+        writer = await self._get_writer()
+        return await writer.execute(sql, params)
+
+    async def executemany(self, sql: str, seq: Iterable[tuple]) -> WriteResult:
+        """Ko'p qatorli yozish (writer navbati orqali)"""
+        writer = await self._get_writer()
+        return await writer.executemany(sql, seq)
+
+    async def transaction(self, fn: WriteFn) -> Any:
+        """fn(conn) ni writer tranzaksiyasi ichida bajarish"""
+        writer = await self._get_writer()
+        return await writer.submit(fn)
+
+    async def run_standalone(self, fn: WriteFn) -> Any:
+        """fn(conn) ni tranzaksiyadan tashqarida bajarish"""
+        writer = await self._get_writer()
+        return await writer.submit(fn, transactional=False)
+
+
+_pools: Dict[str, ConnectionPool] = {}
+
+
+def get_pool(db_path: str = DB_FILE) -> ConnectionPool:
+    """Fayl bo'yicha umumiy pulni olish (har bir fayl uchun bitta)"""
+    pool = _pools.get(db_path)
+    if pool is None:
+        pool = ConnectionPool(db_path)
+        _pools[db_path] = pool
+    return pool
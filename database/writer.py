@@ -0,0 +1,222 @@
+"""
+Yagona writer - barcha yozish so'rovlarini navbat orqali bajarish (group commit)
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Iterable, List, NamedTuple, Optional
+
+import aiosqlite
+
+from config import DB_GROUP_COMMIT_WINDOW_MS, DB_GROUP_COMMIT_MAX_BATCH
+
+logger = logging.getLogger(__name__)
+
+WriteFn = Callable[[aiosqlite.Connection], Awaitable[Any]]
+
+
+class WriteResult(NamedTuple):
+    """Bitta yozish so'rovi natijasi"""
+    lastrowid: Optional[int]
+    rowcount: int
+
+
+class _Job:
+    __slots__ = ('fn', 'future', 'transactional')
+
+    def __init__(self, fn: WriteFn, future: asyncio.Future, transactional: bool):
+        self.fn = fn
+        self.future = future
+        self.transactional = transactional
+
+
+class GroupCommitWriter:
+    """
+    SQLite uchun yagona yozuvchi task
+
+    Navbatdagi so'rovlar bir nechta millisekund ichida yig'iladi va bitta
+    tranzaksiyada commit qilinadi. Har bir so'rov o'z SAVEPOINT ida
+    bajariladi, shuning uchun bittasining xatosi boshqalarga ta'sir qilmaydi.
+    """
+
+    def __init__(
+        self,
+        conn: aiosqlite.Connection,
+        window_ms: float = DB_GROUP_COMMIT_WINDOW_MS,
+        max_batch: int = DB_GROUP_COMMIT_MAX_BATCH
+    ):
+        self.conn = conn
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._carry: Optional[_Job] = None
+
+        # Statistika
+        self.batches = 0
+        self.jobs = 0
+
+    def start(self):
+        """Writer taskni ishga tushirish"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Navbatdagi barcha so'rovlarni bajarib, taskni to'xtatish"""
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+    # ==================== API ====================
+
+    async def submit(self, fn: WriteFn, transactional: bool = True) -> Any:
+        """
+        Ixtiyoriy yozish funksiyasini navbatga qo'yish
+
+        transactional=False bo'lsa, funksiya tranzaksiyadan tashqarida
+        alohida bajariladi (masalan, PRAGMA wal_checkpoint).
+        """
+        if self._task is None:
+            raise RuntimeError("Writer is not running")
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Job(fn, future, transactional))
+        return await future
+
+    async def execute(self, sql: str, params: tuple = ()) -> WriteResult:
+        """Bitta yozish so'rovi"""
+        async def op(conn: aiosqlite.Connection) -> WriteResult:
+            async with conn.execute(sql, params) as cursor:
+                return WriteResult(cursor.lastrowid, cursor.rowcount)
+
+        return await self.submit(op)
+
+    async def executemany(self, sql: str, seq: Iterable[tuple]) -> WriteResult:
+        """Bir xil so'rovni ko'p qatorlar uchun bajarish"""
+        async def op(conn: aiosqlite.Connection) -> WriteResult:
+            async with conn.executemany(sql, seq) as cursor:
+                return WriteResult(cursor.lastrowid, cursor.rowcount)
+
+        return await self.submit(op)
+
+    # ==================== ICHKI ====================
+
+    def _drain(self, batch: List[_Job]) -> bool:
+        """
+        Navbatda turgan so'rovlarni batch ga qo'shish
+
+        Returns:
+            True agar to'xtash signali kelgan bo'lsa
+        """
+        while len(batch) < self.max_batch:
+            try:
+                job = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return False
+            if job is None:
+                return True
+            if not job.transactional:
+                self._carry = job
+                return False
+            batch.append(job)
+        return False
+
+    async def _run(self):
+        stopping = False
+
+        while not stopping:
+            if self._carry is not None:
+                job, self._carry = self._carry, None
+            else:
+                job = await self._queue.get()
+            if job is None:
+                break
+
+            if not job.transactional:
+                await self._run_standalone(job)
+                continue
+
+            # Group commit: parallel kelgan so'rovlarni bitta tranzaksiyaga yig'ish
+            batch = [job]
+            await asyncio.sleep(0)
+            stopping = self._drain(batch)
+
+            # Yuklama bo'lsa, oyna davomida yana kutib turish
+            if len(batch) > 1 and not stopping and self._carry is None and self.window > 0:
+                await asyncio.sleep(self.window)
+                stopping = self._drain(batch)
+
+            await self._commit_batch(batch)
+
+        # Qolgan so'rovlarni ham bajarib chiqish
+        pending = [self._carry] if self._carry is not None else []
+        self._carry = None
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            if job is not None:
+                pending.append(job)
+        for job in pending:
+            if job.transactional:
+                await self._commit_batch([job])
+            else:
+                await self._run_standalone(job)
+
+    async def _run_standalone(self, job: _Job):
+        try:
+            result = await job.fn(self.conn)
+        except Exception as e:
+            _resolve(job, error=e)
+        else:
+            _resolve(job, result=result)
+
+    async def _commit_batch(self, batch: List[_Job]):
+        results = []
+
+        try:
+            await self.conn.execute('BEGIN IMMEDIATE')
+        except Exception as e:
+            logger.error(f"Writer BEGIN error: {e}")
+            for job in batch:
+                _resolve(job, error=e)
+            return
+
+        try:
+            for job in batch:
+                await self.conn.execute('SAVEPOINT job')
+                try:
+                    result = await job.fn(self.conn)
+                    await self.conn.execute('RELEASE job')
+                    results.append((job, result, None))
+                except Exception as e:
+                    await self.conn.execute('ROLLBACK TO job')
+                    await self.conn.execute('RELEASE job')
+                    results.append((job, None, e))
+
+            await self.conn.execute('COMMIT')
+        except Exception as e:
+            logger.error(f"Writer COMMIT error: {e}")
+            try:
+                await self.conn.execute('ROLLBACK')
+            except Exception:
+                pass
+            for job in batch:
+                _resolve(job, error=e)
+            return
+
+        self.batches += 1
+        self.jobs += len(batch)
+
+        # Natijalar faqat commit dan keyin qaytariladi
+        for job, result, error in results:
+            _resolve(job, result=result, error=error)
+
+
+def _resolve(job: _Job, result: Any = None, error: Optional[BaseException] = None):
+    """Chaqiruvchining future ini yakunlash (bekor qilingan bo'lsa o'tkazib yuborish)"""
+    if job.future.done():
+        return
+    if error is not None:
+        job.future.set_exception(error)
+    else:
+        job.future.set_result(result)
@@ -5,6 +5,7 @@ import os
 import logging
 import asyncio
 from aiogram import Router, F, Bot
+from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.types import (
     Message,
@@ -16,6 +17,7 @@ from config import (
     VERIFIED_GROUP_ID,
 )
 from database.db_manager import DatabaseManager
+from middleware.outbound_middleware import PRIORITY_GROUP, outbound_middleware, send_priority
 from states import AdminStates
 from utils.texts import get_text
 from utils.keyboards import (
@@ -25,11 +27,15 @@ from utils.keyboards import (
     broadcast_confirm_inline_keyboard,
     user_management_inline_keyboard,
 )
+from utils.broadcast import broadcast_manager
+from utils.import_jobs import JOB_SHIPMENTS, import_job_manager, receive_import_file
 from utils.formatters import (
     format_phone_display, 
     format_datetime,
     format_verification_status
 )
+from utils.media import send_album, send_template_photo
+from utils.messaging import CAPTION_LIMIT, CardMessageBuilder, truncate_text
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -100,25 +106,25 @@ async def approve_user_callback(callback: CallbackQuery, bot: Bot):
                             ),
                             reply_markup=main_menu_keyboard(user['language'], False)
                         )
-                    except:
-                        logger.warning(f"Could not send approval message to user {user_id}")
+                    except Exception as e:
+                        logger.warning(f"Could not send approval message to user {user_id}: {e}")
 
                     # Xitoy manzilini yuborish
                     try:
                         from config import CHINA_ADDRESS_TEMPLATE, CHINA_ADDRESS_TEMPLATE_TEXT
-                        from aiogram.types import FSInputFile
                         import os
 
                         # Template rasmni yuborish
                         if CHINA_ADDRESS_TEMPLATE and os.path.exists(CHINA_ADDRESS_TEMPLATE):
                             try:
-                                await bot.send_photo(
+                                await send_template_photo(
+                                    bot,
                                     user['telegram_id'],
-                                    FSInputFile(CHINA_ADDRESS_TEMPLATE),
+                                    CHINA_ADDRESS_TEMPLATE,
                                     caption="🇨🇳 Xitoy sklad manzili"
                                 )
-                            except:
-                                pass
+                            except Exception as e:
+                                logger.warning(f"Could not send China address template to user {user_id}: {e}")
 
                         # Manzil matni
                         address_text = CHINA_ADDRESS_TEMPLATE_TEXT.format(
@@ -147,8 +153,9 @@ async def approve_user_callback(callback: CallbackQuery, bot: Bot):
                     except Exception as e:
                         logger.warning(f"Could not send China address to user {user_id}: {e}")
 
-                    # Verified guruhga yuborish
-                    await send_to_verified_group(bot, user)
+                    # Verified guruhga yuborish (guruh navbatida, foydalanuvchi javoblaridan keyin)
+                    with send_priority(PRIORITY_GROUP):
+                        await send_to_verified_group(bot, user)
 
                 # Background taskda yuborish
                 asyncio.create_task(send_notifications())
@@ -156,14 +163,20 @@ async def approve_user_callback(callback: CallbackQuery, bot: Bot):
             # Callback javob
             await callback.answer("✅ Foydalanuvchi tasdiqlandi!", show_alert=True)
             
-            # Xabarni tahrirlash
+            # Xabarni tahrirlash (bitta rasmli arizada tugmalar caption li rasmda)
             try:
-                await callback.message.edit_text(
-                    callback.message.text + "\n\n✅ TASDIQLANDI",
-                    reply_markup=None
-                )
-            except:
-                pass
+                if callback.message.caption is not None:
+                    await callback.message.edit_caption(
+                        caption=truncate_text(callback.message.caption, CAPTION_LIMIT - 20) + "\n\n✅ TASDIQLANDI",
+                        reply_markup=None
+                    )
+                else:
+                    await callback.message.edit_text(
+                        callback.message.text + "\n\n✅ TASDIQLANDI",
+                        reply_markup=None
+                    )
+            except Exception as e:
+                logger.warning(f"Approve message edit error: {e}")
         else:
             await callback.answer("❌ Xatolik yuz berdi!", show_alert=True)
     
@@ -237,8 +250,8 @@ async def process_rejection_reason(message: Message, state: FSMContext, bot: Bot
                     user['telegram_id'],
                     get_text(user['language'], 'registration_rejected', reason=reason)
                 )
-            except:
-                logger.warning(f"Could not send rejection message to user {user_id}")
+            except Exception as e:
+                logger.warning(f"Could not send rejection message to user {user_id}: {e}")
 
         # Asl xabarni yangilash (guruhda yoki private chatda)
         if rejection_message_id and rejection_chat_id:
@@ -250,8 +263,8 @@ async def process_rejection_reason(message: Message, state: FSMContext, bot: Bot
                         message_id=rejection_message_id,
                         reply_markup=None
                     )
-                except:
-                    pass
+                except Exception as e:
+                    logger.warning(f"Rejection markup edit error: {e}")
 
                 # Guruhga rad etilgani haqida xabar yuborish
                 await bot.send_message(
@@ -272,9 +285,7 @@ async def process_rejection_reason(message: Message, state: FSMContext, bot: Bot
 
 
 async def send_to_verified_group(bot: Bot, user: dict):
-    """Tasdiqlangan foydalanuvchini verified guruhga yuborish (RASM BILAN)"""
-    import asyncio
-
+    """Tasdiqlangan foydalanuvchini verified guruhga yuborish (rasmlar albomi, ma'lumotlar caption da)"""
     try:
         text = f"""
 ✅ YANGI TASDIQLANGAN MIJOZ
@@ -290,35 +301,13 @@ async def send_to_verified_group(bot: Bot, user: dict):
 📅 Tasdiqlangan: {format_datetime(user.get('verified_at', 'now'))}
 """
 
-        # Async tasklar ro'yxati
-        tasks = []
-
-        # Pasport rasmlarini yuborish (file_id orqali)
-        if user.get('passport_front_file_id'):
-            tasks.append(
-                bot.send_photo(
-                    VERIFIED_GROUP_ID,
-                    user['passport_front_file_id'],
-                    caption=f"📸 Pasport (OLD) - {user['client_code']}"
-                )
-            )
-
-        # Agar ID card bo'lsa (2 ta rasm)
-        if user.get('passport_back_file_id') and user['passport_back_file_id'] != user.get('passport_front_file_id'):
-            tasks.append(
-                bot.send_photo(
-                    VERIFIED_GROUP_ID,
-                    user['passport_back_file_id'],
-                    caption=f"📸 Pasport (ORQA) - {user['client_code']}"
-                )
-            )
-
-        # Rasmlarni parallel yuborish
-        if tasks:
-            await asyncio.gather(*tasks)
-
-        # Matnni yuborish
-        await bot.send_message(VERIFIED_GROUP_ID, text)
+        # Bitta so'rov: ID card bo'lsa 2 rasmli albom, kitobli pasportda bitta rasm
+        await send_album(
+            bot,
+            VERIFIED_GROUP_ID,
+            [user.get('passport_front_file_id'), user.get('passport_back_file_id')],
+            text.strip()
+        )
 
     except Exception as e:
         logger.error(f"Send to verified group error: {e}")
@@ -335,12 +324,16 @@ async def show_all_users(message: Message, state: FSMContext):
 
     # Foydalanuvchilar soni
     user_count = await db.get_user_count()
+    cache = db.user_cache.stats()
+    outbound = outbound_middleware.stats()
 
     # Statistika
     stats_text = f"""
 📊 FOYDALANUVCHILAR STATISTIKASI
 
 👥 Jami: {user_count} ta
+🗂 Kesh: {cache['size']} ta, {cache['hit_rate']:.0%} so'rov keshdan ({cache['hits']}/{cache['hits'] + cache['misses']})
+📤 Telegram navbati: {outbound['global_waiting']} ta kutmoqda, 429 javoblar: {outbound['retry_after']}
 
 📤 Excel faylni yuklash uchun fayl yuboring.
 """
@@ -443,7 +436,8 @@ async def process_user_search(message: Message, state: FSMContext):
         await message.answer(get_text('uz', 'user_not_found'))
         return
     
-    # Natijalarni ko'rsatish
+    # Natijalarni ko'rsatish - kartalar jamlanadi, tugmalar foydalanuvchi ID si bilan
+    builder = CardMessageBuilder()
     for user in users:
         user_info = get_text(
             'uz', 'admin_user_info',
@@ -458,10 +452,13 @@ async def process_user_search(message: Message, state: FSMContext):
             registered_at=format_datetime(user['registered_at'])
         )
         
-        await message.answer(
+        label = f"#{user['id']}" if len(users) > 1 else ''
+        builder.add(
             user_info,
-            reply_markup=user_management_inline_keyboard(user['id'], 'uz')
+            user_management_inline_keyboard(user['id'], 'uz', label).inline_keyboard
         )
+    
+    await builder.send(message)
 
 
 # ==================== BROADCAST ====================
@@ -509,7 +506,7 @@ async def process_broadcast_message(message: Message, state: FSMContext):
 
 
 @router.callback_query(F.data == "broadcast:confirm")
-async def confirm_broadcast(callback: CallbackQuery, state: FSMContext, bot: Bot):
+async def confirm_broadcast(callback: CallbackQuery, state: FSMContext):
     """Broadcast ni tasdiqlash va yuborish"""
     # Admin tekshiruvi
     if not is_admin(callback.from_user.id):
@@ -526,30 +523,30 @@ async def confirm_broadcast(callback: CallbackQuery, state: FSMContext, bot: Bot
     await callback.answer()
     await callback.message.edit_reply_markup(reply_markup=None)
     
-    # Yuborish jarayoni
-    await callback.message.answer(get_text('uz', 'broadcast_sending'))
-    
-    users = await db.get_all_active_users()
-    
-    sent = 0
-    failed = 0
-    
-    for user in users:
-        try:
-            await bot.send_message(user['telegram_id'], broadcast_text)
-            sent += 1
-            await asyncio.sleep(0.05)  # Rate limit
-        except Exception as e:
-            logger.warning(f"Broadcast to {user['telegram_id']} failed: {e}")
-            failed += 1
-    
-    # Natija
+    # Yuborish fonda - progress alohida xabarda, admin panel band bo'lmaydi
+    await state.update_data(broadcast_message=None)
+    await state.set_state(AdminStates.in_admin_panel)
     await callback.message.answer(
-        get_text('uz', 'broadcast_completed', sent=sent, total=len(users)),
+        get_text('uz', 'broadcast_sending'),
         reply_markup=admin_menu_keyboard('uz')
     )
+    await broadcast_manager.submit(broadcast_text, callback.from_user.id)
+
+
+@router.callback_query(F.data.startswith("broadcast_stop:"))
+async def stop_broadcast(callback: CallbackQuery):
+    """Navbatdagi yoki yuborilayotgan broadcast ni to'xtatish"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ Ruxsat yo'q!", show_alert=True)
+        return
     
-    await state.set_state(AdminStates.in_admin_panel)
+    broadcast_id = int(callback.data.split(":")[1])
+    
+    if await broadcast_manager.cancel(broadcast_id):
+        await callback.answer("⛔ To'xtatilmoqda...")
+    else:
+        await callback.answer("Xabar yuborish allaqachon tugagan", show_alert=True)
+        await callback.message.edit_reply_markup(reply_markup=None)
 
 
 @router.callback_query(F.data == "broadcast:cancel")
@@ -603,30 +600,26 @@ async def process_db_upload(message: Message, state: FSMContext, bot: Bot):
         return
     
     try:
-        # Faylni yuklab olish
-        file = await bot.get_file(doc.file_id)
-        file_path = f"temp_{doc.file_name}"
+        # Faylni yuklab olish (kichik fayl xotirada, katta - import tugaguncha diskda)
+        source = await receive_import_file(bot, doc)
         
-        await bot.download_file(file.file_path, file_path)
+        # Rejim fayl izohidan: "diff" - faqat o'zgarishlar, "diff del" - yo'qlarini o'chirish
+        caption = (message.caption or '').lower().split()
+        incremental = 'diff' in caption
+        remove_missing = incremental and 'del' in caption
         
-        # Import qilish
-        success, msg = await db.import_shipments_from_file(file_path)
-        
-        # Temp faylni o'chirish
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        
-        if success:
-            await message.answer(
-                f"{get_text('uz', 'database_uploaded')}\n{msg}",
-                reply_markup=admin_menu_keyboard('uz')
-            )
-        else:
-            await message.answer(
-                f"{get_text('uz', 'upload_error')}: {msg}",
-                reply_markup=admin_menu_keyboard('uz')
-            )
+        # Import navbatga qo'yiladi - handler kutib qolmaydi, progress alohida xabarda
+        await import_job_manager.submit(
+            JOB_SHIPMENTS,
+            source,
+            message.from_user.id,
+            {'incremental': incremental, 'remove_missing': remove_missing}
+        )
         
+        await message.answer(
+            get_text('uz', 'import_queued'),
+            reply_markup=admin_menu_keyboard('uz')
+        )
         await state.set_state(AdminStates.in_admin_panel)
     
     except Exception as e:
@@ -637,6 +630,37 @@ async def process_db_upload(message: Message, state: FSMContext, bot: Bot):
         )
 
 
+@router.callback_query(F.data.startswith("import_cancel:"))
+async def cancel_import(callback: CallbackQuery):
+    """Navbatdagi yoki bajarilayotgan importni bekor qilish"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ Ruxsat yo'q!", show_alert=True)
+        return
+    
+    job_id = int(callback.data.split(":")[1])
+    
+    if await import_job_manager.cancel(job_id):
+        await callback.answer("⛔ Bekor qilinmoqda...")
+    else:
+        await callback.answer("Import allaqachon tugagan", show_alert=True)
+        await callback.message.edit_reply_markup(reply_markup=None)
+
+
+@router.message(Command('rollback_shipments'))
+async def rollback_shipments(message: Message, state: FSMContext):
+    """Oxirgi yuklangan bazani bekor qilib, oldingisiga qaytish"""
+    if not is_admin(message.from_user.id):
+        await message.answer(get_text('uz', 'access_denied'))
+        return
+    
+    success, msg = await db.rollback_shipments()
+    
+    await message.answer(
+        f"✅ {msg}" if success else f"{get_text('uz', 'upload_error')}: {msg}",
+        reply_markup=admin_menu_keyboard('uz')
+    )
+
+
 # ==================== ADMIN TREK QIDIRISH ====================
 
 @router.message(F.text.in_([
@@ -669,31 +693,32 @@ async def process_admin_search(message: Message, state: FSMContext):
     
     codes = [c.strip() for c in message.text.replace(',', ' ').split() if c.strip()]
     
-    found_any = False
+    # Barcha kodlar bitta so'rovda, javob - kam sonli xabarlarda
+    found, not_found = await db.search_by_tracking_codes(codes)
+    builder = CardMessageBuilder()
+    
+    for code, results in found.items():
+        for item in results:
+            response = f"{get_text('uz', 'shipment_found')} (Trek: {code})\n\n"
+            response += get_text(
+                'uz', 'shipment_details',
+                name=item['shipping_name'],
+                tracking=item['tracking_code'],
+                package=item['package_number'],
+                weight=item['weight'],
+                quantity=item['quantity'],
+                flight=item['flight']
+            )
+            response += f"\n👤 Customer: {item['customer_code']}"
+            
+            builder.add(response)
     
-    for code in codes:
-        results = await db.search_by_tracking_code(code)
-        
-        if results:
-            found_any = True
-            for item in results:
-                response = f"{get_text('uz', 'shipment_found')} (Trek: {code})\n\n"
-                response += get_text(
-                    'uz', 'shipment_details',
-                    name=item['shipping_name'],
-                    tracking=item['tracking_code'],
-                    package=item['package_number'],
-                    weight=item['weight'],
-                    quantity=item['quantity'],
-                    flight=item['flight']
-                )
-                response += f"\n👤 Customer: {item['customer_code']}"
-                
-                await message.answer(response)
-        else:
-            await message.answer(f"{get_text('uz', 'trek_not_found')}: {code}")
+    for code in dict.fromkeys(c for c in codes if c in not_found):
+        builder.add(f"{get_text('uz', 'trek_not_found')}: {code}")
+    
+    await builder.send(message)
     
-    if not found_any:
+    if not found:
         await message.answer("❌ Hech qanday yuk topilmadi")
 
 
@@ -3,20 +3,22 @@ Auth Handlers - Ro'yxatdan o'tish va Login
 """
 import os
 import logging
+from typing import Dict, Optional
+
 from aiogram import Router, F, Bot
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import Message, FSInputFile
+from aiogram.types import Message
 
 from config import (
-    is_admin,
     PASSPORT_TEMPLATE,
     PINFL_TEMPLATE,
     PassportType,
     VERIFICATION_GROUP_ID
 )
 from database.db_manager import DatabaseManager
+from middleware.outbound_middleware import PRIORITY_GROUP, send_priority
 from utils.validators import Validators
 from utils.texts import get_text
 from utils.keyboards import (
@@ -28,6 +30,7 @@ from utils.keyboards import (
     verification_inline_keyboard
 )
 from utils.formatters import format_phone_display, format_verification_status
+from utils.media import send_album, send_template_photo
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -58,29 +61,22 @@ class LoginStates(StatesGroup):
 # ==================== START ====================
 
 @router.message(Command('start'))
-async def cmd_start(message: Message, state: FSMContext):
+async def cmd_start(message: Message, state: FSMContext, user: Optional[Dict], lang: str, is_admin: bool):
     """Start komandasi"""
     await state.clear()
     
     if message.chat.type != "private":
         return
     
-    user_id = message.from_user.id
-    
     # Admin auto-login
-    if is_admin(user_id):
+    if is_admin:
         # Admin uchun alohida handler bor (handlers/admin.py da)
         from handlers.admin import show_admin_panel
         await show_admin_panel(message, state)
         return
     
-    # Oddiy foydalanuvchi
-    is_registered = await db.is_user_registered(user_id)
-    
-    if is_registered:
-        user = await db.get_user_by_telegram_id(user_id)
-        lang = user['language']
-
+    # Oddiy foydalanuvchi (AuthMiddleware allaqachon topgan)
+    if user:
         await state.update_data(language=lang, user_id=user['id'])
 
         # Status xabari
@@ -96,7 +92,7 @@ async def cmd_start(message: Message, state: FSMContext):
                         phone=user['phone'],
                         status=status_text,
                         status_message=status_msg),
-                reply_markup=main_menu_keyboard(lang, is_admin(user_id))
+                reply_markup=main_menu_keyboard(lang, is_admin)
             )
         elif user['verification_status'] == 'rejected':
             status_msg = get_text(lang, 'status_rejected', reason=user['rejection_reason'] or "—")
@@ -124,9 +120,8 @@ async def cmd_start(message: Message, state: FSMContext):
                 reply_markup=ReplyKeyboardRemove()
             )
     else:
-        # Yangi foydalanuvchi
-        data = await state.get_data()
-        lang = data.get('language', 'uz')
+        # Yangi foydalanuvchi (state tozalangan - til standart)
+        lang = 'uz'
         
         await message.answer(
             get_text(lang, 'welcome_new'),
@@ -140,11 +135,8 @@ async def cmd_start(message: Message, state: FSMContext):
     get_text('uz', 'register'),
     get_text('ru', 'register')
 ]))
-async def start_registration(message: Message, state: FSMContext):
+async def start_registration(message: Message, state: FSMContext, lang: str):
     """Ro'yxatdan o'tishni boshlash"""
-    data = await state.get_data()
-    lang = data.get('language', 'uz')
-    
     await state.set_state(RegistrationStates.entering_fullname)
     await message.answer(
         get_text(lang, 'enter_fullname'),
@@ -153,11 +145,8 @@ async def start_registration(message: Message, state: FSMContext):
 
 
 @router.message(RegistrationStates.entering_fullname, F.text)
-async def process_fullname(message: Message, state: FSMContext):
+async def process_fullname(message: Message, state: FSMContext, lang: str):
     """F.I.O ni qabul qilish"""
-    data = await state.get_data()
-    lang = data.get('language', 'uz')
-    
     if message.text == get_text(lang, 'cancel'):
         await state.clear()
         await message.answer(
@@ -182,11 +171,8 @@ async def process_fullname(message: Message, state: FSMContext):
 
 
 @router.message(RegistrationStates.entering_phone, F.text)
-async def process_phone(message: Message, state: FSMContext):
+async def process_phone(message: Message, state: FSMContext, lang: str):
     """Telefon raqamini qabul qilish"""
-    data = await state.get_data()
-    lang = data.get('language', 'uz')
-    
     if message.text == get_text(lang, 'cancel'):
         await state.clear()
         await message.answer(
@@ -211,11 +197,8 @@ async def process_phone(message: Message, state: FSMContext):
 
 
 @router.message(RegistrationStates.selecting_passport_type, F.text)
-async def process_passport_type(message: Message, state: FSMContext):
+async def process_passport_type(message: Message, state: FSMContext, lang: str):
     """Pasport turi tanlash"""
-    data = await state.get_data()
-    lang = data.get('language', 'uz')
-    
     if message.text == get_text(lang, 'cancel'):
         await state.clear()
         await message.answer(
@@ -248,11 +231,8 @@ async def process_passport_type(message: Message, state: FSMContext):
 
 
 @router.message(RegistrationStates.uploading_passport_front, F.photo)
-async def process_passport_front(message: Message, state: FSMContext):
+async def process_passport_front(message: Message, state: FSMContext, lang: str):
     """Pasport old tomonini qabul qilish (ID card)"""
-    data = await state.get_data()
-    lang = data.get('language', 'uz')
-
     try:
         # Eng katta rasmni olish
         photo = message.photo[-1]
@@ -274,11 +254,8 @@ async def process_passport_front(message: Message, state: FSMContext):
 
 
 @router.message(RegistrationStates.uploading_passport_back, F.photo)
-async def process_passport_back(message: Message, state: FSMContext):
+async def process_passport_back(message: Message, state: FSMContext, lang: str):
     """Pasport orqa tomonini qabul qilish (ID card)"""
-    data = await state.get_data()
-    lang = data.get('language', 'uz')
-
     try:
         photo = message.photo[-1]
 
@@ -302,11 +279,8 @@ async def process_passport_back(message: Message, state: FSMContext):
 
 
 @router.message(RegistrationStates.uploading_passport_booklet, F.photo)
-async def process_passport_booklet(message: Message, state: FSMContext):
+async def process_passport_booklet(message: Message, state: FSMContext, lang: str):
     """Pasport rasmini qabul qilish (Kitobli)"""
-    data = await state.get_data()
-    lang = data.get('language', 'uz')
-
     try:
         photo = message.photo[-1]
 
@@ -335,23 +309,22 @@ async def send_passport_template(message: Message, lang: str):
     """Pasport template rasmni yuborish"""
     if os.path.exists(PASSPORT_TEMPLATE):
         try:
-            await message.answer_photo(
-                FSInputFile(PASSPORT_TEMPLATE),
+            await send_template_photo(
+                message.bot,
+                message.chat.id,
+                PASSPORT_TEMPLATE,
                 caption="📸 Pasport seriya va raqami SHU YERDA"
             )
-        except:
-            pass
+        except Exception as e:
+            logger.warning(f"Passport template send error: {e}")
 
 
 # Keyingi qism handlers/auth.py (2/2) da davom etadi...
 # handlers/auth.py ga qo'shish (davomi)
 
 @router.message(RegistrationStates.entering_passport_number, F.text)
-async def process_passport_number(message: Message, state: FSMContext):
+async def process_passport_number(message: Message, state: FSMContext, lang: str):
     """Pasport raqamini qabul qilish"""
-    data = await state.get_data()
-    lang = data.get('language', 'uz')
-    
     if message.text == get_text(lang, 'cancel'):
         await state.clear()
         await message.answer(
@@ -376,11 +349,8 @@ async def process_passport_number(message: Message, state: FSMContext):
 
 
 @router.message(RegistrationStates.entering_birth_date, F.text)
-async def process_birth_date(message: Message, state: FSMContext):
+async def process_birth_date(message: Message, state: FSMContext, lang: str):
     """Tug'ilgan sanani qabul qilish"""
-    data = await state.get_data()
-    lang = data.get('language', 'uz')
-    
     if message.text == get_text(lang, 'cancel'):
         await state.clear()
         await message.answer(
@@ -409,12 +379,14 @@ async def process_birth_date(message: Message, state: FSMContext):
     # PINFL template
     if os.path.exists(PINFL_TEMPLATE):
         try:
-            await message.answer_photo(
-                FSInputFile(PINFL_TEMPLATE),
+            await send_template_photo(
+                message.bot,
+                message.chat.id,
+                PINFL_TEMPLATE,
                 caption="📸 PINFL SHU YERDA"
             )
-        except:
-            pass
+        except Exception as e:
+            logger.warning(f"PINFL template send error: {e}")
     
     await message.answer(
         get_text(lang, 'enter_pinfl'),
@@ -423,11 +395,8 @@ async def process_birth_date(message: Message, state: FSMContext):
 
 
 @router.message(RegistrationStates.entering_pinfl, F.text)
-async def process_pinfl(message: Message, state: FSMContext):
+async def process_pinfl(message: Message, state: FSMContext, lang: str):
     """PINFL ni qabul qilish"""
-    data = await state.get_data()
-    lang = data.get('language', 'uz')
-    
     if message.text == get_text(lang, 'cancel'):
         await state.clear()
         await message.answer(
@@ -452,11 +421,8 @@ async def process_pinfl(message: Message, state: FSMContext):
 
 
 @router.message(RegistrationStates.entering_address, F.text)
-async def process_address(message: Message, state: FSMContext):
+async def process_address(message: Message, state: FSMContext, lang: str):
     """Manzilni qabul qilish"""
-    data = await state.get_data()
-    lang = data.get('language', 'uz')
-    
     if message.text == get_text(lang, 'cancel'):
         await state.clear()
         await message.answer(
@@ -490,10 +456,9 @@ async def process_address(message: Message, state: FSMContext):
 
 
 @router.message(RegistrationStates.confirming_registration, F.text)
-async def confirm_registration(message: Message, state: FSMContext, bot: Bot):
+async def confirm_registration(message: Message, state: FSMContext, bot: Bot, lang: str):
     """Ro'yxatdan o'tishni tasdiqlash"""
     data = await state.get_data()
-    lang = data.get('language', 'uz')
     
     if message.text == get_text(lang, 'confirm'):
         import asyncio
@@ -505,8 +470,9 @@ async def confirm_registration(message: Message, state: FSMContext, bot: Bot):
             # User ni olish
             user = await db.get_user_by_telegram_id(message.from_user.id)
 
-            # Verification guruhga yuborishni background taskda ishlatish
-            asyncio.create_task(send_to_verification_group(bot, user, data))
+            # Verification guruhga yuborishni background taskda ishlatish (guruh navbatida)
+            with send_priority(PRIORITY_GROUP):
+                asyncio.create_task(send_to_verification_group(bot, user, data))
 
             await state.clear()
             await message.answer(
@@ -525,9 +491,12 @@ async def confirm_registration(message: Message, state: FSMContext, bot: Bot):
 
 
 async def send_to_verification_group(bot: Bot, user: dict, data: dict):
-    """Ma'lumotlarni verification guruhga yuborish"""
-    import asyncio
-
+    """
+    Ma'lumotlarni verification guruhga yuborish
+    
+    Pasport rasmlari bitta albom (ma'lumotlar caption da) + tasdiqlash
+    tugmalari bilan qisqa xabar - 3 ta so'rov o'rniga 1-2 ta.
+    """
     try:
         # Matn
         text = f"""
@@ -544,41 +513,18 @@ async def send_to_verification_group(bot: Bot, user: dict, data: dict):
 📅 Ro'yxat: {user['registered_at']}
 """
 
-        # Async tasklar ro'yxati
-        tasks = []
-
-        # Pasport rasmlarini yuborish (file_id orqali)
-        if data.get('passport_front_file_id'):
-            tasks.append(
-                bot.send_photo(
-                    VERIFICATION_GROUP_ID,
-                    data['passport_front_file_id'],
-                    caption="📸 Pasport (OLD)"
-                )
-            )
-
-        if data.get('passport_back_file_id') and data['passport_back_file_id'] != data.get('passport_front_file_id'):
-            tasks.append(
-                bot.send_photo(
-                    VERIFICATION_GROUP_ID,
-                    data['passport_back_file_id'],
-                    caption="📸 Pasport (ORQA)"
-                )
-            )
-
-        # Rasmlarni parallel yuborish
-        if tasks:
-            await asyncio.gather(*tasks)
-
-        # Xabarni yuborish
-        msg = await bot.send_message(
+        # Albom (old va orqa tomon, kitobli pasportda bitta rasm) + tugmalar
+        album, msg = await send_album(
+            bot,
             VERIFICATION_GROUP_ID,
-            text,
-            reply_markup=verification_inline_keyboard(user['id'], 'uz')
+            [data.get('passport_front_file_id'), data.get('passport_back_file_id')],
+            text.strip(),
+            reply_markup=verification_inline_keyboard(user['id'], 'uz'),
+            markup_text=f"👆 {user['fullname']} - {user['client_code']}"
         )
 
-        # Verification queue ga qo'shish
-        await db.add_to_verification_queue(user['id'], msg.message_id)
+        # Verification queue ga qo'shish (ikkala xabar ID si)
+        await db.add_to_verification_queue(user['id'], msg.message_id, album.message_id)
 
     except Exception as e:
         logger.error(f"Send to verification group error: {e}")
@@ -590,11 +536,8 @@ async def send_to_verification_group(bot: Bot, user: dict, data: dict):
     get_text('uz', 'login'),
     get_text('ru', 'login')
 ]))
-async def start_login(message: Message, state: FSMContext):
+async def start_login(message: Message, state: FSMContext, lang: str):
     """Loginni boshlash"""
-    data = await state.get_data()
-    lang = data.get('language', 'uz')
-    
     await state.set_state(LoginStates.entering_client_code)
     await message.answer(
         get_text(lang, 'enter_client_code'),
@@ -603,11 +546,8 @@ async def start_login(message: Message, state: FSMContext):
 
 
 @router.message(LoginStates.entering_client_code, F.text)
-async def process_client_code(message: Message, state: FSMContext):
+async def process_client_code(message: Message, state: FSMContext, lang: str):
     """Mijoz kodini qabul qilish"""
-    data = await state.get_data()
-    lang = data.get('language', 'uz')
-    
     if message.text == get_text(lang, 'cancel'):
         await state.clear()
         await message.answer(
@@ -626,10 +566,9 @@ async def process_client_code(message: Message, state: FSMContext):
 
 
 @router.message(LoginStates.entering_phone_verify, F.text)
-async def process_phone_verify(message: Message, state: FSMContext):
+async def process_phone_verify(message: Message, state: FSMContext, lang: str, is_admin: bool):
     """Telefon raqamini tekshirish va login"""
     data = await state.get_data()
-    lang = data.get('language', 'uz')
     
     if message.text == get_text(lang, 'cancel'):
         await state.clear()
@@ -648,7 +587,7 @@ async def process_phone_verify(message: Message, state: FSMContext):
         
         await message.answer(
             get_text(user['language'], 'login_success', fullname=user['fullname']),
-            reply_markup=main_menu_keyboard(user['language'], is_admin(message.from_user.id))
+            reply_markup=main_menu_keyboard(user['language'], is_admin)
         )
     else:
         await message.answer(get_text(lang, 'login_failed'))
@@ -3,21 +3,26 @@ Search Handlers - Yuklar bo'yicha qidiruv
 """
 import logging
 from site import PREFIXES
+from typing import Dict, Optional, Tuple
+
 from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import Message
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
 
-from config import CLIENT_CODE_PREFIX, is_admin
+from config import CLIENT_CODE_PREFIX, MY_SHIPMENTS_PAGE_SIZE
 from database.db_manager import DatabaseManager
 from utils.texts import get_text
 from utils.keyboards import (
     search_type_keyboard,
     back_keyboard,
-    main_menu_keyboard
+    main_menu_keyboard,
+    shipments_pager_inline_keyboard
 )
 from utils.formatters import format_weight
 from utils.helpers import check_user_approved
+from utils.messaging import CardMessageBuilder
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -38,18 +43,11 @@ class SearchStates(StatesGroup):
     get_text('uz', 'search'),
     get_text('ru', 'search')
 ]))
-async def start_search(message: Message, state: FSMContext):
+async def start_search(message: Message, state: FSMContext, user: Optional[Dict], lang: str, is_admin: bool):
     """Qidirishni boshlash"""
-    # Admin uchun tekshiruv yo'q
-    if is_admin(message.from_user.id):
-        user = await db.get_user_by_telegram_id(message.from_user.id)
-        data = await state.get_data()
-        lang = data.get('language', 'uz')
-    else:
-        # Oddiy foydalanuvchilar uchun tasdiqlangan bo'lishi kerak
-        user, lang, is_approved = await check_user_approved(message, state)
-        if not user or not is_approved:
-            return
+    # Admin uchun tekshiruv yo'q, oddiy foydalanuvchilar uchun tasdiqlangan bo'lishi kerak
+    if not is_admin and not await check_user_approved(message, user, lang):
+        return
     
     await state.set_state(SearchStates.selecting_search_type)
     await message.answer(
@@ -64,11 +62,8 @@ async def start_search(message: Message, state: FSMContext):
     get_text('uz', 'by_trek'),
     get_text('ru', 'by_trek')
 ]))
-async def start_trek_search(message: Message, state: FSMContext):
+async def start_trek_search(message: Message, state: FSMContext, lang: str):
     """Trek kodi bo'yicha qidirishni boshlash"""
-    user = await db.get_user_by_telegram_id(message.from_user.id)
-    lang = user['language']
-    
     await state.set_state(SearchStates.searching_by_trek)
     await message.answer(
         get_text(lang, 'enter_trek_code'),
@@ -77,11 +72,8 @@ async def start_trek_search(message: Message, state: FSMContext):
 
 
 @router.message(SearchStates.searching_by_trek, F.text)
-async def process_trek_search(message: Message, state: FSMContext):
+async def process_trek_search(message: Message, state: FSMContext, user: Optional[Dict], lang: str, is_admin: bool):
     """Trek kodi bo'yicha qidirish"""
-    user = await db.get_user_by_telegram_id(message.from_user.id)
-    lang = user['language']
-    
     if message.text == get_text(lang, 'back'):
         await state.set_state(SearchStates.selecting_search_type)
         await message.answer(
@@ -99,46 +91,46 @@ async def process_trek_search(message: Message, state: FSMContext):
         )
         return
     
-    found_any = False
+    # Barcha kodlar bitta so'rovda, javob - kam sonli xabarlarda
+    found, not_found = await db.search_by_tracking_codes(codes)
+    found_any = bool(found)
+    builder = CardMessageBuilder()
     
-    for code in codes:
-        results = await db.search_by_tracking_code(code)
-        
-        if results:
-            found_any = True
+    for code, results in found.items():
+        for item in results:
             
-            for item in results:
-                
-                # Faqat o'zining yukini ko'rishi mumkin (admin emas bo'lsa)
-                if not is_admin(message.from_user.id):
-                    if item['customer_code'].upper().startswith(CLIENT_CODE_PREFIX) and item['customer_code'].upper().split(CLIENT_CODE_PREFIX)[1].isdigit():
-                        if item['customer_code'].upper() != user['client_code'].upper():
-                            await message.answer(
-                                f"❌ {code} - Bu yuk sizga tegishli emas!" 
-                                if lang == 'uz' else 
-                                f"❌ {code} - Этот груз вам не принадлежит!"
-                            )
-                            continue
-                    else:
-                        pass # Noma'lum prefiksli yuklar uchun cheklov yo'q
-                
-                # Yuk ma'lumotlari
-                response = f"{get_text(lang, 'shipment_found')}\n\n"
-                response += get_text(
-                    lang, 'shipment_details',
-                    name=item['shipping_name'] or "—",
-                    tracking=item['tracking_code'],
-                    package=item['package_number'] or "—",
-                    weight=format_weight(item['weight']),
-                    quantity=item['quantity'],
-                    flight=item['flight'] or "—"
-                )
-                
-                await message.answer(response)
-        else:
-            await message.answer(
-                get_text(lang, 'shipment_not_found', code=code)
+            # Faqat o'zining yukini ko'rishi mumkin (admin emas bo'lsa)
+            if not is_admin:
+                if item['customer_code'].upper().startswith(CLIENT_CODE_PREFIX) and item['customer_code'].upper().split(CLIENT_CODE_PREFIX)[1].isdigit():
+                    if item['customer_code'].upper() != user['client_code'].upper():
+                        builder.add(
+                            f"❌ {code} - Bu yuk sizga tegishli emas!" 
+                            if lang == 'uz' else 
+                            f"❌ {code} - Этот груз вам не принадлежит!"
+                        )
+                        continue
+                else:
+                    pass # Noma'lum prefiksli yuklar uchun cheklov yo'q
+            
+            # Yuk ma'lumotlari
+            response = f"{get_text(lang, 'shipment_found')}\n\n"
+            response += get_text(
+                lang, 'shipment_details',
+                name=item['shipping_name'] or "—",
+                tracking=item['tracking_code'],
+                package=item['package_number'] or "—",
+                weight=format_weight(item['weight']),
+                quantity=item['quantity'],
+                flight=item['flight'] or "—"
             )
+            
+            builder.add(response)
+    
+    # Topilmaganlar - kiritilgan tartibda
+    for code in dict.fromkeys(c for c in codes if c in not_found):
+        builder.add(get_text(lang, 'shipment_not_found', code=code))
+    
+    await builder.send(message)
     
     # if found_any:
     #     try:
@@ -158,55 +150,123 @@ async def process_trek_search(message: Message, state: FSMContext):
     get_text('uz', 'by_my_code'),
     get_text('ru', 'by_my_code')
 ]))
-async def show_my_shipments(message: Message, state: FSMContext):
-    """Foydalanuvchining barcha yuklar"""
-    user = await db.get_user_by_telegram_id(message.from_user.id)
-    lang = user['language']
-    
-    # Foydalanuvchining client_code bo'yicha barcha yuklar
-    results = await db.search_by_customer_code(user['client_code'])
+async def show_my_shipments(message: Message, state: FSMContext, user: Dict, lang: str):
+    """Foydalanuvchi yuklari - birinchi sahifa, qolganlari ◀ ▶ tugmalari bilan"""
+    page = await render_shipments_page(user['client_code'], lang)
     
-    if not results:
+    if page is None:
         await message.answer(
             get_text(lang, 'no_shipments'),
             reply_markup=back_keyboard(lang)
         )
         return
     
-    # Yuklar soni
-    await message.answer(
-        get_text(lang, 'my_shipments', count=len(results))
+    text, keyboard = page
+    await message.answer(text, reply_markup=keyboard)
+
+
+@router.callback_query(F.data.startswith("msp:"))
+async def paginate_my_shipments(callback: CallbackQuery, user: Optional[Dict], lang: str):
+    """Sahifani almashtirish - shu xabar tahrirlanadi"""
+    if not user or user['verification_status'] != 'approved':
+        await callback.answer(get_text(lang, 'my_shipments_expired'), show_alert=True)
+        return
+    
+    try:
+        # Eski tugmalarda avlod yo'q - birinchi sahifa ko'rsatiladi
+        _, direction, cursor, page_number, *generation = callback.data.split(":")
+        cursor, page_number = int(cursor), int(page_number)
+        generation = int(generation[0]) if generation else None
+    except ValueError:
+        await callback.answer()
+        return
+    
+    page = await render_shipments_page(user['client_code'], lang, cursor, direction, page_number, generation)
+    if page is None:
+        await callback.answer(get_text(lang, 'my_shipments_expired'), show_alert=True)
+        return
+    
+    text, keyboard = page
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        if 'message is not modified' not in str(e):
+            logger.error(f"My shipments page edit error: {e}")
+    await callback.answer()
+
+
+async def render_shipments_page(
+    client_code: str,
+    lang: str,
+    cursor: Optional[int] = None,
+    direction: str = 'n',
+    page_number: int = 1,
+    generation: Optional[int] = None
+) -> Optional[Tuple[str, Optional[InlineKeyboardMarkup]]]:
+    """
+    "Mening yuklarim" sahifasi: sarlavha (soni, jami vazn) + kartalar
+    
+    Bazadan faqat bitta sahifa o'qiladi. Kursor boshqa avlodniki bo'lsa
+    (baza qayta yuklangan yoki rollback qilingan - ID lar boshqa qatorlarga
+    tegishli) yoki uning ortida yuk qolmagan bo'lsa - birinchi sahifa.
+    
+    Returns:
+        (matn, klaviatura) yoki yuklar bo'lmasa None
+    """
+    # Avlod sahifadan oldin o'qiladi: orada almashsa, tugmalar eski avlod bilan qoladi
+    current_generation = await db.get_shipments_generation()
+    count, total_weight = await db.get_customer_shipments_summary(client_code)
+    if not count:
+        return None
+    
+    if cursor is not None and generation != current_generation:
+        cursor, page_number = None, 1
+    
+    items, has_prev, has_next = await db.get_customer_shipments_page(
+        client_code, cursor, direction, MY_SHIPMENTS_PAGE_SIZE
     )
+    if not items and cursor is not None:
+        items, has_prev, has_next = await db.get_customer_shipments_page(
+            client_code, limit=MY_SHIPMENTS_PAGE_SIZE
+        )
+        page_number = 1
+    
+    if not items:
+        return None
     
-    # Har bir yukni ko'rsatish
-    for idx, item in enumerate(results, 1):
+    pages = -(-count // MY_SHIPMENTS_PAGE_SIZE)
+    page_number = max(1, min(page_number, pages))
+    
+    builder = CardMessageBuilder(
+        get_text(lang, 'my_shipments', count=count) + "\n" +
+        get_text(
+            lang, 'my_shipments_summary',
+            weight=format_weight(total_weight),
+            page=page_number,
+            pages=pages
+        )
+    )
+    
+    first = (page_number - 1) * MY_SHIPMENTS_PAGE_SIZE
+    for idx, item in enumerate(items, first + 1):
         response = f"📦 #{idx}\n\n"
         response += get_text(
             lang, 'shipment_details',
             name=item['shipping_name'] or "—",
             tracking=item['tracking_code'],
             package=item['package_number'] or "—",
-            weight=format_weight(item['weight']),
+            weight=format_weight(item['weight'] or 0),
             quantity=item['quantity'],
             flight=item['flight'] or "—"
         )
-        
-        await message.answer(response)
-        
-        # Telegram rate limit uchun
-        import asyncio
-        await asyncio.sleep(0.3)
-    
-    # Success sticker
-    # try:
-    #     await message.answer("✅")
-    # except:
-    #     pass
+        builder.add(response)
     
-    await message.answer(
-        "Barcha yuklar ko'rsatildi!" if lang == 'uz' else "Все грузы показаны!",
-        reply_markup=back_keyboard(lang)
+    # Sahifa bitta xabarga sig'adi (MY_SHIPMENTS_PAGE_SIZE kichik) - faqat birinchi bo'lak
+    text, _ = builder.build()[0]
+    keyboard = shipments_pager_inline_keyboard(
+        page_number, items[0]['id'], items[-1]['id'], has_prev, has_next, current_generation
     )
+    return text, keyboard
 
 
 # ==================== ORQAGA ====================
@@ -215,20 +275,12 @@ async def show_my_shipments(message: Message, state: FSMContext):
     get_text('uz', 'back'),
     get_text('ru', 'back')
 ]))
-async def search_back(message: Message, state: FSMContext):
+async def search_back(message: Message, state: FSMContext, lang: str, is_admin: bool):
     """Qidiruvdan orqaga"""
-    user = await db.get_user_by_telegram_id(message.from_user.id)
-    
-    if user:
-        lang = user['language']
-    else:
-        data = await state.get_data()
-        lang = data.get('language', 'uz')
-    
     await state.clear()
     await message.answer(
         get_text(lang, 'back_to_main'),
-        reply_markup=main_menu_keyboard(lang, is_admin(message.from_user.id))
+        reply_markup=main_menu_keyboard(lang, is_admin)
     )
 
 
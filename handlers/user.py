@@ -2,18 +2,20 @@
 User Handlers - Foydalanuvchi funksiyalari
 """
 import logging
+from typing import Dict, Optional
+
 from aiogram import Router, F, Bot
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import Message, FSInputFile
+from aiogram.types import Message
 
 from config import (
-    is_admin,
     CHINA_ADDRESS_TEMPLATE,
     CHINA_ADDRESS_TEMPLATE_TEXT,
     FEEDBACK_GROUP_ID
 )
 from database.db_manager import DatabaseManager
+from middleware.outbound_middleware import PRIORITY_GROUP, send_priority
 from utils.texts import get_text
 from utils.keyboards import (
     main_menu_keyboard,
@@ -27,6 +29,7 @@ from utils.formatters import (
     format_datetime
 )
 from utils.helpers import check_user_approved
+from utils.media import send_template_photo
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -47,11 +50,9 @@ class UserStates(StatesGroup):
     get_text('uz', 'profile'),
     get_text('ru', 'profile')
 ]))
-async def show_profile(message: Message, state: FSMContext):
+async def show_profile(message: Message, state: FSMContext, user: Optional[Dict], lang: str):
     """Profilni ko'rsatish"""
-    user, lang, is_approved = await check_user_approved(message, state)
-
-    if not user or not is_approved:
+    if not await check_user_approved(message, user, lang):
         return
     
     profile_text = get_text(
@@ -88,8 +89,8 @@ async def show_profile(message: Message, state: FSMContext):
                 await message.answer(
                     get_text(lang, 'passport_expiry_warning', expiry_date=user['passport_expiry_date'])
                 )
-        except:
-            pass
+        except ValueError:
+            pass  # Sana boshqa formatda saqlangan
 
 
 # ==================== XITOY MANZILI ====================
@@ -98,11 +99,9 @@ async def show_profile(message: Message, state: FSMContext):
     get_text('uz', 'china_address'),
     get_text('ru', 'china_address')
 ]))
-async def show_china_address(message: Message, state: FSMContext):
+async def show_china_address(message: Message, state: FSMContext, user: Optional[Dict], lang: str):
     """Xitoy sklad manzilini ko'rsatish"""
-    user, lang, is_approved = await check_user_approved(message, state)
-
-    if not user or not is_approved:
+    if not await check_user_approved(message, user, lang):
         return
     
     # Template rasmni yuborish
@@ -115,12 +114,14 @@ async def show_china_address(message: Message, state: FSMContext):
 西安市 雁塔区 丈八沟街道
 高新区丈八六路49号103室中京仓库({user['client_code']})"""
 
-            await message.answer_photo(
-                FSInputFile(CHINA_ADDRESS_TEMPLATE),
+            await send_template_photo(
+                message.bot,
+                message.chat.id,
+                CHINA_ADDRESS_TEMPLATE,
                 caption=caption_text
             )
-        except:
-            pass
+        except Exception as e:
+            logger.warning(f"China address template send error: {e}")
 
     # Agar tasdiqlagan bo'lsa
     if user['china_address_confirmed']:
@@ -132,11 +133,8 @@ async def show_china_address(message: Message, state: FSMContext):
 
 
 @router.message(UserStates.confirming_china_address, F.text)
-async def confirm_china_address(message: Message, state: FSMContext):
+async def confirm_china_address(message: Message, state: FSMContext, user: Dict, lang: str, is_admin: bool):
     """Xitoy manzilini tasdiqlash"""
-    user = await db.get_user_by_telegram_id(message.from_user.id)
-    lang = user['language']
-    
     if message.text in ["✅ Ha", "✅ Да"]:
         # Tasdiqlash
         success = await db.confirm_china_address(user['id'])
@@ -145,7 +143,7 @@ async def confirm_china_address(message: Message, state: FSMContext):
             await state.clear()
             await message.answer(
                 get_text(lang, 'china_address_confirmed'),
-                reply_markup=main_menu_keyboard(lang, is_admin(message.from_user.id))
+                reply_markup=main_menu_keyboard(lang, is_admin)
             )
         else:
             await message.answer(get_text(lang, 'error_general'))
@@ -156,7 +154,7 @@ async def confirm_china_address(message: Message, state: FSMContext):
             "Qaytadan manzilni diqqat bilan ko'rib chiqing." 
             if lang == 'uz' else 
             "Пожалуйста, внимательно проверьте адрес еще раз.",
-            reply_markup=main_menu_keyboard(lang, is_admin(message.from_user.id))
+            reply_markup=main_menu_keyboard(lang, is_admin)
         )
     else:
         await message.answer(
@@ -173,11 +171,9 @@ async def confirm_china_address(message: Message, state: FSMContext):
     get_text('uz', 'feedback'),
     get_text('ru', 'feedback')
 ]))
-async def start_feedback(message: Message, state: FSMContext):
+async def start_feedback(message: Message, state: FSMContext, user: Optional[Dict], lang: str):
     """Feedback yozishni boshlash"""
-    user, lang, is_approved = await check_user_approved(message, state)
-
-    if not user or not is_approved:
+    if not await check_user_approved(message, user, lang):
         return
     
     await state.set_state(UserStates.entering_feedback)
@@ -188,16 +184,13 @@ async def start_feedback(message: Message, state: FSMContext):
 
 
 @router.message(UserStates.entering_feedback, F.text)
-async def process_feedback(message: Message, state: FSMContext, bot: Bot):
+async def process_feedback(message: Message, state: FSMContext, bot: Bot, user: Dict, lang: str, is_admin: bool):
     """Feedbackni qabul qilish va guruhga yuborish"""
-    user = await db.get_user_by_telegram_id(message.from_user.id)
-    lang = user['language']
-    
     if message.text == get_text(lang, 'back'):
         await state.clear()
         await message.answer(
             get_text(lang, 'back_to_main'),
-            reply_markup=main_menu_keyboard(lang, is_admin(message.from_user.id))
+            reply_markup=main_menu_keyboard(lang, is_admin)
         )
         return
     
@@ -212,9 +205,24 @@ async def process_feedback(message: Message, state: FSMContext, bot: Bot):
         await message.answer(get_text(lang, 'error_general'))
         return
     
-    # Feedback guruhga yuborish
-    try:
-        feedback_text = f"""
+    # Feedback guruhga yuborish (guruh navbatida)
+    with send_priority(PRIORITY_GROUP):
+        sent = await send_feedback_to_group(bot, user, message.from_user.id, feedback_id, message.text)
+    
+    if not sent:
+        await message.answer(get_text(lang, 'error_general'))
+        return
+    
+    await state.clear()
+    await message.answer(
+        get_text(lang, 'feedback_sent'),
+        reply_markup=main_menu_keyboard(lang, is_admin)
+    )
+
+
+async def send_feedback_to_group(bot: Bot, user: Dict, telegram_id: int, feedback_id: int, text: str) -> bool:
+    """Feedbackni FEEDBACK_GROUP_ID ga yuborish. Yuborilmasa False qaytaradi"""
+    feedback_text = f"""
 💬 YANGI FEEDBACK
 
 👤 {user['fullname']}
@@ -222,27 +230,18 @@ async def process_feedback(message: Message, state: FSMContext, bot: Bot):
 📱 {format_phone_display(user['phone'])}
 
 📝 Xabar:
-{message.text}
+{text}
 """
-        
+    try:
         await bot.send_message(
             FEEDBACK_GROUP_ID,
             feedback_text,
-            reply_markup=feedback_reply_inline_keyboard(
-                message.from_user.id,
-                feedback_id
-            )
-        )
-        
-        await state.clear()
-        await message.answer(
-            get_text(lang, 'feedback_sent'),
-            reply_markup=main_menu_keyboard(lang, is_admin(message.from_user.id))
+            reply_markup=feedback_reply_inline_keyboard(telegram_id, feedback_id)
         )
-    
+        return True
     except Exception as e:
         logger.error(f"Send feedback to group error: {e}")
-        await message.answer(get_text(lang, 'error_general'))
+        return False
 
 
 # ==================== KONTAKTLAR ====================
@@ -251,16 +250,8 @@ async def process_feedback(message: Message, state: FSMContext, bot: Bot):
     get_text('uz', 'contacts'),
     get_text('ru', 'contacts')
 ]))
-async def show_contacts(message: Message, state: FSMContext):
+async def show_contacts(message: Message, state: FSMContext, lang: str):
     """Kontaktlarni ko'rsatish"""
-    data = await state.get_data()
-    lang = data.get('language', 'uz')
-    
-    # Agar user registered bo'lsa
-    user = await db.get_user_by_telegram_id(message.from_user.id)
-    if user:
-        lang = user['language']
-    
     await message.answer(get_text(lang, 'contact_info'))
 
 
@@ -281,10 +272,8 @@ async def select_language(message: Message, state: FSMContext):
 
 
 @router.message(F.text.in_(["🇺🇿 O'zbek", "🇷🇺 Русский"]))
-async def process_language_selection(message: Message, state: FSMContext):
+async def process_language_selection(message: Message, state: FSMContext, user: Optional[Dict], is_admin: bool):
     """Tilni o'rnatish"""
-    user = await db.get_user_by_telegram_id(message.from_user.id)
-    
     if message.text == "🇺🇿 O'zbek":
         new_lang = 'uz'
     else:
@@ -294,19 +283,11 @@ async def process_language_selection(message: Message, state: FSMContext):
     
     # Database ga saqlash
     if user:
-        import aiosqlite
-        from config import DB_FILE
-        
-        async with aiosqlite.connect(DB_FILE) as db_conn:
-            await db_conn.execute(
-                'UPDATE users SET language = ? WHERE id = ?',
-                (new_lang, user['id'])
-            )
-            await db_conn.commit()
+        await db.update_user_language(user['id'], new_lang)
     
     await message.answer(
         get_text(new_lang, f'language_changed_{new_lang}'),
-        reply_markup=main_menu_keyboard(new_lang, is_admin(message.from_user.id))
+        reply_markup=main_menu_keyboard(new_lang, is_admin)
     )
 
 
@@ -316,12 +297,9 @@ async def process_language_selection(message: Message, state: FSMContext):
     get_text('uz', 'logout'),
     get_text('ru', 'logout')
 ]))
-async def logout(message: Message, state: FSMContext):
+async def logout(message: Message, state: FSMContext, user: Optional[Dict], lang: str):
     """Chiqish"""
-    user = await db.get_user_by_telegram_id(message.from_user.id)
-    
     if user:
-        lang = user['language']
         await message.answer(
             get_text(lang, 'logout_confirm'),
             reply_markup=yes_no_keyboard(lang)
@@ -332,17 +310,13 @@ async def logout(message: Message, state: FSMContext):
 
 
 @router.message(F.text.in_(["✅ Ha", "✅ Да"]))
-async def confirm_logout(message: Message, state: FSMContext):
+async def confirm_logout(message: Message, state: FSMContext, lang: str):
     """Logout ni tasdiqlash"""
-    data = await state.get_data()
-
     # Faqat logout confirm holatida
     current_state = await state.get_state()
     if current_state:
         return
 
-    lang = data.get('language', 'uz')
-
     await state.clear()
 
     from aiogram.types import ReplyKeyboardRemove
@@ -353,60 +327,36 @@ async def confirm_logout(message: Message, state: FSMContext):
 
 
 @router.message(F.text.in_(["❌ Yo'q", "❌ Нет"]))
-async def cancel_logout(message: Message, state: FSMContext):
+async def cancel_logout(message: Message, state: FSMContext, lang: str, is_admin: bool):
     """Logout ni bekor qilish"""
-    user = await db.get_user_by_telegram_id(message.from_user.id)
-
-    if user:
-        lang = user['language']
-    else:
-        data = await state.get_data()
-        lang = data.get('language', 'uz')
-
     await state.clear()
     await message.answer(
         get_text(lang, 'back_to_main'),
-        reply_markup=main_menu_keyboard(lang, is_admin(message.from_user.id))
+        reply_markup=main_menu_keyboard(lang, is_admin)
     )
 
 
 # ==================== BEKOR QILISH ====================
 
 @router.message(F.text.in_([get_text('uz', 'cancel'), get_text('ru', 'cancel')]))
-async def handle_cancel(message: Message, state: FSMContext):
+async def handle_cancel(message: Message, state: FSMContext, lang: str, is_admin: bool):
     """Bekor qilish - har qanday holatdan chiqish"""
-    user = await db.get_user_by_telegram_id(message.from_user.id)
-
-    if user:
-        lang = user['language']
-    else:
-        data = await state.get_data()
-        lang = data.get('language', 'uz')
-
     await state.clear()
     await message.answer(
         get_text(lang, 'operation_cancelled'),
-        reply_markup=main_menu_keyboard(lang, is_admin(message.from_user.id))
+        reply_markup=main_menu_keyboard(lang, is_admin)
     )
 
 
 # ==================== ORQAGA ====================
 
 @router.message(F.text.in_([get_text('uz', 'back'), get_text('ru', 'back')]))
-async def handle_back(message: Message, state: FSMContext):
+async def handle_back(message: Message, state: FSMContext, lang: str, is_admin: bool):
     """Orqaga qaytish"""
-    user = await db.get_user_by_telegram_id(message.from_user.id)
-
-    if user:
-        lang = user['language']
-    else:
-        data = await state.get_data()
-        lang = data.get('language', 'uz')
-
     await state.clear()
     await message.answer(
         get_text(lang, 'back_to_main'),
-        reply_markup=main_menu_keyboard(lang, is_admin(message.from_user.id))
+        reply_markup=main_menu_keyboard(lang, is_admin)
     )
 
 
@@ -6,26 +6,47 @@ import asyncio
 import logging
 import sys
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 
-from config import TOKEN, ensure_directories
+from config import FSM_STORAGE, TOKEN, ensure_directories
 from database.db_manager import DatabaseManager
+from database.fsm_storage import BoundedMemoryStorage, SQLiteStorage
+from middleware.auth_middleware import AuthMiddleware
+from middleware.outbound_middleware import outbound_middleware
 
 # Handlerlarni import qilish
 from handlers import auth, user, admin, search
 from utils import exel_utils
+from utils.broadcast import broadcast_manager
+from utils.import_jobs import import_job_manager
+from utils.process_pool import shutdown_process_pool, warm_up as warm_up_workers
 
 logger = logging.getLogger(__name__)
+db = DatabaseManager()
+
+# FSM holatlari - xotirada; sqlite da fonda data/fsm.db ga ham yoziladi (qayta ishga tushganda tiklanadi)
+fsm_storage = SQLiteStorage() if FSM_STORAGE == 'sqlite' else BoundedMemoryStorage()
 
 
 async def on_startup(bot: Bot):
     """Bot ishga tushganda"""
     logger.info("Bot is starting...")
     
-    # Database ni initialize qilish
-    db = DatabaseManager()
+    # Database ni initialize qilish (ulanishlar puli shu yerda ochiladi)
+    await db.open()
     await db.init_db()
     
+    # FSM holatlarini yuklash
+    await fsm_storage.open()
+    
+    # Import worker jarayonlari uchun forkserver (fonda, loop bloklanmaydi)
+    asyncio.create_task(asyncio.to_thread(warm_up_workers))
+    
+    # Import navbati (to'xtab qolgan ishlar checkpoint dan davom etadi)
+    await import_job_manager.start(bot, db)
+    
+    # Broadcast navbati (yuborilmagan qabul qiluvchilarga davom etadi)
+    await broadcast_manager.start(bot, db)
+    
     logger.info("Database initialized")
     logger.info("Bot started successfully!")
 
@@ -33,6 +54,14 @@ async def on_startup(bot: Bot):
 async def on_shutdown(bot: Bot):
     """Bot to'xtaganda"""
     logger.info("Bot is shutting down...")
+    logger.info(f"User cache stats: {db.user_cache.stats()}")
+    logger.info(f"Outbound stats: {outbound_middleware.stats()}")
+    logger.info(f"FSM storage stats: {fsm_storage.stats()}")
+    await import_job_manager.stop()
+    await broadcast_manager.stop()
+    shutdown_process_pool()
+    await fsm_storage.close()
+    await db.close()
     await bot.session.close()
 
 
@@ -53,7 +82,13 @@ async def main():
     
     # Bot va Dispatcher yaratish
     bot = Bot(token=TOKEN)
-    dp = Dispatcher(storage=MemoryStorage())
+    
+    # Barcha chiquvchi so'rovlar bitta navbatdan: umumiy va chat token bucket lari, RetryAfter
+    bot.session.middleware(outbound_middleware)
+    dp = Dispatcher(storage=fsm_storage)
+
+    # Foydalanuvchi, til va admin belgisi har bir update uchun bir marta (handler larga kwargs)
+    dp.update.outer_middleware(AuthMiddleware(db))
 
     # Handlerlarni ro'yxatdan o'tkazish (tartib muhim!)
     dp.include_router(admin.router)  # Admin birinchi (callback handlerlar uchun)
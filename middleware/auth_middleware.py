@@ -0,0 +1,59 @@
+"""
+Auth Middleware - foydalanuvchi va tilni har bir update uchun bir marta aniqlash
+"""
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.types import TelegramObject, User
+
+from config import is_admin
+from database.db_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+
+class AuthMiddleware(BaseMiddleware):
+    """
+    Handler larga foydalanuvchi kontekstini berish
+
+    user     - users qatori (ro'yxatdan o'tmagan bo'lsa None)
+    lang     - foydalanuvchi tili, bo'lmasa FSM dagi til, bo'lmasa 'uz'
+    is_admin - ADMINS ro'yxatida bormi
+
+    Dispatcher ga outer middleware sifatida ulanadi (dp.update) - aiogram
+    ning o'z FSM middleware idan keyin, shuning uchun state tayyor bo'ladi.
+    Qator user_cache dan olinadi: issiq yo'lda bazaga so'rov yo'q.
+    """
+
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        from_user: User = data.get('event_from_user')
+        user = None
+        lang = 'uz'
+
+        if from_user is not None:
+            try:
+                user = await self.db.get_user_by_telegram_id(from_user.id)
+            except Exception as e:
+                logger.error(f"Auth middleware user lookup error: {e}")
+
+            if user:
+                lang = user['language'] or 'uz'
+            else:
+                state: FSMContext = data.get('state')
+                if state is not None:
+                    lang = (await state.get_data()).get('language', 'uz')
+
+        data['user'] = user
+        data['lang'] = lang
+        data['is_admin'] = from_user is not None and is_admin(from_user.id)
+        return await handler(event, data)
@@ -0,0 +1,201 @@
+"""
+Outbound Middleware - botdan chiqadigan barcha so'rovlar uchun yagona navbat
+"""
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMediaGroup, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from config import (
+    OUTBOUND_CHAT_BUCKETS,
+    OUTBOUND_GLOBAL_RATE,
+    OUTBOUND_GROUP_BURST,
+    OUTBOUND_GROUP_RATE,
+    OUTBOUND_MAX_RETRY_AFTER,
+    OUTBOUND_PRIVATE_BURST,
+    OUTBOUND_PRIVATE_RATE,
+    OUTBOUND_RETRY_ATTEMPTS,
+)
+from utils.rate_limit import PriorityTokenBucket, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Priority sinflari (kichik - oldin)
+PRIORITY_INTERACTIVE = 0   # Foydalanuvchiga javoblar
+PRIORITY_GROUP = 1         # Verification / verified / feedback guruhlariga postlar
+PRIORITY_BROADCAST = 2     # Ommaviy xabarlar
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_GROUP: 'group',
+    PRIORITY_BROADCAST: 'broadcast',
+}
+
+_priority: ContextVar[int] = ContextVar('outbound_priority', default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def send_priority(priority: int):
+    """
+    Blok ichidagi (va undan yaratilgan task lardagi) so'rovlar priority si
+
+        with send_priority(PRIORITY_GROUP):
+            await bot.send_message(VERIFIED_GROUP_ID, text)
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class _PriorityStats:
+    """Bitta priority sinfi bo'yicha hisoblagichlar"""
+
+    __slots__ = ('requests', 'queued', 'peak_queued', 'wait_total', 'wait_max', 'send_total', 'send_max')
+
+    def __init__(self):
+        self.requests = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.send_total = 0.0
+        self.send_max = 0.0
+
+    def as_dict(self) -> Dict:
+        count = self.requests or 1
+        return {
+            'requests': self.requests,
+            'queued': self.queued,
+            'peak_queued': self.peak_queued,
+            'wait_avg_ms': round(self.wait_total / count * 1000, 1),
+            'wait_max_ms': round(self.wait_max * 1000, 1),
+            'send_avg_ms': round(self.send_total / count * 1000, 1),
+            'send_max_ms': round(self.send_max * 1000, 1),
+        }
+
+
+class OutboundMiddleware(BaseRequestMiddleware):
+    """
+    Chatga yuboriladigan har bir so'rov (chat_id bor metodlar) avval chat
+    bucket idan, keyin umumiy bucket dan token oladi
+
+    Shaxsiy chat - OUTBOUND_PRIVATE_RATE, guruh - OUTBOUND_GROUP_RATE
+    (Telegram: guruhga daqiqasiga 20 ta). Umumiy bucket da kutayotganlar
+    priority bo'yicha o'tadi: foydalanuvchi javoblari guruh postlaridan,
+    guruh postlari broadcast dan oldin. RetryAfter kelsa - chat bucket
+    to'xtatiladi va so'rov qayta yuboriladi. Shaxsiy chatlar o'z chegarasidan
+    past yuboriladi - u yerdagi RetryAfter butun bot chegarasi, shuning uchun
+    umumiy bucket ham to'xtatiladi. Broadcast so'rovlari qayta yuborilmaydi:
+    xato BroadcastManager ga qaytadi va u o'z tezligini to'xtatadi.
+
+    Bot sessiyasiga ulanadi: bot.session.middleware(OutboundMiddleware())
+    """
+
+    def __init__(self):
+        self.global_bucket = PriorityTokenBucket(OUTBOUND_GLOBAL_RATE, capacity=OUTBOUND_GLOBAL_RATE)
+        self._chat_buckets: 'OrderedDict[Union[int, str], TokenBucket]' = OrderedDict()
+        self._stats = {priority: _PriorityStats() for priority in PRIORITY_NAMES}
+        self.retry_after_count = 0
+        self.global_pause_count = 0
+
+    @staticmethod
+    def _is_group(chat_id: Union[int, str]) -> bool:
+        # Manfiy ID yoki @username - guruh / kanal
+        return isinstance(chat_id, str) or chat_id < 0
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if self._is_group(chat_id):
+                bucket = TokenBucket(OUTBOUND_GROUP_RATE, capacity=OUTBOUND_GROUP_BURST)
+            else:
+                bucket = TokenBucket(OUTBOUND_PRIVATE_RATE, capacity=OUTBOUND_PRIVATE_BURST)
+            self._chat_buckets[chat_id] = bucket
+            if len(self._chat_buckets) > OUTBOUND_CHAT_BUCKETS:
+                self._chat_buckets.popitem(last=False)
+        else:
+            self._chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    async def _acquire(self, chat_bucket: TokenBucket, cost: int, priority: int, stats: _PriorityStats):
+        stats.queued += 1
+        stats.peak_queued = max(stats.peak_queued, stats.queued)
+        try:
+            await chat_bucket.acquire(cost)
+            await self.global_bucket.acquire(priority)
+        finally:
+            stats.queued -= 1
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ):
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None:
+            # getUpdates, answerCallbackQuery, getFile ... - cheklanmaydi
+            return await make_request(bot, method)
+
+        priority = _priority.get()
+        stats = self._stats.setdefault(priority, _PriorityStats())
+        chat_bucket = self._chat_bucket(chat_id)
+        # Albomdagi har bir rasm guruh chegarasida alohida xabar hisoblanadi
+        cost = len(method.media) if isinstance(method, SendMediaGroup) else 1
+
+        queued_at = time.monotonic()
+        await self._acquire(chat_bucket, cost, priority, stats)
+
+        for attempt in range(1, OUTBOUND_RETRY_ATTEMPTS + 1):
+            started_at = time.monotonic()
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.retry_after_count += 1
+                logger.warning(
+                    f"Flood control on chat {chat_id} ({type(method).__name__}): "
+                    f"retry after {e.retry_after}s (attempt {attempt})"
+                )
+                chat_bucket.pause(e.retry_after)
+                if not self._is_group(chat_id):
+                    self.global_bucket.pause(e.retry_after)
+                    self.global_pause_count += 1
+                if (
+                    priority == PRIORITY_BROADCAST
+                    or attempt == OUTBOUND_RETRY_ATTEMPTS
+                    or e.retry_after > OUTBOUND_MAX_RETRY_AFTER
+                ):
+                    raise
+                await self._acquire(chat_bucket, cost, priority, stats)
+            finally:
+                sent_at = time.monotonic()
+                if attempt == 1:
+                    stats.requests += 1
+                    stats.wait_total += started_at - queued_at
+                    stats.wait_max = max(stats.wait_max, started_at - queued_at)
+                stats.send_total += sent_at - started_at
+                stats.send_max = max(stats.send_max, sent_at - started_at)
+
+    def stats(self) -> Dict:
+        """Navbat chuqurligi va kechikishlar (priority bo'yicha)"""
+        return {
+            **{PRIORITY_NAMES.get(priority, str(priority)): item.as_dict() for priority, item in self._stats.items()},
+            'global_waiting': self.global_bucket.waiting(),
+            'retry_after': self.retry_after_count,
+            'global_pauses': self.global_pause_count,
+            'chat_buckets': len(self._chat_buckets),
+        }
+
+
+# Butun bot uchun bitta (main.py da bot sessiyasiga ulanadi)
+outbound_middleware = OutboundMiddleware()
@@ -0,0 +1,47 @@
+"""
+Umumiy fixture lar va async test lar uchun runner (pytest-asyncio siz)
+"""
+import asyncio
+import inspect
+
+import pytest
+
+from database.db_manager import DatabaseManager
+from utils.process_pool import shutdown_process_pool
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    """async def test_... larni o'z event loop ida ishga tushirish"""
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+    kwargs = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+    asyncio.run(pyfuncitem.obj(**kwargs))
+    return True
+
+
+@pytest.fixture(scope='session', autouse=True)
+def process_pool():
+    """Import worker jarayonlari sessiya oxirida to'xtatiladi"""
+    yield
+    shutdown_process_pool()
+
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    return str(tmp_path / 'cargo.db')
+
+
+@pytest.fixture
+def make_db(db_path):
+    """
+    Vaqtinchalik baza: db = await make_db()
+
+    Ulanishlar test ichida yopilishi kerak (har bir test o'z event loop ida).
+    """
+    async def factory() -> DatabaseManager:
+        db = DatabaseManager(db_path)
+        await db.init_db()
+        return db
+
+    return factory
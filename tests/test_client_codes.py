@@ -0,0 +1,35 @@
+"""
+client_code ajratish - parallel ro'yxatdan o'tishda takrorlanmasligi
+"""
+import asyncio
+
+from database.client_codes import parse_client_code_number
+
+USER_DATA = {
+    'fullname': 'Stress Test',
+    'phone': '998901234567',
+    'passport_number': 'AA1234567',
+    'birth_date': '01.01.1990',
+    'pinfl': '31234567890123',
+    'address': 'Toshkent shahri'
+}
+
+
+async def test_concurrent_registrations_get_unique_codes(make_db):
+    count = 500
+    db = await make_db()
+    try:
+        results = await asyncio.gather(*(
+            db.register_user(10_000_000 + i, USER_DATA)
+            for i in range(count)
+        ))
+    finally:
+        await db.close()
+
+    codes = [code for success, _, code in results if success]
+    assert len(codes) == count
+    assert len(set(codes)) == count
+
+    # Ketma-ket: bo'shliqsiz
+    numbers = sorted(parse_client_code_number(code) for code in codes)
+    assert numbers == list(range(numbers[0], numbers[0] + count))
@@ -0,0 +1,168 @@
+"""
+OutboundMiddleware: priority navbati va RetryAfter (429) pauzalari
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from middleware.outbound_middleware import (
+    PRIORITY_BROADCAST,
+    PRIORITY_GROUP,
+    PRIORITY_INTERACTIVE,
+    OutboundMiddleware,
+    send_priority,
+)
+from utils.broadcast import RECIPIENT_SENT, BroadcastManager
+from utils.rate_limit import PriorityTokenBucket
+
+RETRY_AFTER = 1
+
+
+def flooded_request(calls: list, floods: int = 1, retry_after: float = RETRY_AFTER):
+    """Birinchi floods ta so'rovga 429 qaytaradigan make_request"""
+    async def make_request(bot, method):
+        calls.append((time.monotonic(), method.chat_id))
+        if len(calls) <= floods:
+            raise TelegramRetryAfter(method, 'Too Many Requests', retry_after)
+        return method.chat_id
+
+    return make_request
+
+
+@pytest.fixture
+def fast_groups(monkeypatch):
+    """Guruh bucket i pauzadan keyin daqiqalab emas, darhol to'lsin"""
+    monkeypatch.setattr('middleware.outbound_middleware.OUTBOUND_GROUP_RATE', 20)
+
+
+async def test_replies_and_group_posts_overtake_broadcast():
+    middleware = OutboundMiddleware()
+    middleware.global_bucket = PriorityTokenBucket(20, capacity=1)
+    order = []
+
+    async def make_request(bot, method):
+        order.append(method.text)
+        await asyncio.sleep(0.01)
+
+    async def send(chat_id: int, text: str, priority: int):
+        with send_priority(priority):
+            await middleware(make_request, None, SendMessage(chat_id=chat_id, text=text))
+
+    # Avval 20 ta broadcast navbatga tushadi, keyin guruh posti va javoblar
+    tasks = [asyncio.create_task(send(1000 + i, 'broadcast', PRIORITY_BROADCAST)) for i in range(20)]
+    await asyncio.sleep(0.1)
+    tasks += [asyncio.create_task(send(-100, 'group', PRIORITY_GROUP)) for _ in range(2)]
+    tasks += [asyncio.create_task(send(2000 + i, 'reply', PRIORITY_INTERACTIVE)) for i in range(3)]
+    await asyncio.gather(*tasks)
+
+    replies = [i for i, text in enumerate(order) if text == 'reply']
+    groups = [i for i, text in enumerate(order) if text == 'group']
+    assert len(order) == 25
+    # Navbatga kelganida 2-3 ta broadcast allaqachon ketgan bo'ladi, qolganlari kutadi
+    assert max(replies) < min(groups) < 10
+    assert max(groups) < max(i for i, text in enumerate(order) if text == 'broadcast')
+
+    stats = middleware.stats()
+    assert stats['broadcast']['requests'] == 20
+    assert stats['group']['requests'] == 2
+    assert stats['interactive']['requests'] == 3
+    assert stats['global_waiting'] == 0
+
+
+async def test_requests_without_chat_bypass_buckets():
+    middleware = OutboundMiddleware()
+    middleware.global_bucket.pause(10)
+
+    async def make_request(bot, method):
+        return 'ok'
+
+    method = SimpleNamespace()  # getUpdates kabi - chat_id yo'q
+    assert await asyncio.wait_for(middleware(make_request, None, method), timeout=1) == 'ok'
+
+
+async def test_private_retry_after_pauses_both_buckets_and_retries():
+    middleware = OutboundMiddleware()
+    calls = []
+
+    start = time.monotonic()
+    result = await middleware(flooded_request(calls), None, SendMessage(chat_id=555, text='reply'))
+
+    assert result == 555 and len(calls) == 2
+    assert calls[1][0] - start >= RETRY_AFTER
+    assert middleware.global_bucket._paused_until >= start + RETRY_AFTER
+    assert middleware._chat_buckets[555]._paused_until >= start + RETRY_AFTER
+    assert middleware.stats()['retry_after'] == 1
+    assert middleware.stats()['global_pauses'] == 1
+
+
+async def test_group_retry_after_pauses_only_chat_bucket(fast_groups):
+    middleware = OutboundMiddleware()
+    calls = []
+
+    start = time.monotonic()
+    await middleware(flooded_request(calls), None, SendMessage(chat_id=-100, text='post'))
+
+    assert len(calls) == 2
+    assert middleware._chat_buckets[-100]._paused_until >= start + RETRY_AFTER
+    assert not middleware.global_bucket.paused
+    assert middleware.stats()['global_pauses'] == 0
+
+
+async def test_other_chats_wait_for_global_pause():
+    middleware = OutboundMiddleware()
+    calls = []
+    middleware.global_bucket.pause(RETRY_AFTER)  # Boshqa shaxsiy chatdagi 429 dan
+
+    start = time.monotonic()
+    await middleware(flooded_request(calls, floods=0), None, SendMessage(chat_id=556, text='reply'))
+    assert calls[-1][1] == 556
+    assert calls[-1][0] - start >= RETRY_AFTER * 0.95
+
+
+async def test_retry_after_gives_up_after_attempt_limit(fast_groups, monkeypatch):
+    monkeypatch.setattr('middleware.outbound_middleware.OUTBOUND_RETRY_ATTEMPTS', 2)
+    middleware = OutboundMiddleware()
+    calls = []
+
+    with pytest.raises(TelegramRetryAfter):
+        await middleware(flooded_request(calls, floods=5, retry_after=0.1), None, SendMessage(chat_id=-100, text='post'))
+    assert len(calls) == 2
+
+
+async def test_long_retry_after_is_not_waited_out(monkeypatch):
+    monkeypatch.setattr('middleware.outbound_middleware.OUTBOUND_MAX_RETRY_AFTER', 0.5)
+    middleware = OutboundMiddleware()
+    calls = []
+
+    with pytest.raises(TelegramRetryAfter):
+        await middleware(flooded_request(calls), None, SendMessage(chat_id=-100, text='post'))
+    assert len(calls) == 1
+
+
+async def test_broadcast_retry_after_is_left_to_broadcast_manager():
+    middleware = OutboundMiddleware()
+    manager = BroadcastManager()
+    calls = []
+    make_request = flooded_request(calls)
+
+    async def send_message(chat_id, text):
+        return await middleware(make_request, None, SendMessage(chat_id=chat_id, text=text))
+
+    manager.bot = SimpleNamespace(send_message=send_message)
+    broadcast = SimpleNamespace(id=1, text='broadcast')
+
+    start = time.monotonic()
+    with send_priority(PRIORITY_BROADCAST):
+        results = await asyncio.gather(*(manager._deliver(broadcast, 1000 + i) for i in range(10)))
+
+    assert results == [RECIPIENT_SENT] * 10
+    # Middleware qayta urinmaydi: 10 xabar + bitta 429
+    assert len(calls) == 11
+    assert middleware.stats()['broadcast']['requests'] == 11
+    assert manager.bucket._paused_until >= start + RETRY_AFTER
+    assert all(at - start >= RETRY_AFTER for at, _ in calls[1:])
+    assert calls[-1][0] - calls[1][0] >= 9 / manager.bucket.rate * 0.9
@@ -0,0 +1,86 @@
+"""
+TokenBucket va PriorityTokenBucket: tezlik, pauza va priority navbati
+"""
+import asyncio
+import time
+
+from utils.rate_limit import PriorityTokenBucket, TokenBucket
+
+
+async def test_token_bucket_keeps_rate_with_parallel_senders():
+    bucket = TokenBucket(50, capacity=1)
+    sent = []
+
+    async def worker(count: int):
+        for _ in range(count):
+            await bucket.acquire()
+            sent.append(time.monotonic())
+            await asyncio.sleep(0.01)  # Telegram javobi
+
+    start = time.monotonic()
+    await asyncio.gather(*(worker(5) for _ in range(10)))
+
+    # Birinchi token tayyor, qolgan 49 tasi 50/s tezlikda
+    assert len(sent) == 50
+    assert sent[-1] - start >= 49 / 50 * 0.95
+
+
+async def test_token_bucket_capacity_allows_burst():
+    bucket = TokenBucket(1, capacity=3)
+    start = time.monotonic()
+    for _ in range(3):
+        await bucket.acquire()
+    assert time.monotonic() - start < 0.1
+
+
+async def test_token_bucket_pause_blocks_acquire():
+    bucket = TokenBucket(100)
+    bucket.pause(0.3)
+    assert bucket.paused
+
+    start = time.monotonic()
+    await bucket.acquire()
+    assert time.monotonic() - start >= 0.3 * 0.95
+    assert not bucket.paused
+
+
+async def test_priority_bucket_serves_lower_priority_first():
+    bucket = PriorityTokenBucket(20, capacity=1)
+    await bucket.acquire()  # Chelak bo'shaydi - qolganlar navbatga tushadi
+    order = []
+
+    async def take(priority: int, name: str):
+        await bucket.acquire(priority)
+        order.append(name)
+
+    tasks = [asyncio.create_task(take(2, f"broadcast{i}")) for i in range(3)]
+    await asyncio.sleep(0)
+    tasks += [asyncio.create_task(take(0, 'reply')), asyncio.create_task(take(1, 'group'))]
+    await asyncio.sleep(0)
+    assert bucket.waiting() == 5
+
+    await asyncio.gather(*tasks)
+    assert order == ['reply', 'group', 'broadcast0', 'broadcast1', 'broadcast2']
+    assert bucket.waiting() == 0
+
+
+async def test_priority_bucket_pause_holds_queue():
+    bucket = PriorityTokenBucket(100, capacity=1)
+    bucket.pause(0.3)
+
+    start = time.monotonic()
+    await asyncio.gather(*(bucket.acquire(priority) for priority in (2, 0, 1)))
+    assert time.monotonic() - start >= 0.3 * 0.95
+
+
+async def test_priority_bucket_skips_cancelled_waiter():
+    bucket = PriorityTokenBucket(20, capacity=1)
+    await bucket.acquire()
+
+    cancelled = asyncio.create_task(bucket.acquire(0))
+    waiting = asyncio.create_task(bucket.acquire(1))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    await asyncio.wait_for(waiting, timeout=1)
+    assert bucket.waiting() == 0
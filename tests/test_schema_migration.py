@@ -0,0 +1,36 @@
+"""
+_migrate_schema: bir martalik tuzatishlar har init_db da takrorlanmaydi
+"""
+from database.db_manager import SCHEMA_VERSION, DatabaseManager
+
+
+async def reopen(db_path) -> int:
+    db = DatabaseManager(db_path)
+    try:
+        await db.init_db()
+        return (await db._fetchone('PRAGMA user_version'))[0]
+    finally:
+        await db.close()
+
+
+async def test_code_repair_runs_once(make_db, db_path, monkeypatch):
+    db = await make_db()
+    try:
+        assert (await db._fetchone('PRAGMA user_version'))[0] == SCHEMA_VERSION
+        await db.pool.execute('PRAGMA user_version = 0')  # Tuzatishdan oldingi baza
+    finally:
+        await db.close()
+
+    calls = []
+
+    async def normalize(connection, where=''):
+        calls.append(where)
+        return 0
+
+    monkeypatch.setattr(DatabaseManager, '_normalize_shipment_codes', staticmethod(normalize))
+
+    assert await reopen(db_path) == SCHEMA_VERSION
+    assert len(calls) == 1 and 'GLOB' in calls[0]
+
+    assert await reopen(db_path) == SCHEMA_VERSION
+    assert len(calls) == 1
@@ -0,0 +1,44 @@
+"""
+Yuklar importi - fayl worker jarayonida o'qiladi, event loop bloklanmaydi
+"""
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+
+async def test_full_import_keeps_event_loop_responsive(make_db, tmp_path):
+    count = 50_000
+    path = tmp_path / 'manifest.csv'
+    pd.DataFrame({
+        'Shipment Tracking Code': [f"YT{i:012d}" for i in range(count)],
+        'Package Number': np.arange(count) % 50,
+        'Weight/KG': np.round(np.random.rand(count) * 30, 2),
+        'Quantity': np.random.randint(1, 10, count),
+        'Customer code': [f"AKB{600 + i % 3000}" for i in range(count)],
+    }).to_csv(path, index=False)
+
+    db = await make_db()
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker(interval: float = 0.01):
+        loop = asyncio.get_running_loop()
+        while not done.is_set():
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            lags.append(max(0.0, loop.time() - expected))
+
+    task = asyncio.create_task(ticker())
+    try:
+        success, msg = await db.import_shipments_from_file(str(path))
+        done.set()
+        await task
+        assert success, msg
+        assert await db.get_shipment_count() == count
+    finally:
+        done.set()
+        await db.close()
+
+    # Sekin mashinada ham: loop hech qachon uzoq to'xtamaydi
+    assert max(lags) < 0.5, f"event loop blocked for {max(lags) * 1000:.0f} ms"
@@ -0,0 +1,94 @@
+"""
+Incremental (diff) import hisoblagichlari
+"""
+from database.db_manager import SHIPMENT_INSERT_COLUMNS
+from utils.shipment_import import ShipmentImportStats
+
+
+def shipment_row(tracking: str, weight: float, customer: str = 'AKB601') -> tuple:
+    row = {
+        'tracking_code': tracking,
+        'shipping_name': None,
+        'package_number': '1',
+        'weight': weight,
+        'quantity': 1,
+        'flight': None,
+        'customer_code': customer,
+        'tracking_code_norm': tracking.upper(),
+        'customer_code_norm': customer.upper(),
+    }
+    return tuple(row[column] for column in SHIPMENT_INSERT_COLUMNS)
+
+
+async def merge(db, rows, remove_missing: bool = False):
+    stats = ShipmentImportStats()
+    stats.add(len(rows), rows, [])
+
+    async def batches():
+        yield rows
+
+    return await db._merge_shipments('diff.csv', batches(), stats, remove_missing)
+
+
+async def seed(db, rows):
+    columns = ', '.join(SHIPMENT_INSERT_COLUMNS)
+    await db.pool.executemany(
+        f"INSERT INTO shipments ({columns}) VALUES ({', '.join('?' * len(SHIPMENT_INSERT_COLUMNS))})",
+        rows
+    )
+
+
+async def test_counts_are_per_incoming_row_with_duplicate_keys(make_db):
+    db = await make_db()
+    try:
+        # A va B shipments da ikki martadan
+        await seed(db, [
+            shipment_row('A', 1.0), shipment_row('A', 1.0),
+            shipment_row('B', 2.0), shipment_row('B', 2.5),
+            shipment_row('C', 3.0), shipment_row('D', 4.0),
+        ])
+
+        diff = await merge(db, [
+            shipment_row('A', 1.0),   # o'zgarmagan (ikkala nusxa ham teng)
+            shipment_row('B', 9.0),   # o'zgargan (ikki qator yangilanadi)
+            shipment_row('C', 3.5),   # o'zgargan
+            shipment_row('D', 4.0),   # o'zgarmagan
+            shipment_row('E', 5.0),   # yangi
+        ])
+
+        assert diff == {'inserted': 1, 'updated': 2, 'unchanged': 2, 'removed': 0}
+        row = await db._fetchone('''
+            SELECT inserted_count, updated_count, unchanged_count, removed_count
+            FROM shipment_imports WHERE mode = 'diff'
+        ''')
+        assert tuple(row) == (1, 2, 2, 0)
+
+        weights = await db._fetchall("SELECT weight FROM shipments WHERE tracking_code_norm = 'B'")
+        assert [row[0] for row in weights] == [9.0, 9.0]
+    finally:
+        await db.close()
+
+
+async def test_partially_equal_duplicates_count_as_updated(make_db):
+    db = await make_db()
+    try:
+        await seed(db, [shipment_row('A', 1.0), shipment_row('A', 2.0)])
+
+        diff = await merge(db, [shipment_row('A', 1.0)])
+
+        assert diff == {'inserted': 0, 'updated': 1, 'unchanged': 0, 'removed': 0}
+    finally:
+        await db.close()
+
+
+async def test_remove_missing(make_db):
+    db = await make_db()
+    try:
+        await seed(db, [shipment_row('A', 1.0), shipment_row('B', 2.0), shipment_row('B', 2.0)])
+
+        diff = await merge(db, [shipment_row('A', 1.0)], remove_missing=True)
+
+        assert diff == {'inserted': 0, 'updated': 0, 'unchanged': 1, 'removed': 2}
+        assert await db.get_shipment_count() == 1
+    finally:
+        await db.close()
@@ -0,0 +1,117 @@
+"""
+"Mening yuklarim" sahifalari: kursor va yuklar avlodi
+"""
+import pandas as pd
+import pytest
+
+from handlers import search
+
+
+def write_manifest(path, prefix: str, count: int):
+    pd.DataFrame({
+        'Shipment Tracking Code': [f"{prefix}{i:06d}" for i in range(count)],
+        'Package Number': [1] * count,
+        'Weight/KG': [1.5] * count,
+        'Quantity': [1] * count,
+        'Customer code': ['AKB601'] * count,
+    }).to_csv(path, index=False)
+
+
+def next_button(keyboard) -> tuple:
+    """▶ tugmasi: (kursor, sahifa, avlod)"""
+    _, direction, cursor, page, generation = keyboard.inline_keyboard[0][-1].callback_data.split(':')
+    assert direction == 'n'
+    return int(cursor), int(page), int(generation)
+
+
+@pytest.fixture
+def import_manifest(tmp_path):
+    async def run(db, prefix: str, count: int, incremental: bool = False):
+        path = tmp_path / f"{prefix}.csv"
+        write_manifest(path, prefix, count)
+        success, msg = await db.import_shipments_from_file(str(path), incremental=incremental)
+        assert success, msg
+
+    return run
+
+
+async def test_cursor_pages_within_generation(make_db, import_manifest, monkeypatch):
+    db = await make_db()
+    monkeypatch.setattr(search, 'db', db)
+    try:
+        await import_manifest(db, 'OLD', 25)
+
+        text, keyboard = await search.render_shipments_page('AKB601', 'uz')
+        cursor, page, generation = next_button(keyboard)
+        assert generation == await db.get_shipments_generation() > 0
+
+        text, _ = await search.render_shipments_page('AKB601', 'uz', cursor, 'n', page, generation)
+        assert 'OLD000014' in text and 'OLD000024' not in text
+        assert '2/3' in text
+    finally:
+        await db.close()
+
+
+async def test_old_cursor_after_new_generation_falls_back_to_first_page(make_db, import_manifest, monkeypatch):
+    db = await make_db()
+    monkeypatch.setattr(search, 'db', db)
+    try:
+        await import_manifest(db, 'OLD', 25)
+        _, keyboard = await search.render_shipments_page('AKB601', 'uz')
+        cursor, page, generation = next_button(keyboard)
+
+        # Yangi avlodda ID lar 1 dan qayta boshlanadi - eski kursor boshqa qatorlarga tushardi
+        await import_manifest(db, 'NEW', 40)
+        new_generation = await db.get_shipments_generation()
+        assert new_generation != generation
+
+        text, keyboard = await search.render_shipments_page('AKB601', 'uz', cursor, 'n', page, generation)
+        assert 'NEW000039' in text and 'NEW000029' not in text
+        assert '1/4' in text
+        assert next_button(keyboard)[1:] == (2, new_generation)
+
+        # Avlodsiz eski tugma ham birinchi sahifaga tushadi
+        text, _ = await search.render_shipments_page('AKB601', 'uz', cursor, 'n', page)
+        assert 'NEW000039' in text and '1/4' in text
+    finally:
+        await db.close()
+
+
+async def test_rollback_changes_generation(make_db, import_manifest, monkeypatch):
+    db = await make_db()
+    monkeypatch.setattr(search, 'db', db)
+    try:
+        await import_manifest(db, 'OLD', 25)
+        old_generation = await db.get_shipments_generation()
+        await import_manifest(db, 'NEW', 40)
+        new_generation = await db.get_shipments_generation()
+
+        success, _ = await db.rollback_shipments()
+        assert success
+        assert await db.get_shipments_generation() == old_generation
+
+        text, _ = await search.render_shipments_page('AKB601', 'uz', 30, 'n', 2, new_generation)
+        assert 'OLD000024' in text and '1/3' in text
+    finally:
+        await db.close()
+
+
+async def test_rollback_refused_after_merged_import(make_db, import_manifest):
+    db = await make_db()
+    try:
+        await import_manifest(db, 'OLD', 25)
+        await import_manifest(db, 'NEW', 40)
+        await import_manifest(db, 'ADD', 5, incremental=True)
+
+        # Almashtirish ADD qatorlarini jimgina yo'qotardi
+        success, msg = await db.rollback_shipments()
+        assert not success and 'qayta yuklang' in msg
+        assert await db.get_shipment_count() == 45
+
+        # Keyingi to'liq import dan so'ng qaytish yana ishlaydi
+        await import_manifest(db, 'FULL', 10)
+        success, _ = await db.rollback_shipments()
+        assert success
+        assert await db.get_shipment_count() == 45
+    finally:
+        await db.close()
@@ -0,0 +1,57 @@
+"""
+Foydalanuvchilar importi: davom ettirilganda ham fayldagi takrorlar aniqlanadi
+"""
+import pandas as pd
+
+from utils.excel import iter_user_batches
+from utils.validators import REASON_TEXTS, Validators
+
+
+def valid_pinfl(number: int) -> str:
+    """Nazorat raqami to'g'ri PINFL"""
+    prefix = f"3010199{number:06d}"
+    return next(
+        prefix + digit for digit in '0123456789'
+        if Validators.validate_pinfl(prefix + digit)[0]
+    )
+
+
+def write_users(path, codes):
+    pd.DataFrame({
+        'code_str': codes,
+        'fullname_passport': [f"User {i}" for i in range(len(codes))],
+        'passport_series': [f"AA{i:07d}" for i in range(len(codes))],
+        'birth_date': ['1990-01-01'] * len(codes),
+        'address_region': ['Toshkent'] * len(codes),
+        'phone_number': ['901234567'] * len(codes),
+        'passport_pinfl': [valid_pinfl(i) for i in range(len(codes))],
+    }).to_csv(path, index=False)
+
+
+def collect(path, skip_rows: int = 0):
+    valid, failed = {}, {}
+    for batch_valid, batch_failed in iter_user_batches(str(path), 3, skip_rows):
+        valid.update((number, user['client_code']) for number, _, user in batch_valid)
+        failed.update((number, reason) for number, _, reason in batch_failed)
+    return valid, failed
+
+
+def test_resume_still_rejects_duplicates_of_processed_rows(tmp_path):
+    path = tmp_path / 'users.csv'
+    # Fayldagi 8-qator - checkpoint dan oldingi AKB1 ning takrori
+    write_users(path, ['AKB1', 'AKB2', 'AKB3', 'AKB4', 'AKB5', 'AKB6', 'akb1', 'AKB8'])
+
+    full_valid, full_failed = collect(path)
+    valid, failed = collect(path, skip_rows=4)
+
+    assert failed == {8: REASON_TEXTS['code_duplicate']}
+    assert valid == {6: 'AKB5', 7: 'AKB6', 9: 'AKB8'}
+    # Davom ettirish - to'liq o'tishning checkpoint dan keyingi qismi bilan bir xil
+    assert valid == {number: code for number, code in full_valid.items() if number >= 6}
+    assert failed == full_failed
+
+
+def test_resume_after_last_row_yields_nothing(tmp_path):
+    path = tmp_path / 'users.csv'
+    write_users(path, ['AKB1', 'AKB2'])
+    assert collect(path, skip_rows=2) == ({}, {})
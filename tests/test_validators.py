@@ -0,0 +1,77 @@
+"""
+Validatorlar - ro'yxatdan o'tish (Validators) va Excel importi (BatchValidators)
+bir xil qiymatga bir xil javob berishi
+"""
+import pandas as pd
+import pytest
+
+from utils.validators import BatchValidators, Validators
+
+PHONES = [
+    '+998 90 123-45-67', '998901234567', '901234567', '(90) 123 45 67', '8901234567',
+    '99890123456', '+998 90 12a 45 67', '+998 (90) 123.45.67', '90.123.45.67', '', '  ',
+]
+PASSPORTS = [
+    'AA1234567', 'aa 1234567', 'AB-1234567', 'KA1234567', 'AC1234567', 'AA123456',
+    'AA12345678', 'AA12345X7', 'K11234567', 'ABA123456', '1234567', '',
+]
+PINFLS = [
+    '30101990000014', '3010 1990 0000 14', '30101990000010', '20101990000011',
+    '3010199000001', '3010199000001X', '', 'nan',
+]
+
+CASES = [
+    *[(BatchValidators.phones, Validators.validate_phone, value) for value in PHONES],
+    *[(BatchValidators.passport_series, Validators.validate_passport_number, value) for value in PASSPORTS],
+    *[(BatchValidators.pinfls, Validators.validate_pinfl, value) for value in PINFLS],
+]
+
+
+@pytest.mark.parametrize('batch, scalar, value', CASES, ids=[repr(case[2]) for case in CASES])
+def test_scalar_and_batch_agree(batch, scalar, value):
+    clean, reasons = batch(pd.Series([value], dtype=object))
+    valid, _, scalar_clean = scalar(value)
+
+    assert valid == (reasons[0] == '')
+    if valid:
+        assert scalar_clean == clean[0]
+
+
+def test_batch_matches_scalar_row_by_row():
+    """Ustun bo'lib tekshirilganda ham har bir qator natijasi o'zgarmaydi"""
+    for batch, scalar, values in (
+        (BatchValidators.phones, Validators.validate_phone, PHONES),
+        (BatchValidators.passport_series, Validators.validate_passport_number, PASSPORTS),
+        (BatchValidators.pinfls, Validators.validate_pinfl, PINFLS),
+    ):
+        clean, reasons = batch(pd.Series(values, dtype=object))
+        for value, batch_clean, reason in zip(values, clean, reasons):
+            valid, _, scalar_clean = scalar(value)
+            assert valid == (reason == ''), value
+            assert not valid or scalar_clean == batch_clean, value
+
+
+@pytest.mark.parametrize('value', ['+998 (90) 123.45.67', '90.123.45.67', '+998 90 123-45-67', '901234567'])
+def test_phone_is_stored_as_digits(value):
+    assert Validators.validate_phone(value) == (True, "OK", '998901234567')
+
+
+def test_phone_from_excel_number():
+    clean, reasons = BatchValidators.phones(pd.Series([998901234567.0, 'x', None], dtype=object))
+    assert clean[0] == '998901234567' and reasons[0] == ''
+    assert list(reasons[1:]) == ['phone_empty', 'phone_empty']
+
+
+@pytest.mark.parametrize('value, valid', [
+    ('AA1234567', True), ('ka1234567', True), ('AC1234567', False),
+    ('ABA123456', False), ('AA123456', False),
+])
+def test_passport_rules(value, valid):
+    assert Validators.validate_passport_number(value)[0] is valid
+
+
+@pytest.mark.parametrize('value, valid', [
+    ('30101990000014', True), ('30101990000010', False), ('20101990000011', False),
+])
+def test_pinfl_first_digit_and_checksum(value, valid):
+    assert Validators.validate_pinfl(value)[0] is valid
@@ -0,0 +1,327 @@
+"""
+Broadcast - barcha faol foydalanuvchilarga xabar yuborish fonda
+
+Yuborish umumiy token bucket (BROADCAST_RATE xabar/s) ostida, cheklangan
+parallellikda bajariladi. Har bir qabul qiluvchi natijasi darhol
+broadcast_recipients ga yoziladi: bot qayta ishga tushsa, faqat
+yuborilmaganlarga davom ettiriladi. Admin bitta xabarda progressni ko'radi
+va broadcast ni to'xtata oladi.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+)
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from config import (
+    BROADCAST_BATCH_SIZE,
+    BROADCAST_CONCURRENCY,
+    BROADCAST_PROGRESS_INTERVAL,
+    BROADCAST_RATE,
+)
+from middleware.outbound_middleware import PRIORITY_BROADCAST, send_priority
+from utils.rate_limit import TokenBucket
+from utils.texts import get_text
+
+logger = logging.getLogger(__name__)
+
+# broadcast_recipients.status
+RECIPIENT_PENDING = 'pending'
+RECIPIENT_SENT = 'sent'
+RECIPIENT_FAILED = 'failed'
+RECIPIENT_BLOCKED = 'blocked'   # Botni bloklagan yoki akkaunt o'chirilgan
+
+# Tarmoq xatolari va RetryAfter dan keyin qayta urinishlar
+SEND_ATTEMPTS = 3
+
+
+class Broadcast:
+    """Bitta broadcast holati"""
+
+    __slots__ = (
+        'id', 'admin_id', 'message_id', 'text', 'total', 'counts',
+        'started_at', 'started_done', '_cancel_event'
+    )
+
+    def __init__(self, broadcast_id: int, admin_id: int, text: str, total: int):
+        self.id = broadcast_id
+        self.admin_id = admin_id
+        self.message_id: Optional[int] = None
+        self.text = text
+        self.total = total
+        self.counts: Dict[str, int] = {RECIPIENT_SENT: 0, RECIPIENT_FAILED: 0, RECIPIENT_BLOCKED: 0}
+        self.started_at = time.monotonic()
+        self.started_done = 0
+        self._cancel_event = asyncio.Event()
+
+    @classmethod
+    def from_row(cls, row, counts: Dict[str, int]) -> 'Broadcast':
+        """broadcasts jadvali qatoridan (davom ettirish uchun)"""
+        broadcast = cls(row['id'], row['admin_id'], row['text'], row['total'])
+        broadcast.message_id = row['message_id']
+        for status in broadcast.counts:
+            broadcast.counts[status] = counts.get(status, 0)
+        return broadcast
+
+    @property
+    def done(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def progress_text(self) -> str:
+        """Admin uchun progress xabari"""
+        lines = [
+            f"📢 Xabar yuborish #{self.id}",
+            "",
+            f"⏳ Ishlandi: {self.done}/{self.total}",
+            f"✅ Yuborildi: {self.counts[RECIPIENT_SENT]} | ❌ Xatolik: {self.counts[RECIPIENT_FAILED]} | "
+            f"🚫 Bloklagan: {self.counts[RECIPIENT_BLOCKED]}",
+        ]
+        elapsed = time.monotonic() - self.started_at
+        processed = self.done - self.started_done
+        if elapsed >= 1 and processed:
+            speed = processed / elapsed
+            remaining = (self.total - self.done) / speed
+            lines.append(f"⚡ {speed:.1f} xabar/s | 🕒 ~{remaining / 60:.0f} daqiqa qoldi")
+        return "\n".join(lines)
+
+
+def broadcast_cancel_keyboard(broadcast_id: int) -> InlineKeyboardMarkup:
+    """Broadcast ni to'xtatish tugmasi"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text="⛔ To'xtatish",
+                callback_data=f"broadcast_stop:{broadcast_id}"
+            )
+        ]
+    ])
+
+
+class BroadcastManager:
+    """
+    Broadcast lar navbati - bir vaqtda bittasi yuboriladi
+
+    Bitta broadcast ichida BROADCAST_CONCURRENCY ta sender task navbatdan
+    telegram_id oladi. Har bir sendMessage dan oldin token olinadi, RetryAfter
+    kelsa - butun chelak aytilgan vaqtga to'xtatiladi. So'rovlar keyin
+    OutboundMiddleware umumiy navbatidan eng past priority bilan o'tadi.
+    """
+
+    def __init__(self):
+        self.db = None
+        self.bot: Optional[Bot] = None
+        self.bucket = TokenBucket(BROADCAST_RATE, capacity=1)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._broadcasts: Dict[int, Broadcast] = {}  # Navbatdagi va yuborilayotganlar
+        self._worker: Optional[asyncio.Task] = None
+
+    async def start(self, bot: Bot, db):
+        """Worker ni ishga tushirish va tugamagan broadcast larni navbatga qo'yish"""
+        self.bot = bot
+        self.db = db
+
+        for row in await db.get_unfinished_broadcasts():
+            broadcast = Broadcast.from_row(row, await db.get_broadcast_counts(row['id']))
+            logger.info(f"Resuming broadcast #{broadcast.id}: {broadcast.done}/{broadcast.total} done")
+            self._enqueue(broadcast)
+
+        self._worker = asyncio.create_task(self._work())
+
+    async def stop(self):
+        """Bot to'xtaganda - yuborilmaganlar keyingi ishga tushishda davom etadi"""
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    async def submit(self, text: str, admin_id: int) -> Broadcast:
+        """Yangi broadcast ni navbatga qo'yish (qabul qiluvchilar shu paytda olinadi)"""
+        broadcast_id, total = await self.db.create_broadcast(admin_id, text)
+        broadcast = Broadcast(broadcast_id, admin_id, text, total)
+
+        message = await self.bot.send_message(
+            admin_id,
+            f"{broadcast.progress_text()}\n\n🕒 Navbatda...",
+            reply_markup=broadcast_cancel_keyboard(broadcast_id)
+        )
+        broadcast.message_id = message.message_id
+        await self.db.set_broadcast_message(broadcast_id, message.message_id)
+
+        self._enqueue(broadcast)
+        return broadcast
+
+    async def cancel(self, broadcast_id: int) -> bool:
+        """Navbatdagi yoki yuborilayotgan broadcast ni to'xtatish"""
+        broadcast = self._broadcasts.get(broadcast_id)
+        if broadcast is None:
+            return False
+        broadcast.cancel()
+        return True
+
+    def _enqueue(self, broadcast: Broadcast):
+        self._broadcasts[broadcast.id] = broadcast
+        self._queue.put_nowait(broadcast)
+
+    async def _work(self):
+        while True:
+            broadcast = await self._queue.get()
+            try:
+                await self._run(broadcast)
+            except Exception as e:
+                logger.error(f"Broadcast #{broadcast.id} error: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, broadcast: Broadcast):
+        """Bitta broadcast ni yuborish (CancelledError - bot to'xtadi, keyin davom etadi)"""
+        recipients: asyncio.Queue = asyncio.Queue(maxsize=BROADCAST_CONCURRENCY * 2)
+        senders: List[asyncio.Task] = []
+        progress = None
+        try:
+            await self.db.start_broadcast(broadcast.id)
+            broadcast.started_at = time.monotonic()
+            broadcast.started_done = broadcast.done
+            progress = asyncio.create_task(self._progress_loop(broadcast))
+            senders = [
+                asyncio.create_task(self._sender(broadcast, recipients))
+                for _ in range(BROADCAST_CONCURRENCY)
+            ]
+
+            after = 0
+            while not broadcast.cancelled:
+                batch = await self.db.get_pending_broadcast_recipients(broadcast.id, after, BROADCAST_BATCH_SIZE)
+                if not batch:
+                    break
+                for telegram_id in batch:
+                    await recipients.put(telegram_id)
+                after = batch[-1]
+
+            for _ in senders:
+                await recipients.put(None)
+            await asyncio.gather(*senders)
+            status = 'cancelled' if broadcast.cancelled else 'done'
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            logger.error(f"Broadcast #{broadcast.id} failed: {e}")
+            status = 'failed'
+
+        finally:
+            for task in senders:
+                task.cancel()
+            if progress is not None:
+                progress.cancel()
+
+        await self._finish(broadcast, status)
+
+    async def _sender(self, broadcast: Broadcast, recipients: asyncio.Queue):
+        # OutboundMiddleware navbatida foydalanuvchi javoblari va guruh postlaridan keyin
+        with send_priority(PRIORITY_BROADCAST):
+            await self._send_all(broadcast, recipients)
+
+    async def _send_all(self, broadcast: Broadcast, recipients: asyncio.Queue):
+        while True:
+            telegram_id = await recipients.get()
+            if telegram_id is None:
+                return
+            if broadcast.cancelled:
+                continue  # pending bo'lib qoladi
+
+            status = await self._deliver(broadcast, telegram_id)
+            broadcast.counts[status] += 1
+            try:
+                await self.db.set_broadcast_recipient_status(broadcast.id, telegram_id, status)
+            except Exception as e:
+                logger.error(f"Broadcast #{broadcast.id} status save error: {e}")
+
+    async def _deliver(self, broadcast: Broadcast, telegram_id: int) -> str:
+        """Bitta xabar: natija - RECIPIENT_SENT / FAILED / BLOCKED"""
+        for attempt in range(1, SEND_ATTEMPTS + 1):
+            await self.bucket.acquire()
+            try:
+                await self.bot.send_message(telegram_id, broadcast.text)
+                return RECIPIENT_SENT
+            except TelegramRetryAfter as e:
+                logger.warning(f"Broadcast #{broadcast.id} flood control: retry after {e.retry_after}s")
+                self.bucket.pause(e.retry_after)
+            except TelegramForbiddenError:
+                return RECIPIENT_BLOCKED
+            except TelegramBadRequest as e:
+                logger.warning(f"Broadcast to {telegram_id} failed: {e}")
+                return RECIPIENT_FAILED
+            except Exception as e:
+                logger.warning(f"Broadcast to {telegram_id} failed (attempt {attempt}): {e}")
+                await asyncio.sleep(attempt)
+        return RECIPIENT_FAILED
+
+    async def _finish(self, broadcast: Broadcast, status: str):
+        """Broadcast ni yopish va yakuniy natijani ko'rsatish"""
+        await self.db.finish_broadcast(broadcast.id, status, broadcast.counts)
+        self._broadcasts.pop(broadcast.id, None)
+        logger.info(f"Broadcast #{broadcast.id} {status}: {broadcast.counts}")
+
+        if status == 'done':
+            result = get_text('uz', 'broadcast_completed', sent=broadcast.counts[RECIPIENT_SENT], total=broadcast.total)
+        elif status == 'cancelled':
+            result = "⛔ Xabar yuborish to'xtatildi"
+        else:
+            result = "❌ Xabar yuborishda xatolik yuz berdi"
+        await self._show(broadcast, f"{broadcast.progress_text()}\n\n{result}", reply_markup=None)
+
+    async def _progress_loop(self, broadcast: Broadcast):
+        """Progress xabarini BROADCAST_PROGRESS_INTERVAL da bir martadan ko'p tahrirlamaslik"""
+        last_text = None
+        while True:
+            await asyncio.sleep(BROADCAST_PROGRESS_INTERVAL)
+            text = broadcast.progress_text()
+            if text != last_text:
+                await self._show(broadcast, text, reply_markup=broadcast_cancel_keyboard(broadcast.id))
+                last_text = text
+
+    async def _show(self, broadcast: Broadcast, text: str, reply_markup: Optional[InlineKeyboardMarkup]):
+        """Progress xabarini yangilash (xabar o'chirilgan bo'lsa - yangisi yuboriladi)"""
+        try:
+            if broadcast.message_id:
+                await self.bot.edit_message_text(
+                    text,
+                    chat_id=broadcast.admin_id,
+                    message_id=broadcast.message_id,
+                    reply_markup=reply_markup
+                )
+                return
+        except TelegramRetryAfter as e:
+            logger.warning(f"Broadcast progress flood control: retry after {e.retry_after}s")
+            return
+        except TelegramBadRequest as e:
+            if 'message is not modified' in str(e):
+                return
+        except Exception as e:
+            logger.error(f"Broadcast progress edit error: {e}")
+            return
+
+        try:
+            message = await self.bot.send_message(broadcast.admin_id, text, reply_markup=reply_markup)
+            broadcast.message_id = message.message_id
+            await self.db.set_broadcast_message(broadcast.id, message.message_id)
+        except Exception as e:
+            logger.error(f"Broadcast progress send error: {e}")
+
+
+# Butun bot uchun bitta navbat (main.py da ishga tushiriladi)
+broadcast_manager = BroadcastManager()
@@ -1,13 +1,25 @@
 """
 Excel fayldan foydalanuvchilarni import qilish va validatsiya
 """
-import re
+import io
+
 import aiosqlite
+import numpy as np
 import pandas as pd
 import logging
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Iterator, Optional, Set
 from datetime import datetime
 
+from aiogram.types import BufferedInputFile
+
+from config import IMPORT_REPORT_FORMAT, IMPORT_REPORT_XLSX_MAX_ROWS, USER_IMPORT_CHUNK_SIZE
+from database.client_codes import format_client_code, parse_client_code_number, reserve_client_code
+from utils.file_reader import MissingColumnsError, TableSource, iter_table_chunks
+from utils.formatters import phone_search_keys
+from utils.import_jobs import JOB_USERS, ImportCancelled, ImportJob
+from utils.process_pool import run_in_process, stream_in_process
+from utils.validators import REASON_TEXTS, BatchValidators
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,409 +29,348 @@ class ExcelUserImporter:
     def __init__(self, db_manager):
         self.db_manager = db_manager
     
-    def validate_passport_series(self, series) -> Tuple[bool, str, str]:
-        """
-        Passport seriyasini tekshirish
-        O'zbekiston passporti: 2 ta harf + raqamlar (masalan: AA1234567)
-
-        Returns:
-            (is_valid, cleaned_series, error_reason)
-        """
-        if series is None or pd.isna(series):
-            return False, "", "Passport seriya bo'sh"
-
-        # Excel'dan float kelishi mumkin (masalan: 1234567.0)
-        # Lekin bizga harf kerak, shuning uchun to'g'ridan-to'g'ri string qilamiz
-        series_str = str(series).strip().upper()
-
-        # .0 ni olib tashlash (agar raqam sifatida kelgan bo'lsa)
-        series_str = series_str.replace('.0', '')
-
-        # Kamida 2 ta belgi bo'lishi kerak
-        if len(series_str) < 2:
-            return False, "", f"Uzunligi {len(series_str)} (kamida 2 ta belgi kerak)"
-
-        # Birinchi 2 ta belgi harf bo'lishi kerak
-        if not series_str[:2].isalpha():
-            return False, "", "Birinchi 2 ta belgi harf bo'lishi kerak"
-
-        return True, series_str, ""
-    
-    def validate_phone_number(self, phone: str) -> Tuple[bool, str, str]:
-        """
-        Telefon raqamni tekshirish va formatlash
-        To'g'ri formatlar: +998901234567, 998901234567, 901234567
-
-        Returns:
-            (is_valid, formatted_phone, error_reason)
-        """
-        if not phone or pd.isna(phone):
-            return False, "", "Telefon raqam bo'sh"
-
-        # Barcha bo'sh joylar va maxsus belgilarni olib tashlash
-        phone_str = str(phone).strip()
-        clean_phone = re.sub(r'[\s\-\(\)]', '', phone_str)
-
-        # + belgisini olib tashlash
-        if clean_phone.startswith('+'):
-            clean_phone = clean_phone[1:]
-
-        # 998 bilan boshlanmasa, qo'shish
-        if not clean_phone.startswith('998'):
-            # Agar 9 ta raqam bo'lsa (901234567)
-            if len(clean_phone) == 9:
-                clean_phone = '998' + clean_phone
-            else:
-                return False, "", f"Noto'g'ri format (uzunligi {len(clean_phone)})"
-
-        # Endi 998 + 9 ta raqam = 12 ta raqam bo'lishi kerak
-        if len(clean_phone) != 12:
-            return False, "", f"Uzunligi {len(clean_phone)} (12 ta raqam bo'lishi kerak)"
-
-        # Faqat raqamlardan iborat ekanligini tekshirish
-        if not clean_phone.isdigit():
-            return False, "", "Faqat raqamlardan iborat bo'lishi kerak"
-
-        # + belgisi bilan qaytarish
-        return True, '+' + clean_phone, ""
-    
-    def validate_pinfl(self, pinfl) -> Tuple[bool, str, str]:
-        """
-        PINFL raqamini tekshirish
-        - 14 ta raqam bo'lishi kerak
-        - Nazorat raqami (checksum) to'g'ri bo'lishi kerak
-
-        Returns:
-            (is_valid, cleaned_pinfl, error_reason)
-        """
-        if pinfl is None or pd.isna(pinfl):
-            logger.debug(f"PINFL None yoki NaN: {pinfl}")
-            return False, "", "PINFL bo'sh"
-
-        # String ga o'tkazish
-        pinfl_str = str(pinfl).strip()
-
-        # 'nan' yoki bo'sh string tekshirish
-        if pinfl_str.lower() == 'nan' or not pinfl_str:
-            logger.debug(f"PINFL bo'sh yoki nan: {pinfl_str}")
-            return False, "", "PINFL bo'sh"
-
-        # Agar nuqta bo'lsa (float formatda kelgan bo'lsa)
-        if '.' in pinfl_str:
-            try:
-                # Float ga o'tkazib, keyin int ga
-                pinfl_float = float(pinfl_str)
-                pinfl_str = str(int(pinfl_float))
-                logger.debug(f"PINFL float dan int ga: {pinfl} -> {pinfl_str}")
-            except:
-                logger.debug(f"PINFL konvertatsiya xatosi: {pinfl_str}")
-                return False, "", "Konvertatsiya xatosi"
-
-        # Bo'sh joy va boshqa belgilarni olib tashlash
-        pinfl_str = pinfl_str.replace(' ', '').replace('-', '')
-
-        # Faqat raqamlar ekanligini tekshirish
-        if not pinfl_str.isdigit():
-            logger.debug(f"PINFL faqat raqamlardan emas: {pinfl_str}")
-            return False, "", "Faqat raqamlardan iborat bo'lishi kerak"
-
-        # 14 ta raqam bo'lishi kerak
-        if len(pinfl_str) != 14:
-            logger.debug(f"PINFL uzunligi noto'g'ri: {len(pinfl_str)} (kerak: 14), qiymat: {pinfl_str}")
-            return False, "", f"Uzunligi {len(pinfl_str)} (14 ta raqam bo'lishi kerak)"
-
-        # PINFL nazorat raqamini tekshirish (checksum validation)
-        digits = [int(d) for d in pinfl_str]
-        control_digit = digits[-1]
-
-        # Vazn koeffitsiyentlari (standart)
-        weights = [7, 3, 1, 7, 3, 1, 7, 3, 1, 7, 3, 1, 7]
-
-        # Nazorat summasi
-        checksum = sum(d * w for d, w in zip(digits[:13], weights))
-
-        # Nazorat raqami hisoblash
-        calculated_control = checksum % 10
-
-        if calculated_control != control_digit:
-            logger.debug(f"PINFL nazorat raqami noto'g'ri: {pinfl_str}, kutilgan: {calculated_control}, berilgan: {control_digit}")
-            return False, "", f"Nazorat raqami noto'g'ri (PINFL haqiqiy emas)"
-
-        logger.debug(f"PINFL to'g'ri: {pinfl_str}")
-        return True, pinfl_str, ""
-    
     async def import_users_from_excel(
         self, 
-        file_path: str
-    ) -> Tuple[int, int, str]:
+        source: TableSource,
+        job: Optional[ImportJob] = None
+    ) -> Tuple[int, int, Optional[BufferedInputFile]]:
         """
         Excel fayldan foydalanuvchilarni import qilish
         
+        Fayl o'qish, tekshirish va hisobot yozish alohida jarayonda bajariladi,
+        bu yerda har bir tayyor bo'lak bitta tranzaksiyada bazaga yoziladi.
+        
+        job - import_jobs navbatidan: har IMPORT_CHECKPOINT_ROWS qatorda holat
+        saqlanadi, davom ettirilganda ishlangan qatorlar o'tkazib yuboriladi.
+        
         Returns:
-            (success_count, failed_count, failed_excel_path)
+            (success_count, failed_count, failed_report) - hisobot xotirada
+            (xlsx yoki csv), xato qator bo'lmasa None
         """
+        job = job or ImportJob(JOB_USERS, source)
+        stream = stream_in_process(iter_user_batches, source, USER_IMPORT_CHUNK_SIZE, job.rows_done)
         try:
-            # Excel faylni o'qish
-            df = pd.read_excel(file_path)
+            counts = {'inserted': 0, 'updated': 0}
             
-            # Kerakli ustunlarni tekshirish
-            required_columns = [
-                'code_str',
-                'fullname_passport',
-                'passport_series',
-                'birth_date',
-                'address_region',
-                'phone_number',
-                'passport_pinfl'
-            ]
-            
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                error_msg = f"Kerakli ustunlar topilmadi: {', '.join(missing_columns)}"
-                logger.error(error_msg)
-                return 0, 0, ""
-            
-            success_count = 0
-            failed_rows = []
-            failed_reasons = []  # Xatolik sabablari
-
-            # Har bir qatorni tekshirish va import qilish
-            for index, row in df.iterrows():
-                try:
-                    # 1. code_str - bo'sh joylarni olib tashlash
-                    code_str = str(row['code_str']).strip() if pd.notna(row['code_str']) else ""
-                    code_str = code_str.replace(' ', '')
-                    
-                    if not code_str:
-                        logger.warning(f"Row {index + 2}: code_str bo'sh")
-                        failed_rows.append(row)
-                        failed_reasons.append("code_str bo'sh")
-                        continue
-                    
-                    # 2. fullname_passport - hech qanday tekshiruvsiz
-                    fullname = str(row['fullname_passport']).strip() if pd.notna(row['fullname_passport']) else ""
-                    
-                    if not fullname:
-                        logger.warning(f"Row {index + 2}: fullname bo'sh")
-                        failed_rows.append(row)
-                        failed_reasons.append("fullname bo'sh")
-                        continue
-                    
-                    # 3. passport_series - validatsiya
-                    series_valid, passport_series, series_error = self.validate_passport_series(row['passport_series'])
-                    if not series_valid:
-                        logger.warning(f"Row {index + 2}: Passport series noto'g'ri: {row['passport_series']} - Sabab: {series_error}")
-                        failed_rows.append(row)
-                        failed_reasons.append(f"Passport series: {series_error}")
-                        continue
-                    
-                    # 4. birth_date - hech qanday tekshiruvsiz
-                    birth_date = str(row['birth_date']).strip() if pd.notna(row['birth_date']) else ""
-                    
-                    # 5. address_region - hech qanday tekshiruvsiz
-                    address_region = str(row['address_region']).strip() if pd.notna(row['address_region']) else ""
-                    
-                    # 6. phone_number - validatsiya va formatlash
-                    phone_valid, phone_formatted, phone_error = self.validate_phone_number(row['phone_number'])
-                    if not phone_valid:
-                        logger.warning(f"Row {index + 2}: Telefon raqam noto'g'ri: {row['phone_number']} - Sabab: {phone_error}")
-                        failed_rows.append(row)
-                        failed_reasons.append(f"Telefon: {phone_error}")
-                        continue
-                    
-                    # 7. passport_pinfl - validatsiya
-                    pinfl_valid, pinfl, pinfl_error = self.validate_pinfl(row['passport_pinfl'])
-                    if not pinfl_valid:
-                        # PINFL ni tozalangan formatda ko'rsatish
-                        display_pinfl = str(row['passport_pinfl']).strip()
-                        if '.' in display_pinfl:
-                            try:
-                                display_pinfl = str(int(float(display_pinfl)))
-                            except:
-                                pass
-                        logger.warning(f"Row {index + 2}: PINFL noto'g'ri: {display_pinfl} - Sabab: {pinfl_error}")
-                        failed_rows.append(row)
-                        failed_reasons.append(f"PINFL: {pinfl_error}")
-                        continue
-                    
-                    # Ma'lumotlarni bazaga yozish
-                    user_data = {
-                        'client_code': code_str,
-                        'fullname': fullname,
-                        'passport_number': passport_series,
-                        'birth_date': birth_date,
-                        'address': address_region,
-                        'phone': phone_formatted,
-                        'pinfl': pinfl,
-                        'verification_status': 'approved',  # Import qilinganlar avtomatik tasdiqlangan
-                        'language': 'uz'
-                    }
-                    
-                    # Bazaga qo'shish
-                    success = await self._insert_user_from_excel(user_data)
+            async for valid, failed in stream:
+                job.check_cancelled()
+                
+                for row_number, row, reason in failed:
+                    logger.warning(f"Row {row_number}: {reason}")
+                    job.add_failed(row_number, row, reason)
+                
+                if valid:
+                    try:
+                        outcomes = await self._upsert_users([user_data for _, _, user_data in valid])
+                    except Exception as e:
+                        logger.error(f"Insert users batch error: {str(e)}")
+                        outcomes = ['error'] * len(valid)
                     
-                    if success:
-                        success_count += 1
-                        logger.info(f"Row {index + 2}: Muvaffaqiyatli import qilindi - {code_str}")
-                    else:
-                        failed_rows.append(row)
-                        failed_reasons.append("Bazaga yozishda xatolik")
-                        logger.warning(f"Row {index + 2}: Bazaga yozishda xatolik")
-
-                except Exception as e:
-                    logger.error(f"Row {index + 2}: Xatolik - {str(e)}")
-                    failed_rows.append(row)
-                    failed_reasons.append(f"Xatolik: {str(e)}")
-                    continue
+                    for (row_number, row, user_data), outcome in zip(valid, outcomes):
+                        if outcome in counts:
+                            counts[outcome] += 1
+                            job.success_count += 1
+                            logger.debug(f"Row {row_number}: {outcome} - {user_data['client_code']}")
+                        else:
+                            reason = OUTCOME_TEXTS[outcome]
+                            logger.warning(f"Row {row_number}: {reason}")
+                            job.add_failed(row_number, row, reason)
+                
+                job.rows_done += len(valid) + len(failed)
+                if job.needs_checkpoint:
+                    await self.db_manager.save_import_checkpoint(job)
             
-            # Muvaffaqiyatsiz qatorlarni yangi Excel faylga yozish
-            failed_excel_path = ""
+            # Xato qatorlar: oldingi urinishlarda saqlanganlari + oxirgi checkpoint dan keyingilari
+            failed_rows, failed_reasons = [], []
+            if job.id is not None:
+                failed_rows, failed_reasons = await self.db_manager.get_import_job_errors(job.id)
+            failed_rows += [row for _, row, _ in job.errors]
+            failed_reasons += [reason for _, _, reason in job.errors]
+            
+            # Muvaffaqiyatsiz qatorlar hisoboti (diskka yozilmaydi)
+            failed_report = None
             if failed_rows:
-                failed_df = pd.DataFrame(failed_rows)
-                # Xatolik sabablarini yangi ustun sifatida qo'shish
-                failed_df['xatolik_sababi'] = failed_reasons
+                report_format = job.options.get('report_format', IMPORT_REPORT_FORMAT)
+                if len(failed_rows) > IMPORT_REPORT_XLSX_MAX_ROWS:
+                    report_format = 'csv'
+                
+                data = await run_in_process(build_failed_report, failed_rows, failed_reasons, report_format)
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                failed_excel_path = f"failed_imports_{timestamp}.xlsx"
-                failed_df.to_excel(failed_excel_path, index=False)
-                logger.info(f"Failed rows saved to: {failed_excel_path}")
+                failed_report = BufferedInputFile(data, filename=f"failed_imports_{timestamp}.{report_format}")
+                logger.info(f"Failed rows report built: {failed_report.filename} ({len(data)} bytes)")
             
-            logger.info(f"Import completed: {success_count} success, {len(failed_rows)} failed")
-            return success_count, len(failed_rows), failed_excel_path
+            logger.info(
+                f"Import completed: {job.success_count} success "
+                f"({counts['inserted']} inserted, {counts['updated']} updated in this run), "
+                f"{job.failed_count} failed"
+            )
+            return job.success_count, job.failed_count, failed_report
+        
+        except ImportCancelled:
+            logger.info(f"Excel import cancelled after {job.rows_done} rows")
+            raise
         
         except Exception as e:
             logger.error(f"Excel import error: {str(e)}")
             raise
+        
+        finally:
+            await stream.aclose()
     
-    async def _insert_user_from_excel(self, user_data: Dict) -> bool:
+    async def _upsert_users(self, users: List[Dict]) -> List[str]:
         """
-        Excel dan olingan ma'lumotlarni bazaga yozish
+        Bo'lakdagi foydalanuvchilarni bitta tranzaksiyada yozish
+        
+        Qatorlar TEMP jadvalga yoziladi, mos foydalanuvchi indeksli
+        join lar bilan topiladi (avval client_code, bo'lmasa PINFL),
+        so'ng hammasi bir nechta set-based so'rov bilan qo'llanadi.
+        
+        Returns:
+            Har bir qator uchun natija: 'inserted', 'updated' yoki 'conflict'
         """
-        try:
-            async with aiosqlite.connect(self.db_manager.db_path) as db:
-                # Avval client_code yoki PINFL mavjudligini tekshirish
-                cursor = await db.execute('''
-                    SELECT id FROM users 
-                    WHERE client_code = ? OR pinfl = ?
-                ''', (user_data['client_code'], user_data['pinfl']))
-                
-                existing = await cursor.fetchone()
-                
-                if existing:
-                    # Agar mavjud bo'lsa, update qilish
-                    await db.execute('''
-                        UPDATE users 
-                        SET fullname = ?, 
-                            passport_number = ?,
-                            birth_date = ?,
-                            address = ?,
-                            phone = ?,
-                            verification_status = ?,
-                            verified_at = CURRENT_TIMESTAMP
-                        WHERE client_code = ? OR pinfl = ?
-                    ''', (
-                        user_data['fullname'],
-                        user_data['passport_number'],
-                        user_data['birth_date'],
-                        user_data['address'],
-                        user_data['phone'],
-                        user_data['verification_status'],
-                        user_data['client_code'],
-                        user_data['pinfl']
-                    ))
-                else:
-                    # Yangi foydalanuvchi qo'shish
-                    await db.execute('''
-                        INSERT INTO users 
-                        (client_code, fullname, passport_number, birth_date, 
-                         address, phone, pinfl, verification_status, 
-                         verified_at, language, is_active)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?, 1)
-                    ''', (
-                        user_data['client_code'],
-                        user_data['fullname'],
-                        user_data['passport_number'],
-                        user_data['birth_date'],
-                        user_data['address'],
-                        user_data['phone'],
-                        user_data['pinfl'],
-                        user_data['verification_status'],
-                        user_data['language']
-                    ))
-                
-                await db.commit()
-                return True
+        rows = [
+            (
+                row_id,
+                user['client_code'],
+                user['fullname'],
+                user['passport_number'],
+                user['birth_date'],
+                user['address'],
+                user['phone'],
+                *phone_search_keys(user['phone']),
+                user['pinfl'],
+                user['verification_status'],
+                user['language']
+            )
+            for row_id, user in enumerate(users)
+        ]
         
-        except Exception as e:
-            logger.error(f"Insert user error: {str(e)}")
-            return False
-
-
-# DatabaseManager klassiga qo'shiladigan metod
-async def import_users_excel_background(
-    self,
-    file_path: str,
-    bot,
-    admin_id: int
-) -> None:
+        async def upsert(db: aiosqlite.Connection) -> List[str]:
+            await db.execute('DROP TABLE IF EXISTS temp.users_incoming')
+            await db.execute(f'''
+                CREATE TEMP TABLE users_incoming (
+                    row_id INTEGER PRIMARY KEY,
+                    {USER_UPSERT_COLUMNS},
+                    target_id INTEGER,
+                    matched_by TEXT,
+                    outcome TEXT
+                )
+            ''')
+            await db.executemany(f'''
+                INSERT INTO users_incoming (row_id, {USER_UPSERT_COLUMNS})
+                VALUES ({', '.join('?' * (len(rows[0])))})
+            ''', rows)
+            
+            # Mavjud foydalanuvchi: client_code (UNIQUE) yoki PINFL (idx_pinfl) bo'yicha
+            await db.execute('''
+                UPDATE users_incoming
+                SET target_id = u.id, matched_by = 'code'
+                FROM users u
+                WHERE u.client_code = users_incoming.client_code
+            ''')
+            await db.execute('''
+                UPDATE users_incoming
+                SET target_id = (
+                        SELECT MIN(u.id) FROM users u WHERE u.pinfl = users_incoming.pinfl
+                    ),
+                    matched_by = 'pinfl'
+                WHERE target_id IS NULL
+                  AND EXISTS (SELECT 1 FROM users u WHERE u.pinfl = users_incoming.pinfl)
+            ''')
+            
+            # Bitta foydalanuvchiga bir nechta qator tushsa - faqat birinchisi yoziladi
+            await db.execute('CREATE INDEX temp.idx_users_incoming_target ON users_incoming(target_id)')
+            await db.execute('''
+                UPDATE users_incoming
+                SET outcome = CASE
+                    WHEN target_id IS NULL THEN 'inserted'
+                    WHEN EXISTS (
+                        SELECT 1 FROM users_incoming o
+                        WHERE o.target_id = users_incoming.target_id
+                          AND o.row_id < users_incoming.row_id
+                    ) THEN 'conflict'
+                    ELSE 'updated'
+                END
+            ''')
+            
+            # PINFL bo'yicha topilganlar (client_code boshqa) - id orqali yangilanadi
+            await db.execute(f'''
+                UPDATE users AS u
+                SET {USER_UPDATE_SET.format(source='i')}
+                FROM users_incoming i
+                WHERE u.id = i.target_id
+                  AND i.matched_by = 'pinfl' AND i.outcome = 'updated'
+            ''')
+            
+            # Yangilari va client_code bo'yicha mavjudlari - bitta upsert
+            await db.execute(f'''
+                INSERT INTO users
+                    ({USER_UPSERT_COLUMNS}, verified_at, is_active)
+                SELECT {USER_UPSERT_COLUMNS}, CURRENT_TIMESTAMP, 1
+                FROM users_incoming
+                WHERE outcome = 'inserted'
+                   OR (matched_by = 'code' AND outcome = 'updated')
+                ORDER BY row_id
+                ON CONFLICT (client_code) DO UPDATE
+                SET {USER_UPDATE_SET.format(source='excluded')}
+            ''')
+            
+            async with db.execute('SELECT outcome FROM users_incoming ORDER BY row_id') as cursor:
+                outcomes = [row[0] for row in await cursor.fetchall()]
+            await db.execute('DROP TABLE temp.users_incoming')
+            
+            # Import qilingan kodlar keyingi ro'yxatdan o'tishlarda qayta berilmasin
+            numbers = [parse_client_code_number(user['client_code']) for user in users]
+            numbers = [number for number in numbers if number is not None]
+            if numbers:
+                await reserve_client_code(db, format_client_code(max(numbers)))
+            
+            return outcomes
+        
+        try:
+            # Writer navbati orqali - butun bo'lak bitta tranzaksiyada
+            return await self.db_manager.pool.transaction(upsert)
+        except Exception:
+            await self.db_manager.pool.execute('DROP TABLE IF EXISTS temp.users_incoming')
+            raise
+        finally:
+            # Bo'lak istalgan foydalanuvchini yangilagan bo'lishi mumkin - kesh butunlay tozalanadi
+            self.db_manager.user_cache.clear()
+
+
+# Yoziladigan ustunlar (users_incoming va users da bir xil nomlar)
+USER_UPSERT_COLUMNS = (
+    'client_code, fullname, passport_number, birth_date, address, '
+    'phone, phone_digits, phone_rev, pinfl, verification_status, language'
+)
+
+# Mavjud foydalanuvchini yangilash (client_code, PINFL va til o'zgarmaydi)
+USER_UPDATE_SET = '''
+    fullname = {source}.fullname,
+    passport_number = {source}.passport_number,
+    birth_date = {source}.birth_date,
+    address = {source}.address,
+    phone = {source}.phone,
+    phone_digits = {source}.phone_digits,
+    phone_rev = {source}.phone_rev,
+    verification_status = {source}.verification_status,
+    verified_at = CURRENT_TIMESTAMP
+'''
+
+# Bazaga yozish natijalari (xato bo'lganlari hisobotga tushadi)
+OUTCOME_TEXTS = {
+    'conflict': "client_code/PINFL fayldagi boshqa qator bilan bitta foydalanuvchiga tushdi",
+    'error': "Bazaga yozishda xatolik",
+}
+
+
+# ==================== WORKER JARAYONI ====================
+
+USER_REQUIRED_COLUMNS = [
+    'code_str',
+    'fullname_passport',
+    'passport_series',
+    'birth_date',
+    'address_region',
+    'phone_number',
+    'passport_pinfl'
+]
+
+
+def validate_user_frame(
+    chunk: pd.DataFrame,
+    seen_codes: Set[str],
+    seen_pinfls: Set[str]
+) -> Tuple[np.ndarray, np.ndarray, pd.DataFrame]:
     """
-    Background taskda foydalanuvchilarni import qilish
+    Bo'lakdagi barcha qatorlarni ustun bo'yicha tekshirish
+    
+    seen_codes / seen_pinfls - oldingi bo'laklardagi to'g'ri qatorlar (faylda takrorlanishni aniqlash)
+    
+    Returns:
+        (ok_mask, reason_codes, users) - users faqat to'g'ri qatorlar
     """
-    import os
-    from aiogram.types import FSInputFile
-
-    failed_file = None
-    success_count = 0
-    failed_count = 0
-
-    try:
-        await bot.send_message(
-            admin_id,
-            "📥 Excel fayl import qilish boshlandi...\n"
-            "Bu biroz vaqt olishi mumkin."
-        )
-
-        importer = ExcelUserImporter(self)
-        success_count, failed_count, failed_file = await importer.import_users_from_excel(file_path)
-
-        # Natijani adminga yuborish
-        result_message = (
-            f"✅ Import yakunlandi!\n\n"
-            f"✅ Muvaffaqiyatli: {success_count} ta\n"
-            f"❌ Xatolik: {failed_count} ta"
-        )
-        await bot.send_message(admin_id, result_message)
-
-    except Exception as e:
-        logger.error(f"Background import error: {str(e)}")
-        await bot.send_message(
-            admin_id,
-            f"❌ Import jarayonida xatolik yuz berdi:\n{str(e)}"
-        )
-
-    finally:
-        # Har holda quyidagi operatsiyalarni bajarish (xatolik bo'lsa ham)
-
-        # 1. Agar muvaffaqiyatsiz qatorlar bo'lsa, Excel faylni yuborish
-        if failed_file and os.path.exists(failed_file):
-            try:
-                document = FSInputFile(failed_file)
-                await bot.send_document(
-                    admin_id,
-                    document,
-                    caption=f"❌ Bu faylda {failed_count} ta foydalanuvchi ro'yxati (xatoliklar bilan)"
-                )
-                logger.info(f"Failed file sent: {failed_file}")
-            except Exception as e:
-                logger.error(f"Failed file send error: {str(e)}")
-            finally:
-                # Faylni har holda o'chirish
-                try:
-                    os.remove(failed_file)
-                    logger.info(f"Failed file deleted: {failed_file}")
-                except Exception as e:
-                    logger.error(f"Failed file delete error: {str(e)}")
-
-
+    codes = BatchValidators.remove(BatchValidators.text(chunk['code_str']), ' ')
+    fullnames, fullname_reasons = BatchValidators.required(chunk['fullname_passport'], 'fullname_empty')
+    passports, passport_reasons = BatchValidators.passport_series(chunk['passport_series'])
+    phones, phone_reasons = BatchValidators.phones(chunk['phone_number'])
+    pinfls, pinfl_reasons = BatchValidators.pinfls(chunk['passport_pinfl'])
+    
+    reasons = BatchValidators.first_reason(
+        np.where(codes == '', 'code_empty', ''),
+        fullname_reasons, passport_reasons, phone_reasons, pinfl_reasons
+    )
+    
+    # Fayl ichida takrorlangan kod / PINFL - birinchisidan keyingilari xato
+    reasons[BatchValidators.duplicates(np.strings.upper(codes), reasons == '', seen_codes)] = 'code_duplicate'
+    reasons[BatchValidators.duplicates(pinfls, reasons == '', seen_pinfls)] = 'pinfl_duplicate'
+    
+    ok = reasons == ''
+    users = pd.DataFrame({
+        'client_code': codes,
+        'fullname': fullnames,
+        'passport_number': passports,
+        'birth_date': BatchValidators.text(chunk['birth_date']),
+        'address': BatchValidators.text(chunk['address_region']),
+        'phone': phones,
+        'pinfl': pinfls,
+    })[ok]
+    users['verification_status'] = 'approved'  # Import qilinganlar avtomatik tasdiqlangan
+    users['language'] = 'uz'
+    return ok, reasons, users
+
+
+def iter_user_batches(source: TableSource, chunk_size: int, skip_rows: int = 0) -> Iterator[Tuple[List, List]]:
+    """
+    Faylni o'qib tekshirilgan qatorlarni bo'laklab qaytarish (worker jarayonida ishlaydi)
+    
+    skip_rows - import davom ettirilganda oldin ishlangan qatorlar. Ular
+    qaytarilmaydi, lekin baribir tekshiriladi: seen_codes / seen_pinfls
+    to'liq bo'lmasa, checkpoint dan oldingi qatorning takrori xato o'rniga
+    ON CONFLICT(client_code) orqali uni jimgina qayta yozadi.
+    
+    Yields:
+        (valid, failed) - valid: [(qator, row_dict, user_data)], failed: [(qator, row_dict, sabab)]
+    """
+    seen_codes, seen_pinfls = set(), set()
+    
+    for number, chunk in enumerate(iter_table_chunks(source, chunk_size)):
+        if number == 0:
+            missing_columns = [col for col in USER_REQUIRED_COLUMNS if col not in chunk.columns]
+            if missing_columns:
+                raise MissingColumnsError(f"Kerakli ustunlar topilmadi: {', '.join(missing_columns)}")
+        
+        ok, reasons, users = validate_user_frame(chunk, seen_codes, seen_pinfls)
+        if len(chunk) and chunk.index[-1] < skip_rows:
+            continue  # Butun bo'lak oldingi urinishda ishlangan
         
+        row_numbers = (np.asarray(chunk.index, dtype=np.int64) + 2).tolist()
+        raw_rows = chunk.to_dict('records')  # Hisobot uchun asl qator
+        user_records = iter(users.to_dict('records'))
+        
+        valid, failed = [], []
+        for row_number, row, is_ok, reason in zip(row_numbers, raw_rows, ok.tolist(), reasons.tolist()):
+            user_data = next(user_records) if is_ok else None
+            if row_number - 2 < skip_rows:
+                continue
+            if is_ok:
+                valid.append((row_number, row, user_data))
+            else:
+                failed.append((row_number, row, REASON_TEXTS[reason]))
         
-        
\ No newline at end of file
+        yield valid, failed
+
+
+def build_failed_report(rows: List[Dict], reasons: List[str], report_format: str) -> bytes:
+    """Muvaffaqiyatsiz qatorlar hisoboti - xlsx yoki csv baytlari (worker jarayonida ishlaydi)"""
+    failed_df = pd.DataFrame(rows)
+    # Xatolik sabablarini yangi ustun sifatida qo'shish
+    failed_df['xatolik_sababi'] = reasons
+    
+    buffer = io.BytesIO()
+    if report_format == 'csv':
+        # BOM - Excel kirill va o'zbek harflarini to'g'ri ochishi uchun
+        failed_df.to_csv(buffer, index=False, encoding='utf-8-sig')
+    else:
+        failed_df.to_excel(buffer, index=False)
+    return buffer.getvalue()
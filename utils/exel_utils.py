@@ -1,14 +1,11 @@
-import asyncio
-import os
 from aiogram import Router
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
-from database.db_manager import DatabaseManager
 from config import ADMINS
 from states import AdminStates
+from utils.import_jobs import JOB_USERS, import_job_manager, receive_import_file
 
 router = Router()
-db = DatabaseManager()
 
 @router.message(AdminStates.user_exel_importing_process)
 async def handle_excel_import(message: Message, state: FSMContext):
@@ -29,24 +26,13 @@ async def handle_excel_import(message: Message, state: FSMContext):
         await state.clear()
         return
     
-    # Faylni yuklab olish
-    file_path = f"temp_{file.file_id}.xlsx"
-    # file_path = f"akb.xlsx"
-    await message.bot.download(file, destination=file_path)
+    # Faylni yuklab olish (kichik fayl xotirada qoladi, katta - navbat o'zi o'chiradi)
+    source = await receive_import_file(message.bot, file)
     
-    # Background taskda import qilish
-    asyncio.create_task(
-        db.import_users_excel_background(
-            file_path=file_path,
-            bot=message.bot,
-            admin_id=message.from_user.id
-        )
-    )
+    # Xatoliklar hisoboti formati fayl izohidan: "csv" - katta hisobotlar uchun tezroq
+    options = {}
+    if 'csv' in (message.caption or '').lower().split():
+        options['report_format'] = 'csv'
     
-    # Taskdan keyin faylni o'chirish
-    async def cleanup():
-        await asyncio.sleep(300)  # 5 daqiqadan keyin
-        if os.path.exists(file_path):
-            os.remove(file_path)
-    
-    asyncio.create_task(cleanup())
\ No newline at end of file
+    # Import navbatiga qo'yish - progress va bekor qilish tugmasi alohida xabarda
+    await import_job_manager.submit(JOB_USERS, source, message.from_user.id, options)
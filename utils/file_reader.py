@@ -0,0 +1,171 @@
+"""
+Katta CSV/XLSX fayllarni bo'laklab o'qish - xotira fayl hajmiga bog'liq emas
+"""
+import io
+import logging
+from itertools import islice
+from typing import Iterator, NamedTuple, Union
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class MissingColumnsError(ValueError):
+    """Faylda kerakli ustunlar yo'q"""
+
+
+class TableBuffer(NamedTuple):
+    """Xotiradagi fayl (Telegram dan diskka yozmasdan yuklab olingan)"""
+    name: str
+    data: bytes
+
+
+# Fayl yo'li yoki xotiradagi fayl
+TableSource = Union[str, TableBuffer]
+
+
+def source_name(source: TableSource) -> str:
+    """Fayl nomi (turi kengaytmadan aniqlanadi)"""
+    return source.name if isinstance(source, TableBuffer) else source
+
+
+def iter_table_chunks(source: TableSource, chunk_size: int, skip_rows: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    Faylni chunk_size qatorli DataFrame bo'laklari sifatida o'qish
+
+    Har doim kamida bitta bo'lak qaytadi (bo'sh fayl uchun - faqat ustunlar).
+    Bo'laklar indeksi butun fayl bo'yicha davom etadi: fayldagi qator
+    raqami = index + 2 (sarlavhadan keyin).
+
+    skip_rows - oldingi urinishda ishlangan qatorlar (import davom ettirilganda):
+    ular o'qiladi, lekin qaytarilmaydi.
+
+    .xls (eski format) uchun oqimli o'quvchi yo'q - butun fayl o'qiladi.
+    """
+    chunks = _iter_chunks(source, chunk_size)
+    if not skip_rows:
+        yield from chunks
+        return
+
+    last = None
+    for chunk in chunks:
+        if skip_rows >= len(chunk):
+            skip_rows -= len(chunk)
+            last = chunk
+            continue
+        yield chunk.iloc[skip_rows:]
+        yield from chunks
+        return
+
+    # Hamma qator oldin ishlangan - ustunlar tekshirilishi uchun bo'sh bo'lak
+    yield last.iloc[0:0]
+
+
+def _iter_chunks(source: TableSource, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Fayl turiga qarab bo'laklab o'qish"""
+    name = source_name(source)
+    handle = io.BytesIO(source.data) if isinstance(source, TableBuffer) else source
+
+    if name.endswith('.csv'):
+        yield from pd.read_csv(handle, encoding='utf-8', chunksize=chunk_size, low_memory=False)
+    elif name.endswith('.xlsx'):
+        yield from _iter_xlsx_chunks(handle, chunk_size)
+    elif name.endswith('.xls'):
+        df = pd.read_excel(handle)
+        if df.empty:
+            yield df
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    else:
+        raise ValueError("Noto'g'ri fayl formati")
+
+
+def _iter_xlsx_chunks(handle, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """openpyxl read_only rejimida birinchi varaqni qatorma-qator o'qish"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(handle, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+
+        header = next(rows, None)
+        if header is None:
+            yield pd.DataFrame()
+            return
+
+        # Sarlavhasiz (None) ustunlar pandas dagidek nomlanadi
+        columns = [
+            str(name).strip() if name is not None else f"Unnamed: {i}"
+            for i, name in enumerate(header)
+        ]
+
+        # read_only rejimida bo'sh qatorlar ham keladi - ular tashlanadi,
+        # index esa fayldagi haqiqiy qator raqamiga mos qoladi
+        width = len(columns)
+        records = (
+            (index, (row + (None,) * width)[:width]) for index, row in enumerate(rows)
+            if any(value is not None for value in row)
+        )
+
+        while True:
+            chunk = list(islice(records, chunk_size))
+            yield pd.DataFrame.from_records(
+                [row for _, row in chunk],
+                columns=columns,
+                index=[index for index, _ in chunk],
+                coerce_float=True
+            )
+            if len(chunk) < chunk_size:
+                return
+    finally:
+        workbook.close()
+
+
+if __name__ == "__main__":
+    # Xotira sarfini o'lchash: python -m utils.file_reader [qatorlar]
+    import os
+    import sys
+    import tempfile
+    import time
+    import tracemalloc
+
+    import numpy as np
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    chunk_size = 5000
+
+    df = pd.DataFrame({
+        'Shipment Tracking Code': [f"YT{i:012d}" for i in range(count)],
+        'Shipping Name': ['Kiyim-kechak va aksessuarlar'] * count,
+        'Package Number': np.arange(count) % 50,
+        'Weight/KG': np.round(np.random.rand(count) * 30, 2),
+        'Quantity': np.random.randint(1, 10, count),
+        'Flight': ['CN-TAS-0425'] * count,
+        'Customer code': [f"AKB{600 + i % 3000}" for i in range(count)],
+    })
+
+    def measure(label, fn):
+        tracemalloc.start()
+        started = time.perf_counter()
+        rows = fn()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label:<28} {rows:>9} qator  {elapsed:6.2f}s  peak {peak / 2**20:8.1f} MB")
+
+    def stream(path):
+        return sum(len(chunk) for chunk in iter_table_chunks(path, chunk_size))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'manifest.csv')
+        xlsx_path = os.path.join(tmp, 'manifest.xlsx')
+        df.to_csv(csv_path, index=False)
+        df.head(min(count, 20_000)).to_excel(xlsx_path, index=False)
+        del df
+
+        print(f"CSV: {os.path.getsize(csv_path) / 2**20:.1f} MB, XLSX: {os.path.getsize(xlsx_path) / 2**20:.1f} MB")
+        measure("CSV  pd.read_csv (butun)", lambda: len(pd.read_csv(csv_path, low_memory=False)))
+        measure("CSV  iter_table_chunks", lambda: stream(csv_path))
+        measure("XLSX pd.read_excel (butun)", lambda: len(pd.read_excel(xlsx_path)))
+        measure("XLSX iter_table_chunks", lambda: stream(xlsx_path))
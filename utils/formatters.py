@@ -3,7 +3,7 @@ Matnlarni formatlash funksiyalari
 """
 import re
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Tuple
 
 
 def format_phone_display(phone: str) -> str:
@@ -37,6 +37,35 @@ def format_client_code_display(code: str) -> str:
     return code.upper() if code else ""
 
 
+def normalize_code(code) -> str:
+    """
+    Kodni qidiruv uchun normalize qilish (trek, mijoz kodi)
+    ' akb601 ' -> 'AKB601'
+    """
+    if code is None:
+        return ""
+    return str(code).strip().upper()
+
+
+def normalize_phone(phone) -> str:
+    """
+    Telefon raqamini faqat raqamlar ko'rinishiga keltirish (qidiruv uchun)
+    '+998 90 123-45-67' -> '998901234567', '901234567' -> '998901234567'
+    """
+    if phone is None:
+        return ""
+    digits = re.sub(r'\D', '', str(phone))
+    if len(digits) == 9 and not digits.startswith('998'):
+        digits = '998' + digits
+    return digits
+
+
+def phone_search_keys(phone) -> Tuple[str, str]:
+    """Telefon uchun indekslanadigan qiymatlar: (phone_digits, phone_rev)"""
+    digits = normalize_phone(phone)
+    return digits, digits[::-1]
+
+
 def format_datetime(dt_str: Optional[str], format_type: str = 'full') -> str:
     """
     Datetime ni formatlash
@@ -57,7 +86,7 @@ def format_datetime(dt_str: Optional[str], format_type: str = 'full') -> str:
             return dt.strftime('%H:%M')
         else:  # full
             return dt.strftime('%d.%m.%Y %H:%M')
-    except:
+    except (TypeError, ValueError):
         return dt_str
 
 
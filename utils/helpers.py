@@ -1,32 +1,26 @@
 """
 Yordamchi funksiyalar
 """
-from aiogram.types import Message
-from aiogram.fsm.context import FSMContext
-from database.db_manager import DatabaseManager
+from typing import Dict, Optional
 
-db = DatabaseManager()
+from aiogram.types import Message
 
 
-async def check_user_approved(message: Message, state: FSMContext) -> tuple:
+async def check_user_approved(message: Message, user: Optional[Dict], lang: str) -> bool:
     """
     Foydalanuvchi tasdiqlangan yoki yo'qligini tekshirish
 
     Args:
         message: Telegram xabari
-        state: FSM holati
+        user: AuthMiddleware bergan foydalanuvchi (ro'yxatdan o'tmagan bo'lsa None)
+        lang: Foydalanuvchi tili
 
     Returns:
-        tuple: (user, lang, is_approved)
+        bool: Tasdiqlangan bo'lsa True (aks holda ogohlantirish yuboriladi)
     """
-    user = await db.get_user_by_telegram_id(message.from_user.id)
-
     if not user:
-        data = await state.get_data()
-        lang = data.get('language', 'uz')
-        return None, lang, False
+        return False
 
-    lang = user['language']
     is_approved = user['verification_status'] == 'approved'
 
     if not is_approved:
@@ -36,4 +30,4 @@ async def check_user_approved(message: Message, state: FSMContext) -> tuple:
             "⚠️ Для использования этой функции сначала подтвердите свои данные!"
         )
 
-    return user, lang, is_approved
+    return is_approved
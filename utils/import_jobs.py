@@ -0,0 +1,415 @@
+"""
+Import ishlari navbati - foydalanuvchilar va yuklar importi fonda, cheklangan
+parallellikda bajariladi
+
+Har bir ish import_jobs jadvalida saqlanadi: bot qayta ishga tushsa,
+tugamagan ishlar oxirgi checkpoint dan davom ettiriladi. Admin bitta
+xabarda progressni ko'radi va ishni bekor qila oladi.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import (
+    BufferedInputFile,
+    Document,
+    FSInputFile,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+)
+
+from config import (
+    IMPORT_CHECKPOINT_ROWS,
+    IMPORT_FILES_DIR,
+    IMPORT_JOB_WORKERS,
+    IMPORT_MEMORY_MAX_BYTES,
+    IMPORT_PROGRESS_INTERVAL,
+)
+from utils.file_reader import TableBuffer, TableSource, source_name
+
+logger = logging.getLogger(__name__)
+
+JOB_USERS = 'users'
+JOB_SHIPMENTS = 'shipments'
+
+
+class ImportCancelled(Exception):
+    """Import admin tomonidan bekor qilindi"""
+
+
+class ImportJob:
+    """
+    Bitta import ishining holati (import metodlariga beriladi)
+
+    rows_done - fayldan ishlangan qatorlar. Checkpoint da saqlangan qism
+    davom ettirishda qayta o'qilmaydi. errors - oxirgi checkpoint dan
+    keyingi xato qatorlar: [(qator, row_dict, sabab)].
+
+    Fayl diskda (file_path) yoki xotirada (data) bo'ladi. Xotiradagi fayl
+    bot qayta ishga tushganda yo'qoladi - bunday ish davom ettirilmaydi.
+    """
+
+    __slots__ = (
+        'id', 'kind', 'file_path', 'data', 'file_name', 'options', 'admin_id', 'message_id',
+        'rows_done', 'success_count', 'failed_count', 'state', 'errors',
+        'checkpointed_rows', 'started_at', 'started_rows', '_cancel_event'
+    )
+
+    def __init__(
+        self,
+        kind: str,
+        source: TableSource,
+        admin_id: Optional[int] = None,
+        options: Optional[Dict] = None,
+        job_id: Optional[int] = None
+    ):
+        self.id = job_id
+        self.kind = kind
+        self.file_path = source if isinstance(source, str) else ''
+        self.data = source.data if isinstance(source, TableBuffer) else None
+        self.file_name = os.path.basename(source_name(source))
+        self.options = options or {}
+        self.admin_id = admin_id
+        self.message_id: Optional[int] = None
+        self.rows_done = 0
+        self.success_count = 0
+        self.failed_count = 0
+        self.state: Dict = {}
+        self.errors: List[Tuple[int, Dict, str]] = []
+        self.checkpointed_rows = 0
+        self.started_at = time.monotonic()
+        self.started_rows = 0
+        self._cancel_event = asyncio.Event()
+
+    @classmethod
+    def from_row(cls, row) -> 'ImportJob':
+        """import_jobs jadvali qatoridan (davom ettirish uchun)"""
+        job = cls(row['kind'], row['file_path'], row['admin_id'], json.loads(row['options'] or '{}'), row['id'])
+        job.file_name = row['file_name']
+        job.message_id = row['message_id']
+        job.rows_done = job.checkpointed_rows = job.started_rows = row['rows_done']
+        job.success_count = row['success_count']
+        job.failed_count = row['failed_count']
+        job.state = json.loads(row['state'] or '{}')
+        return job
+
+    @property
+    def source(self) -> TableSource:
+        """Import metodlariga beriladigan fayl"""
+        if self.data is not None:
+            return TableBuffer(self.file_name, self.data)
+        return self.file_path
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def check_cancelled(self):
+        """Har bir bo'lakdan oldin chaqiriladi"""
+        if self.cancelled:
+            raise ImportCancelled(f"Import #{self.id} cancelled")
+
+    def add_failed(self, row_number: int, row: Dict, reason: str):
+        self.failed_count += 1
+        self.errors.append((row_number, row, reason))
+
+    @property
+    def needs_checkpoint(self) -> bool:
+        """Oxirgi checkpoint dan beri IMPORT_CHECKPOINT_ROWS qator ishlandimi"""
+        return self.id is not None and self.rows_done - self.checkpointed_rows >= IMPORT_CHECKPOINT_ROWS
+
+    def progress_text(self) -> str:
+        """Admin uchun progress xabari"""
+        title = "👥 Foydalanuvchilar" if self.kind == JOB_USERS else "📦 Yuklar"
+        elapsed = time.monotonic() - self.started_at
+        processed = self.rows_done - self.started_rows
+        lines = [
+            f"📥 Import #{self.id} - {title}",
+            f"📄 {self.file_name}",
+            "",
+            f"⏳ Ishlandi: {self.rows_done} qator",
+        ]
+        if self.kind == JOB_USERS:
+            lines.append(f"✅ Muvaffaqiyatli: {self.success_count} | ❌ Xatolik: {self.failed_count}")
+        if elapsed >= 1 and processed:
+            lines.append(f"⚡ {processed / elapsed:.0f} qator/s")
+        return "\n".join(lines)
+
+
+def import_cancel_keyboard(job_id: int) -> InlineKeyboardMarkup:
+    """Importni bekor qilish tugmasi"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text="⛔ Bekor qilish",
+                callback_data=f"import_cancel:{job_id}"
+            )
+        ]
+    ])
+
+
+def import_file_path(file_name: str) -> str:
+    """
+    Navbatdagi import uchun fayl yo'li (ish tugaguncha saqlanadi)
+
+    Har bir fayl alohida papkada - asl nomi saqlanadi va nomlar to'qnashmaydi.
+    """
+    directory = os.path.join(IMPORT_FILES_DIR, str(time.time_ns()))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, os.path.basename(file_name))
+
+
+async def receive_import_file(bot: Bot, document: Document) -> TableSource:
+    """
+    Import faylini yuklab olish
+
+    IMPORT_MEMORY_MAX_BYTES gacha bo'lgan fayl xotiraga olinadi (diskka
+    yozilmaydi). Kattasi IMPORT_FILES_DIR ga yoziladi - uzoq davom etadigan
+    import bot qayta ishga tushsa ham checkpoint dan davom etishi uchun.
+    """
+    if document.file_size and document.file_size > IMPORT_MEMORY_MAX_BYTES:
+        file_path = import_file_path(document.file_name)
+        await bot.download(document, destination=file_path)
+        return file_path
+
+    buffer = await bot.download(document, destination=BytesIO())
+    return TableBuffer(document.file_name, buffer.getvalue())
+
+
+class ImportJobManager:
+    """
+    Import ishlari navbati va worker lar
+
+    Bir vaqtda IMPORT_JOB_WORKERS tadan ko'p ish bajarilmaydi - ikkita
+    katta import bazani birga band qilib qo'ymasligi uchun.
+    """
+
+    def __init__(self):
+        self.db = None
+        self.bot: Optional[Bot] = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._jobs: Dict[int, ImportJob] = {}  # Navbatdagi va bajarilayotgan ishlar
+        self._running: set = set()
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self, bot: Bot, db):
+        """Worker larni ishga tushirish va tugamagan ishlarni navbatga qo'yish"""
+        self.bot = bot
+        self.db = db
+
+        for row in await db.get_unfinished_import_jobs():
+            job = ImportJob.from_row(row)
+            if not job.file_path:
+                # Fayl xotirada edi - bot qayta ishga tushganda yo'qoldi
+                await self._finish(job, 'failed', "❌ Bot qayta ishga tushdi - faylni qaytadan yuboring")
+                continue
+            if not os.path.exists(job.file_path):
+                await db.finish_import_job(job, 'failed', "Fayl topilmadi")
+                continue
+            logger.info(f"Resuming import job #{job.id} ({job.kind}) from row {job.rows_done}")
+            self._enqueue(job)
+
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(IMPORT_JOB_WORKERS)]
+
+    async def stop(self):
+        """Bot to'xtaganda - bajarilayotgan ishlar keyingi ishga tushishda davom etadi"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, kind: str, source: TableSource, admin_id: int, options: Optional[Dict] = None) -> int:
+        """
+        Yangi import ishini navbatga qo'yish
+
+        Returns:
+            Ish raqami (import_jobs.id)
+        """
+        job = ImportJob(kind, source, admin_id, options)
+        job.id = await self.db.create_import_job(kind, job.file_path, job.file_name, json.dumps(job.options), admin_id)
+
+        message = await self.bot.send_message(
+            admin_id,
+            f"{job.progress_text()}\n\n🕒 Navbatda...",
+            reply_markup=import_cancel_keyboard(job.id)
+        )
+        job.message_id = message.message_id
+        await self.db.set_import_job_message(job.id, message.message_id)
+
+        self._enqueue(job)
+        return job.id
+
+    async def cancel(self, job_id: int) -> bool:
+        """Navbatdagi yoki bajarilayotgan ishni bekor qilish"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+
+        # Hali boshlanmagan ish darhol yopiladi (worker uni o'tkazib yuboradi)
+        if job_id not in self._running:
+            await self._finish(job, 'cancelled', "⛔ Import bekor qilindi")
+        return True
+
+    def _enqueue(self, job: ImportJob):
+        self._jobs[job.id] = job
+        self._queue.put_nowait(job)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            if job.id not in self._jobs:
+                self._queue.task_done()
+                continue
+
+            self._running.add(job.id)
+            try:
+                await self._run(job)
+            except Exception as e:
+                logger.error(f"Import job #{job.id} error: {e}")
+            finally:
+                self._running.discard(job.id)
+                self._queue.task_done()
+
+    async def _run(self, job: ImportJob):
+        """Bitta ishni bajarish (CancelledError - bot to'xtadi, ish keyin davom etadi)"""
+        report = None
+        progress = None
+        try:
+            job.check_cancelled()
+            await self.db.start_import_job(job.id)
+            job.started_at = time.monotonic()
+            job.started_rows = job.rows_done
+            progress = asyncio.create_task(self._progress_loop(job))
+
+            if job.kind == JOB_USERS:
+                result, report = await self._run_users(job)
+            else:
+                result = await self._run_shipments(job)
+            status = 'done'
+
+        except ImportCancelled:
+            status = 'cancelled'
+            result = f"⛔ Import bekor qilindi ({job.rows_done} qator ishlangan edi)"
+
+        except Exception as e:
+            logger.error(f"Import job #{job.id} failed: {e}")
+            status = 'failed'
+            result = f"❌ Import jarayonida xatolik yuz berdi:\n{str(e)}"
+
+        finally:
+            if progress is not None:
+                progress.cancel()
+
+        await self._finish(job, status, result)
+
+        if job.kind == JOB_USERS and status == 'done':
+            await self._send_user_import_files(job, report)
+
+    async def _finish(self, job: ImportJob, status: str, result: str):
+        """Ishni yopish: holat, fayl va yakuniy xabar"""
+        await self.db.finish_import_job(job, status, result)
+        self._jobs.pop(job.id, None)
+        logger.info(f"Import job #{job.id} {status}: {job.rows_done} rows")
+
+        job.data = None
+        if job.file_path and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+            os.rmdir(os.path.dirname(job.file_path))
+
+        await self._show(job, f"{job.progress_text()}\n\n{result}", reply_markup=None)
+
+    async def _run_users(self, job: ImportJob) -> Tuple[str, Optional[BufferedInputFile]]:
+        from utils.excel import ExcelUserImporter
+
+        importer = ExcelUserImporter(self.db)
+        success_count, failed_count, report = await importer.import_users_from_excel(job.source, job)
+        return (
+            f"✅ Import yakunlandi!\n\n"
+            f"✅ Muvaffaqiyatli: {success_count} ta\n"
+            f"❌ Xatolik: {failed_count} ta"
+        ), report
+
+    async def _run_shipments(self, job: ImportJob) -> str:
+        success, msg = await self.db.import_shipments_from_file(
+            job.source,
+            incremental=job.options.get('incremental', False),
+            remove_missing=job.options.get('remove_missing', False),
+            job=job
+        )
+        if not success:
+            raise RuntimeError(msg)
+        return f"✅ Yuklar bazasi yangilandi!\n{msg}"
+
+    async def _send_user_import_files(self, job: ImportJob, report: Optional[BufferedInputFile]):
+        """Xato qatorlar hisoboti va yangilangan baza nusxasini yuborish"""
+        try:
+            if report is not None:
+                await self.bot.send_document(
+                    job.admin_id,
+                    report,
+                    caption=f"❌ Bu faylda {job.failed_count} ta foydalanuvchi ro'yxati (xatoliklar bilan)"
+                )
+
+            # WAL dagi o'zgarishlarni asosiy faylga o'tkazish
+            await self.db.checkpoint()
+            await self.bot.send_document(
+                job.admin_id,
+                FSInputFile(self.db.db_path),
+                caption="💾 Yangilangan bazaning zaxira nusxasi"
+            )
+            logger.info("Database backup sent successfully")
+        except Exception as e:
+            logger.error(f"Import result send error: {str(e)}")
+
+    async def _progress_loop(self, job: ImportJob):
+        """Progress xabarini IMPORT_PROGRESS_INTERVAL da bir martadan ko'p tahrirlamaslik"""
+        last_text = None
+        while True:
+            await asyncio.sleep(IMPORT_PROGRESS_INTERVAL)
+            text = job.progress_text()
+            if text != last_text:
+                await self._show(job, text, reply_markup=import_cancel_keyboard(job.id))
+                last_text = text
+
+    async def _show(self, job: ImportJob, text: str, reply_markup: Optional[InlineKeyboardMarkup]):
+        """Ish xabarini yangilash (xabar o'chirilgan bo'lsa - yangisi yuboriladi)"""
+        try:
+            if job.message_id:
+                await self.bot.edit_message_text(
+                    text,
+                    chat_id=job.admin_id,
+                    message_id=job.message_id,
+                    reply_markup=reply_markup
+                )
+                return
+        except TelegramRetryAfter as e:
+            logger.warning(f"Import progress flood control: retry after {e.retry_after}s")
+            await asyncio.sleep(e.retry_after)
+            return
+        except TelegramBadRequest as e:
+            if 'message is not modified' in str(e):
+                return
+        except Exception as e:
+            logger.error(f"Import progress edit error: {e}")
+            return
+
+        try:
+            message = await self.bot.send_message(job.admin_id, text, reply_markup=reply_markup)
+            job.message_id = message.message_id
+            await self.db.set_import_job_message(job.id, message.message_id)
+        except Exception as e:
+            logger.error(f"Import progress send error: {e}")
+
+
+# Butun bot uchun bitta navbat (main.py da ishga tushiriladi)
+import_job_manager = ImportJobManager()
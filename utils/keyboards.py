@@ -1,6 +1,8 @@
 """
 Barcha klaviaturalar
 """
+from typing import Optional
+
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from utils.texts import get_text
 
@@ -150,16 +152,16 @@ def verification_inline_keyboard(user_id: int, lang: str = 'uz') -> InlineKeyboa
     ])
 
 
-def user_management_inline_keyboard(user_id: int, lang: str = 'uz') -> InlineKeyboardMarkup:
-    """Foydalanuvchini boshqarish (admin)"""
+def user_management_inline_keyboard(user_id: int, lang: str = 'uz', label: str = '') -> InlineKeyboardMarkup:
+    """Foydalanuvchini boshqarish (admin). label - bir xabarda bir nechta foydalanuvchi bo'lsa"""
     return InlineKeyboardMarkup(inline_keyboard=[
         [
             InlineKeyboardButton(
-                text=get_text(lang, 'edit_user'),
+                text=f"{get_text(lang, 'edit_user')} {label}".strip(),
                 callback_data=f"edit:{user_id}"
             ),
             InlineKeyboardButton(
-                text=get_text(lang, 'delete_user'),
+                text=f"{get_text(lang, 'delete_user')} {label}".strip(),
                 callback_data=f"delete:{user_id}"
             )
         ]
@@ -182,6 +184,32 @@ def broadcast_confirm_inline_keyboard(lang: str = 'uz') -> InlineKeyboardMarkup:
     ])
 
 
+def shipments_pager_inline_keyboard(
+    page: int,
+    first_id: int,
+    last_id: int,
+    has_prev: bool,
+    has_next: bool,
+    generation: int = 0
+) -> Optional[InlineKeyboardMarkup]:
+    """
+    "Mening yuklarim" sahifalari: msp:<p|n>:<kursor id>:<sahifa>:<avlod>
+    
+    Kursor - joriy sahifaning birinchi (oldingi uchun) yoki oxirgi
+    (keyingi uchun) yuk ID si, avlod - kursor olingan yuklar bazasi
+    (get_shipments_generation). callback_data 64 baytdan ancha kichik.
+    """
+    buttons = []
+    if has_prev:
+        buttons.append(InlineKeyboardButton(text="◀", callback_data=f"msp:p:{first_id}:{page - 1}:{generation}"))
+    if has_next:
+        buttons.append(InlineKeyboardButton(text="▶", callback_data=f"msp:n:{last_id}:{page + 1}:{generation}"))
+    
+    if not buttons:
+        return None
+    return InlineKeyboardMarkup(inline_keyboard=[buttons])
+
+
 def feedback_reply_inline_keyboard(user_telegram_id: int, feedback_id: int) -> InlineKeyboardMarkup:
     """Feedback ga javob berish (admin uchun)"""
     return InlineKeyboardMarkup(inline_keyboard=[
@@ -0,0 +1,164 @@
+"""
+Rasmlar yuborish - template lar (pasport, PINFL, Xitoy manzili) file_id keshi va albomlar
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, InlineKeyboardMarkup, InputMediaPhoto, Message
+
+from database.db_manager import DatabaseManager
+from utils.messaging import CAPTION_LIMIT, truncate_text
+
+logger = logging.getLogger(__name__)
+
+
+def file_hash(path: str) -> str:
+    """Fayl tarkibi sha256 (fayl almashtirilganini aniqlash uchun)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class MediaRegistry:
+    """
+    Fayl yo'li -> Telegram file_id
+
+    Birinchi yuborishda fayl yuklanadi, qaytgan file_id media_cache jadvaliga
+    (yo'l + tarkib hash i bilan) yoziladi va keyingi yuborishlarda faqat
+    file_id ketadi. Fayl o'zgarsa (hash boshqa) yoki Telegram file_id ni rad
+    etsa - qayta yuklanadi. Hash faylning mtime/hajmi o'zgargandagina qayta
+    hisoblanadi.
+    """
+
+    def __init__(self, db: Optional[DatabaseManager] = None):
+        self.db = db or DatabaseManager()
+        self._file_ids: Dict[str, Tuple[str, str]] = {}       # path -> (hash, file_id)
+        self._hashes: Dict[str, Tuple[int, int, str]] = {}    # path -> (mtime_ns, size, hash)
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.uploads = 0
+        self.reuses = 0
+
+    def _content_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        cached = self._hashes.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        content_hash = file_hash(path)
+        self._hashes[path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+        return content_hash
+
+    async def _cached_file_id(self, path: str, content_hash: str) -> Optional[str]:
+        cached = self._file_ids.get(path)
+        if cached is None:
+            cached = await self.db.get_media_file(path)
+            if cached is not None:
+                self._file_ids[path] = cached
+        if cached and cached[0] == content_hash:
+            return cached[1]
+        return None
+
+    async def _forget(self, path: str):
+        self._file_ids.pop(path, None)
+        await self.db.delete_media_file(path)
+
+    async def send_photo(self, bot: Bot, chat_id: int, path: str, **kwargs) -> Message:
+        """
+        Rasmni yuborish - file_id bo'lsa u bilan, bo'lmasa yuklab
+
+        Bir vaqtda kelgan birinchi yuborishlar kutib turadi: fayl faqat bir
+        marta yuklanadi.
+        """
+        content_hash = self._content_hash(path)
+
+        file_id = await self._cached_file_id(path, content_hash)
+        if file_id is not None:
+            try:
+                message = await bot.send_photo(chat_id, file_id, **kwargs)
+                self.reuses += 1
+                return message
+            except TelegramBadRequest as e:
+                if 'file' not in str(e).lower():
+                    raise
+                logger.warning(f"Cached file_id for {path} rejected, re-uploading: {e}")
+                await self._forget(path)
+
+        async with self._locks.setdefault(path, asyncio.Lock()):
+            # Boshqa yuborish shu orada yuklab bo'lgan bo'lishi mumkin
+            file_id = await self._cached_file_id(path, content_hash)
+            if file_id is not None:
+                self.reuses += 1
+                return await bot.send_photo(chat_id, file_id, **kwargs)
+
+            message = await bot.send_photo(chat_id, FSInputFile(path), **kwargs)
+            self.uploads += 1
+            file_id = message.photo[-1].file_id
+            self._file_ids[path] = (content_hash, file_id)
+            await self.db.save_media_file(path, content_hash, file_id)
+            logger.info(f"Uploaded {path}, file_id cached")
+            return message
+
+
+# Butun bot uchun bitta
+media_registry = MediaRegistry()
+
+
+async def send_template_photo(bot: Bot, chat_id: int, path: str, **kwargs) -> Message:
+    """Template rasmni yuborish (media_registry orqali)"""
+    return await media_registry.send_photo(bot, chat_id, path, **kwargs)
+
+
+async def send_album(
+    bot: Bot,
+    chat_id: int,
+    file_ids: Sequence[str],
+    text: str,
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+    markup_text: str = "👆"
+) -> Tuple[Message, Message]:
+    """
+    Rasmlar (file_id) va matnni eng kam so'rovda yuborish
+
+    2+ rasm - bitta sendMediaGroup, matn birinchi rasm caption ida. Albomga
+    klaviatura qo'yib bo'lmaydi: reply_markup bo'lsa, albomga javob sifatida
+    markup_text li qisqa xabar yuboriladi. 1 rasm - caption va klaviatura
+    bilan bitta sendPhoto, rasmsiz - bitta sendMessage.
+
+    Returns:
+        (albom / asosiy xabar, klaviaturali xabar) - ko'pincha bir xil xabar
+    """
+    file_ids = list(dict.fromkeys(file_id for file_id in file_ids if file_id))[:10]
+
+    if len(file_ids) >= 2:
+        caption = truncate_text(text, CAPTION_LIMIT)
+        messages = await bot.send_media_group(chat_id, [
+            InputMediaPhoto(media=file_id, caption=caption if index == 0 else None)
+            for index, file_id in enumerate(file_ids)
+        ])
+        album = messages[0]
+        if reply_markup is None:
+            return album, album
+        keyboard_message = await bot.send_message(
+            chat_id,
+            markup_text,
+            reply_markup=reply_markup,
+            reply_to_message_id=album.message_id
+        )
+        return album, keyboard_message
+
+    if file_ids:
+        message = await bot.send_photo(
+            chat_id,
+            file_ids[0],
+            caption=truncate_text(text, CAPTION_LIMIT),
+            reply_markup=reply_markup
+        )
+    else:
+        message = await bot.send_message(chat_id, text, reply_markup=reply_markup)
+    return message, message
@@ -0,0 +1,164 @@
+"""
+Ro'yxat ko'rinishidagi javoblar - ko'p kartani (yuk, foydalanuvchi) kam xabarga jamlash
+"""
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_LIMIT = 4096          # Telegram: xabar matni (UTF-16 belgilar)
+CAPTION_LIMIT = 1024          # Telegram: rasm / albom caption
+KEYBOARD_BUTTON_LIMIT = 100   # Telegram: bitta xabardagi inline tugmalar
+CARD_SEPARATOR = "\n\n"
+
+ButtonRows = Sequence[Sequence[InlineKeyboardButton]]
+
+
+def text_length(text: str) -> int:
+    """Telegram hisoblaydigan uzunlik (emoji - 2 ta UTF-16 birlik)"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def truncate_text(text: str, limit: int) -> str:
+    """Matnni limit gacha qisqartirish (oxiriga …)"""
+    if text_length(text) <= limit:
+        return text
+    cut = limit - 1
+    while text_length(text[:cut]) > limit - 1:
+        cut -= 1
+    return text[:cut] + '…'
+
+
+def _split_long_card(card: str, limit: int) -> List[str]:
+    """Chegaradan uzun yagona kartani qatorlar bo'yicha bo'lish"""
+    parts, current = [], ''
+    for line in card.split('\n'):
+        # Bitta qatorning o'zi uzun bo'lsa - majburan kesiladi
+        while text_length(line) > limit:
+            cut = limit
+            while text_length(line[:cut]) > limit:
+                cut -= 1
+            parts.append(line[:cut])
+            line = line[cut:]
+
+        candidate = f"{current}\n{line}" if current else line
+        if text_length(candidate) > limit:
+            parts.append(current)
+            current = line
+        else:
+            current = candidate
+    if current:
+        parts.append(current)
+    return parts
+
+
+class CardMessageBuilder:
+    """
+    Kartalarni MESSAGE_LIMIT dan oshmaydigan xabarlarga joylash
+
+    Karta hech qachon ikki xabar orasida bo'linmaydi (formatlash ham
+    buzilmaydi) - faqat bitta kartaning o'zi chegaradan uzun bo'lsa,
+    qatorlar bo'yicha bo'linadi. Kartaning inline tugmalari u tushgan
+    xabar klaviaturasiga qo'shiladi.
+
+        builder = CardMessageBuilder(header)
+        for item in results:
+            builder.add(render(item))
+        await builder.send(message)
+    """
+
+    def __init__(self, header: str = '', separator: str = CARD_SEPARATOR, limit: int = MESSAGE_LIMIT):
+        self.separator = separator
+        self.limit = limit
+        self._chunks: List[Tuple[List[str], List[List[InlineKeyboardButton]]]] = []
+        self._length = 0
+        self._buttons = 0
+        if header:
+            self.add(header)
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def add(self, card: str, buttons: Optional[ButtonRows] = None):
+        """Kartani oxirgi xabarga qo'shish (sig'masa - yangi xabar)"""
+        rows = [list(row) for row in buttons or ()]
+        button_count = sum(len(row) for row in rows)
+        length = text_length(card)
+
+        if length > self.limit:
+            *head, card = _split_long_card(card, self.limit)
+            for part in head:
+                self._start_chunk(part, [], 0)
+            self._start_chunk(card, rows, button_count)
+            return
+
+        fits = (
+            self._chunks
+            and self._length + text_length(self.separator) + length <= self.limit
+            and self._buttons + button_count <= KEYBOARD_BUTTON_LIMIT
+        )
+        if fits:
+            cards, chunk_rows = self._chunks[-1]
+            cards.append(card)
+            chunk_rows.extend(rows)
+            self._length += text_length(self.separator) + length
+            self._buttons += button_count
+        else:
+            self._start_chunk(card, rows, button_count)
+
+    def _start_chunk(self, card: str, rows: List[List[InlineKeyboardButton]], button_count: int):
+        self._chunks.append(([card], rows))
+        self._length = text_length(card)
+        self._buttons = button_count
+
+    def build(self) -> List[Tuple[str, Optional[InlineKeyboardMarkup]]]:
+        """Tayyor xabarlar: [(matn, klaviatura)]"""
+        return [
+            (
+                self.separator.join(cards),
+                InlineKeyboardMarkup(inline_keyboard=rows) if rows else None
+            )
+            for cards, rows in self._chunks
+        ]
+
+    async def send(self, message: Message) -> int:
+        """
+        Xabarlarni shu chatga ketma-ket yuborish
+
+        Tezlik va RetryAfter ni OutboundMiddleware boshqaradi (chat bucket).
+
+        Returns:
+            Yuborilgan xabarlar soni
+        """
+        sent = 0
+        for text, keyboard in self.build():
+            await message.answer(text, reply_markup=keyboard)
+            sent += 1
+        return sent
+
+
+if __name__ == "__main__":
+    # Xabarlar soni: python -m utils.messaging [kartalar]
+    import sys
+
+    from utils.texts import get_text
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 80
+    builder = CardMessageBuilder(get_text('uz', 'my_shipments', count=count))
+    for idx in range(1, count + 1):
+        builder.add(f"📦 #{idx}\n\n" + get_text(
+            'uz', 'shipment_details',
+            name="Kiyim-kechak va aksessuarlar",
+            tracking=f"YT{idx:012d}",
+            package=idx % 7,
+            weight="12.5",
+            quantity=3,
+            flight="CN-TAS-0425"
+        ))
+
+    messages = builder.build()
+    print(f"{count} karta -> {len(messages)} xabar "
+          f"(eng uzuni {max(text_length(text) for text, _ in messages)} belgi), "
+          f"oldin {count + 1} xabar, {count * 0.3:.0f}+ s")
@@ -0,0 +1,112 @@
+"""
+Og'ir (CPU) ishlarni alohida jarayonda bajarish - event loop bloklanmasligi uchun
+"""
+import asyncio
+import logging
+import multiprocessing as mp
+import pickle
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from config import IMPORT_WORKER_PROCESSES, IMPORT_WORKER_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Bot jarayonida aiosqlite thread'lari bor - to'g'ridan-to'g'ri fork xavfli.
+# forkserver: toza server jarayoni import modullarini bir marta yuklaydi,
+# har bir import esa undan tez fork qilinadi (spawn kabi hammasini qayta import qilmaydi)
+if 'forkserver' in mp.get_all_start_methods():
+    _context = mp.get_context('forkserver')
+    _context.set_forkserver_preload(['utils.excel', 'utils.shipment_import'])
+else:
+    _context = mp.get_context('spawn')
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+_ITEM = 'item'
+_DONE = 'done'
+_ERROR = 'error'
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMPORT_WORKER_PROCESSES, mp_context=_context)
+    return _executor
+
+
+def warm_up():
+    """forkserver ni oldindan ishga tushirish - birinchi import kutmasligi uchun"""
+    if _context.get_start_method() == 'forkserver':
+        from multiprocessing import forkserver
+        forkserver.ensure_running()
+
+
+async def run_in_process(fn: Callable, *args) -> Any:
+    """fn(*args) ni process pool da bajarish (fn modul darajasida bo'lishi kerak)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), fn, *args)
+
+
+def shutdown_process_pool():
+    """Pool jarayonlarini to'xtatish (bot to'xtaganda)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _stream_worker(gen_fn: Callable[..., Iterator], args: tuple, out: mp.Queue):
+    """Worker jarayoni: generator natijalarini navbatga yozish"""
+    try:
+        for item in gen_fn(*args):
+            out.put((_ITEM, item))
+        out.put((_DONE, None))
+    except Exception as e:
+        # Navbat pickle ni fon thread'da qiladi - xato yo'qolmasligi uchun oldindan tekshiriladi
+        try:
+            pickle.dumps(e)
+        except Exception:
+            e = RuntimeError(f"{type(e).__name__}: {e}")
+        out.put((_ERROR, e))
+
+
+def _receive(inbox: mp.Queue, process: mp.Process):
+    """Navbatdan keyingi xabarni kutish (thread ichida)"""
+    while True:
+        try:
+            return inbox.get(timeout=0.5)
+        except queue.Empty:
+            if not process.is_alive():
+                raise RuntimeError(f"Worker process exited unexpectedly (code {process.exitcode})")
+
+
+async def stream_in_process(gen_fn: Callable[..., Iterator], *args) -> AsyncIterator:
+    """
+    gen_fn(*args) generatorini alohida jarayonda ishga tushirib, natijalarini
+    event loop ga oqim sifatida berish
+
+    Navbat hajmi cheklangan: iste'molchi sekin bo'lsa, worker kutadi va
+    xotira o'smaydi. Worker dagi xatolik shu yerda qayta ko'tariladi.
+    """
+    inbox = _context.Queue(maxsize=IMPORT_WORKER_QUEUE_SIZE)
+    process = _context.Process(target=_stream_worker, args=(gen_fn, args, inbox), daemon=True)
+    # Birinchi marta forkserver ishga tushadi - loop ni bloklamaslik uchun thread'da
+    await asyncio.to_thread(process.start)
+
+    try:
+        while True:
+            kind, payload = await asyncio.to_thread(_receive, inbox, process)
+            if kind == _ITEM:
+                yield payload
+            elif kind == _DONE:
+                return
+            else:
+                raise payload
+    finally:
+        # Iste'molchi erta to'xtasa yoki xatolik bo'lsa
+        if process.is_alive():
+            process.terminate()
+        await asyncio.to_thread(process.join)
+        inbox.close()
@@ -0,0 +1,115 @@
+"""
+Token bucket - Telegram API chegaralariga moslab so'rovlar tezligini cheklash
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from typing import List, Optional, Tuple
+
+
+class TokenBucket:
+    """
+    rate token/soniya tezlikda to'ladigan, capacity gacha sig'adigan chelak
+
+    acquire() token bo'lmasa kutadi. Kutayotganlar navbat tartibida o'tadi
+    (ichki Lock FIFO), shuning uchun ko'p parallel yuboruvchi ham umumiy
+    tezlikdan oshmaydi. pause() - Telegram RetryAfter qaytarganda hammani
+    shuncha vaqtga to'xtatish.
+
+        bucket = TokenBucket(28)
+        await bucket.acquire()
+        await bot.send_message(...)
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1):
+        """tokens ta token olish (kerak bo'lsa kutib), capacity dan ko'p so'ralmaydi"""
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            await self._wait_for(tokens)
+            self._tokens -= tokens
+
+    async def _wait_for(self, tokens: float):
+        """Pauza tugaguncha va tokens ta token yig'ilguncha kutish"""
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            self._refill(now)
+            if self._tokens >= tokens:
+                return
+            await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Barcha keyingi acquire() larni seconds ga to'xtatish (RetryAfter)"""
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._refill(now)
+        self._tokens = 0
+
+    @property
+    def paused(self) -> bool:
+        return time.monotonic() < self._paused_until
+
+
+class PriorityTokenBucket(TokenBucket):
+    """
+    Kutayotganlar priority bo'yicha o'tadigan TokenBucket
+
+    Kichik priority - oldin, bir xil priority ichida - kelish tartibida.
+    Token bo'sh turgan bo'lsa va hech kim kutmayotgan bo'lsa - darhol
+    beriladi, aks holda navbatga qo'yiladi va bitta releaser task tokenlarni
+    tarqatadi.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        super().__init__(rate, capacity)
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._releaser: Optional[asyncio.Task] = None
+
+    def waiting(self) -> int:
+        """Navbatda kutayotganlar soni"""
+        return sum(1 for *_, future in self._waiters if not future.done())
+
+    async def acquire(self, priority: int = 0):
+        """Bitta token olish - priority navbati bo'yicha"""
+        if not self._waiters and not self.paused:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        if self._releaser is None or self._releaser.done():
+            self._releaser = asyncio.create_task(self._release())
+        await future
+
+    def pause(self, seconds: float):
+        """Yangi so'rovlar ham, navbatdagilar ham seconds ga to'xtaydi (butun bot RetryAfter)"""
+        super().pause(seconds)
+        # Releaser keyingi _wait_for da pauza tugashini kutadi
+
+    async def _release(self):
+        while self._waiters:
+            await self._wait_for(1)
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue  # Kutuvchi bekor qilingan
+            self._tokens -= 1
+            future.set_result(None)
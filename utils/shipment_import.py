@@ -0,0 +1,175 @@
+"""
+Yuklar (shipments) faylini tayyorlash - ustunlar bo'yicha vektorli tozalash
+"""
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.file_reader import MissingColumnsError, TableSource, iter_table_chunks
+
+logger = logging.getLogger(__name__)
+
+# Fayldagi ustun nomlari
+COL_TRACKING = 'Shipment Tracking Code'
+COL_NAME = 'Shipping Name'
+COL_PACKAGE = 'Package Number'
+COL_WEIGHT = 'Weight/KG'
+COL_QUANTITY = 'Quantity'
+COL_FLIGHT = 'Flight'
+COL_CUSTOMER = 'Customer code'
+
+REQUIRED_COLUMNS = [COL_TRACKING, COL_CUSTOMER]
+
+# shipments jadvaliga yoziladigan ustunlar tartibi
+INSERT_COLUMNS = (
+    'tracking_code', 'shipping_name', 'package_number', 'weight',
+    'quantity', 'flight', 'customer_code',
+    'tracking_code_norm', 'customer_code_norm'
+)
+
+
+def _text_column(df: pd.DataFrame, column: str) -> pd.Series:
+    """Matnli ustun: NaN -> '', bo'sh joylar olib tashlanadi"""
+    if column not in df.columns:
+        return pd.Series('', index=df.index, dtype=object)
+
+    values = df[column]
+    # Bo'sh kataklar tufayli butun sonlar float bo'lib o'qiladi: 6 -> '6.0' bo'lmasligi uchun
+    if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+        values = values.astype('Int64')
+    return values.astype(object).where(values.notna(), '').astype(str).str.strip()
+
+
+def _numeric_column(df: pd.DataFrame, column: str) -> Tuple[pd.Series, pd.Series]:
+    """
+    Raqamli ustun: bo'sh katak -> 0
+
+    Returns:
+        (values, bad_mask) - bad_mask raqamga aylanmagan kataklar
+    """
+    if column not in df.columns:
+        return pd.Series(0.0, index=df.index), pd.Series(False, index=df.index)
+
+    raw = df[column]
+    values = pd.to_numeric(raw, errors='coerce')
+    empty = raw.isna() | (raw.astype(str).str.strip() == '')
+    bad = values.isna() & ~empty
+    bad |= ~np.isfinite(values.fillna(0))
+    return values.where(~bad & ~empty, 0.0), bad
+
+
+def prepare_shipment_rows(df: pd.DataFrame) -> Tuple[List[tuple], List[Tuple[int, str]]]:
+    """
+    DataFrame ni shipments qatorlariga aylantirish (iterrows siz)
+
+    Args:
+        df: fayldan o'qilgan jadval yoki uning bo'lagi (fayldagi qator = index + 2)
+
+    Returns:
+        (rows, errors) - rows INSERT_COLUMNS tartibida, errors: [(qator_raqami, sabab)]
+    """
+    tracking = _text_column(df, COL_TRACKING)
+    customer = _text_column(df, COL_CUSTOMER)
+    weight, bad_weight = _numeric_column(df, COL_WEIGHT)
+    quantity, bad_quantity = _numeric_column(df, COL_QUANTITY)
+
+    # Xatolik sabablari (har bir qator uchun birinchisi)
+    reasons = pd.Series('', index=df.index, dtype=object)
+    reasons[bad_quantity] = f"{COL_QUANTITY}: raqam emas"
+    reasons[bad_weight] = f"{COL_WEIGHT}: raqam emas"
+    reasons[tracking == ''] = f"{COL_TRACKING}: bo'sh"
+
+    ok = (reasons == '').to_numpy()
+    row_numbers = np.asarray(df.index, dtype=np.int64) + 2
+
+    errors = list(zip(row_numbers[~ok].tolist(), reasons[~ok].tolist()))
+
+    frame = pd.DataFrame({
+        'tracking_code': tracking,
+        'shipping_name': _text_column(df, COL_NAME),
+        'package_number': _text_column(df, COL_PACKAGE),
+        'weight': weight.astype(float),
+        'quantity': quantity.astype(np.int64),
+        'flight': _text_column(df, COL_FLIGHT),
+        'customer_code': customer,
+        'tracking_code_norm': tracking.str.upper(),
+        'customer_code_norm': customer.str.upper(),
+    })[ok]
+
+    # numpy turlarini sqlite tushunadigan Python turlariga o'tkazish
+    rows = list(zip(*(frame[col].tolist() for col in INSERT_COLUMNS)))
+    return rows, errors
+
+
+def iter_shipment_batches(
+    source: TableSource,
+    chunk_size: int,
+    skip_rows: int = 0
+) -> Iterator[Tuple[int, List[tuple], List[Tuple[int, str]]]]:
+    """
+    Faylni o'qib, tayyor qatorlarni bo'laklab qaytarish (worker jarayonida ishlaydi)
+
+    skip_rows - import davom ettirilganda oldin yozilgan qatorlar
+
+    Yields:
+        (o'qilgan_qatorlar_soni, rows, errors)
+    """
+    for number, chunk in enumerate(iter_table_chunks(source, chunk_size, skip_rows)):
+        if number == 0 and not all(col in chunk.columns for col in REQUIRED_COLUMNS):
+            raise MissingColumnsError(f"Kerakli ustunlar topilmadi: {REQUIRED_COLUMNS}")
+
+        rows, errors = prepare_shipment_rows(chunk)
+        yield len(chunk), rows, errors
+
+
+class ShipmentImportStats:
+    """
+    Oqimli import hisoblagichlari
+
+    Xato qatorlardan faqat birinchi ERROR_SAMPLE_SIZE tasi saqlanadi -
+    xotira fayl hajmiga bog'liq bo'lmasligi uchun.
+    """
+
+    ERROR_SAMPLE_SIZE = 10
+
+    __slots__ = ('read_count', 'row_count', 'error_count', 'errors')
+
+    def __init__(self):
+        self.read_count = 0
+        self.row_count = 0
+        self.error_count = 0
+        self.errors: List[Tuple[int, str]] = []
+
+    def add(self, chunk_size: int, rows: List[tuple], errors: List[Tuple[int, str]]):
+        """Bitta bo'lak natijasini qo'shish"""
+        self.read_count += chunk_size
+        self.row_count += len(rows)
+        self.error_count += len(errors)
+
+        room = self.ERROR_SAMPLE_SIZE - len(self.errors)
+        if room > 0:
+            self.errors.extend(errors[:room])
+
+    def to_state(self) -> Dict:
+        """Import checkpoint i uchun (JSON)"""
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def restore(self, state: Optional[Dict]):
+        """Checkpoint dan tiklash (import davom ettirilganda)"""
+        if not state:
+            return
+        self.read_count = state['read_count']
+        self.row_count = state['row_count']
+        self.error_count = state['error_count']
+        self.errors = [tuple(error) for error in state['errors']]
+
+
+def format_import_errors(errors: List[Tuple[int, str]], limit: int = 10, total: Optional[int] = None) -> str:
+    """Xato qatorlarni admin uchun qisqa matnga aylantirish"""
+    total = len(errors) if total is None else total
+    lines = [f"• {row}-qator: {reason}" for row, reason in errors[:limit]]
+    if total > limit:
+        lines.append(f"• ... yana {total - limit} ta")
+    return "\n".join(lines)
@@ -190,6 +190,8 @@ TEXTS = {
         'shipment_found': "✅ Yuk topildi!",
         'shipment_not_found': "❌ Trek kod topilmadi: {code}",
         'my_shipments': "📦 Mening yuklarim ({count} ta):",
+        'my_shipments_summary': "⚖️ Jami vazn: {weight} kg\n📄 Sahifa: {page}/{pages}",
+        'my_shipments_expired': "Ro'yxat eskirgan, qaytadan oching",
         'no_shipments': "📭 Sizda hali yuklar yo'q",
         'shipment_details': (
             "📦 {name}\n"
@@ -245,6 +247,14 @@ TEXTS = {
         'broadcast_completed': "✅ Xabar {sent}/{total} ta foydalanuvchiga yuborildi!",
         'enter_user_search': "🔍 Mijoz kodini yoki telefon raqamini kiriting:",
         'user_not_found': "❌ Foydalanuvchi topilmadi",
+        'upload_file_prompt': (
+            "📂 Yuklar faylini yuboring (.xlsx, .xls, .csv)\n\n"
+            "Fayl izohi (caption):\n"
+            "• bo'sh - bazani to'liq almashtirish\n"
+            "• diff - faqat yangi va o'zgargan yuklarni yozish\n"
+            "• diff del - faylda yo'q yuklarni ham o'chirish"
+        ),
+        'import_queued': "📥 Fayl import navbatiga qo'yildi. Jarayon alohida xabarda ko'rsatiladi.",
         
         # ==================== XATOLAR ====================
         'error_general': "❌ Xatolik yuz berdi. Iltimos, qaytadan urinib ko'ring.",
@@ -477,6 +487,8 @@ TEXTS = {
         'shipment_found': "✅ Груз найден!",
         'shipment_not_found': "❌ Трек-код не найден: {code}",
         'my_shipments': "📦 Мои грузы ({count} шт):",
+        'my_shipments_summary': "⚖️ Общий вес: {weight} кг\n📄 Страница: {page}/{pages}",
+        'my_shipments_expired': "Список устарел, откройте заново",
         'no_shipments': "📭 У вас пока нет грузов",
         'shipment_details': (
             "📦 {name}\n"
@@ -532,6 +544,14 @@ TEXTS = {
         'broadcast_completed': "✅ Сообщение отправлено {sent}/{total} пользователям!",
         'enter_user_search': "🔍 Введите код клиента или номер телефона:",
         'user_not_found': "❌ Пользователь не найден",
+        'upload_file_prompt': (
+            "📂 Отправьте файл с грузами (.xlsx, .xls, .csv)\n\n"
+            "Подпись к файлу (caption):\n"
+            "• пусто - полностью заменить базу\n"
+            "• diff - записать только новые и изменённые грузы\n"
+            "• diff del - также удалить грузы, которых нет в файле"
+        ),
+        'import_queued': "📥 Файл поставлен в очередь импорта. Ход выполнения показан в отдельном сообщении.",
         
         # Xatolar
         'error_general': "❌ Произошла ошибка. Попробуйте еще раз.",
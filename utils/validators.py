@@ -3,7 +3,11 @@ Validatorlar - Ma'lumotlarni tekshirish
 """
 import re
 from datetime import datetime, timedelta
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Set
+
+import numpy as np
+import pandas as pd
+
 from config import (
     VALID_PASSPORT_PREFIXES, 
     VALID_KARAKALPAK_PREFIX,
@@ -13,7 +17,20 @@ from config import (
 
 
 class Validators:
-    """Ma'lumotlarni tekshirish klassi"""
+    """
+    Ma'lumotlarni tekshirish klassi
+    
+    Telefon, pasport va PINFL qoidalari bitta joyda - BatchValidators da
+    (Excel importi bilan bir xil natija). Bu yerdagi metodlar bitta qiymatni
+    o'sha tekshiruvdan o'tkazib, xatolik kodini foydalanuvchi matniga
+    aylantiradi.
+    """
+    
+    @staticmethod
+    def _check_one(check, value: str) -> Tuple[str, str]:
+        """Bitta qiymatni BatchValidators metodidan o'tkazish: (tozalangan, xatolik_kodi)"""
+        clean, reasons = check(pd.Series([value], dtype=object))
+        return str(clean[0]), reasons[0]
     
     @staticmethod
     def validate_phone(phone: str) -> Tuple[bool, str, str]:
@@ -21,25 +38,17 @@ class Validators:
         Telefon raqamini tekshirish va normalize qilish
         
         Returns:
-            (valid, message, normalized_phone)
+            (valid, message, normalized_phone) - 998901234567
         """
-        # Faqat raqamlarni olish
-        digits = re.sub(r'\D', '', phone)
-        
-        if not digits:
-            return False, "Telefon raqam kiritilmadi", ""
-        
-        # Agar 998 bilan boshlanmasa, qo'shish
-        if not digits.startswith('998'):
-            if len(digits) == 9:
-                digits = '998' + digits
-            else:
-                return False, "Telefon raqam noto'g'ri formatda", ""
-        
-        if len(digits) != 12:
-            return False, "Telefon raqam 12 ta raqamdan iborat bo'lishi kerak", ""
-        
-        return True, "OK", digits
+        normalized, reason = Validators._check_one(BatchValidators.phones, phone)
+        if reason:
+            return False, {
+                'phone_empty': "Telefon raqam kiritilmadi",
+                'phone_format': "Telefon raqam noto'g'ri formatda",
+                'phone_length': "Telefon raqam 12 ta raqamdan iborat bo'lishi kerak",
+            }[reason], ""
+        
+        return True, "OK", normalized
     
     @staticmethod
     def validate_passport_number(passport: str) -> Tuple[bool, str, str]:
@@ -49,37 +58,21 @@ class Validators:
         Returns:
             (valid, message, clean_passport)
         """
-        # Bo'sh joylarni olib tashlash
-        clean = passport.replace(' ', '').replace('-', '').upper()
-        
-        # Format: 2 harf + 7 raqam
-        if len(clean) != 9:
+        clean, reason = Validators._check_one(BatchValidators.passport_series, passport)
+        if reason in ('passport_empty', 'passport_length'):
             return False, (
                 "Pasport raqami 9 ta belgidan iborat bo'lishi kerak!\n"
                 "To'g'ri format: AA1234567"
             ), ""
-        
-        # Harflarni tekshirish
-        letters = clean[:2]
-        
-        # O'zbekiston pasportlari
-        if letters in VALID_PASSPORT_PREFIXES:
-            pass  # Valid
-        # Qoraqalpog'iston pasportlari (K bilan boshlanuvchi)
-        elif letters[0] == VALID_KARAKALPAK_PREFIX and letters[1].isalpha():
-            pass  # Valid
-        else:
+        if reason == 'passport_prefix':
             return False, (
                 f"Pasport raqami noto'g'ri!\n\n"
                 f"Qabul qilinadigan harflar:\n"
                 f"• {', '.join(VALID_PASSPORT_PREFIXES)} (O'zbekiston)\n"
                 f"• K bilan boshlanuvchi (Qoraqalpog'iston)\n\n"
-                f"Siz kiritdingiz: {letters}"
+                f"Siz kiritdingiz: {clean[:2]}"
             ), ""
-        
-        # Raqamlarni tekshirish
-        numbers = clean[2:]
-        if not numbers.isdigit():
+        if reason == 'passport_digits':
             return False, "Pasport raqami oxirgi 7 belgisi raqam bo'lishi kerak", ""
         
         return True, "OK", clean
@@ -197,17 +190,16 @@ class Validators:
         Returns:
             (valid, message, clean_pinfl)
         """
-        digits = re.sub(r'\D', '', pinfl)
-        
-        if len(digits) != 14:
+        digits, reason = Validators._check_one(BatchValidators.pinfls, pinfl)
+        if reason in ('pinfl_empty', 'pinfl_convert', 'pinfl_digits', 'pinfl_length'):
             return False, "PINFL 14 ta raqamdan iborat bo'lishi kerak", ""
-        
-        # Birinchi raqam 3, 4, 5, 6 dan boshlanishi kerak
-        if digits[0] not in VALID_PINFL_FIRST_DIGITS:
+        if reason == 'pinfl_first_digit':
             return False, (
                 f"PINFL birinchi raqami {', '.join(VALID_PINFL_FIRST_DIGITS)} dan biri bo'lishi kerak\n"
                 f"Siz kiritdingiz: {digits[0]}"
             ), ""
+        if reason == 'pinfl_checksum':
+            return False, "PINFL noto'g'ri (nazorat raqami mos kelmadi). Qayta tekshirib kiriting", ""
         
         return True, "OK", digits
     
@@ -243,4 +235,211 @@ class Validators:
         if len(clean) < 10:
             return False, "Manzilni to'liqroq kiriting (kamida 10 ta belgi)", ""
         
-        return True, "OK", clean
\ No newline at end of file
+        return True, "OK", clean
+
+
+# ==================== BATCH (VEKTORLI) TEKSHIRUV ====================
+
+# PINFL nazorat raqami: 13 ta raqamning vaznli yig'indisi % 10
+PINFL_WEIGHTS = np.array([7, 3, 1, 7, 3, 1, 7, 3, 1, 7, 3, 1, 7], dtype=np.int64)
+
+# Xatolik kodlari va ularning matni (import hisobotida ko'rsatiladi)
+REASON_TEXTS = {
+    'code_empty': "code_str bo'sh",
+    'code_duplicate': "code_str faylda takrorlangan",
+    'fullname_empty': "fullname bo'sh",
+    'passport_empty': "Passport series: Passport seriya bo'sh",
+    'passport_length': "Passport series: 9 ta belgi bo'lishi kerak (AA1234567)",
+    'passport_prefix': "Passport series: Seriya harflari noto'g'ri",
+    'passport_digits': "Passport series: Oxirgi 7 ta belgi raqam bo'lishi kerak",
+    'phone_empty': "Telefon: Telefon raqam bo'sh",
+    'phone_format': "Telefon: Noto'g'ri format",
+    'phone_length': "Telefon: 12 ta raqam bo'lishi kerak",
+    'pinfl_empty': "PINFL: PINFL bo'sh",
+    'pinfl_convert': "PINFL: Konvertatsiya xatosi",
+    'pinfl_digits': "PINFL: Faqat raqamlardan iborat bo'lishi kerak",
+    'pinfl_length': "PINFL: 14 ta raqam bo'lishi kerak",
+    'pinfl_first_digit': "PINFL: Birinchi raqami noto'g'ri",
+    'pinfl_checksum': "PINFL: Nazorat raqami noto'g'ri (PINFL haqiqiy emas)",
+    'pinfl_duplicate': "PINFL faylda takrorlangan",
+}
+
+
+class BatchValidators:
+    """
+    Import uchun ustun bo'yicha tekshirish (numpy.strings ufunc lari)
+    
+    Telefon, pasport va PINFL qoidalarining yagona manbasi: Validators
+    (ro'yxatdan o'tish) ham shu metodlarni bitta qator bilan chaqiradi.
+    Har bir metod (tozalangan_qiymatlar, xatolik_kodlari) massivlarini qaytaradi:
+    xatolik kodi '' bo'lsa qator to'g'ri, aks holda REASON_TEXTS kaliti.
+    """
+    
+    @staticmethod
+    def text(values: pd.Series) -> np.ndarray:
+        """Matn massiviga o'tkazish: NaN -> '', 601.0 -> '601' (Excel butun sonlari)"""
+        if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+            values = values.astype('Int64')
+        text = values.astype(object).where(values.notna(), '').to_numpy(dtype=str)
+        return np.strings.strip(text)
+    
+    @staticmethod
+    def remove(values: np.ndarray, *parts: str) -> np.ndarray:
+        """Qism-satrlarni olib tashlash (replace qimmat - faqat uchragan bo'lsa)"""
+        for part in parts:
+            if (np.strings.find(values, part) >= 0).any():
+                values = np.strings.replace(values, part, '')
+        return values
+    
+    @staticmethod
+    def required(values: pd.Series, code: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Bo'sh bo'lmasligi kerak bo'lgan matn"""
+        clean = BatchValidators.text(values)
+        return clean, np.where(clean == '', code, '')
+    
+    @staticmethod
+    def passport_series(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pasport: 2 harf + 7 raqam (AA1234567)
+        
+        Harflar VALID_PASSPORT_PREFIXES dan biri yoki K + harf (Qoraqalpog'iston).
+        """
+        clean = np.strings.upper(BatchValidators.text(values))
+        clean = BatchValidators.remove(clean, '.0', ' ', '-')
+        
+        # U2 ga o'tkazish birinchi 2 ta belgini qoldiradi
+        prefixes = clean.astype('U2')
+        valid_prefix = np.isin(prefixes, VALID_PASSPORT_PREFIXES) | (
+            np.strings.startswith(prefixes, VALID_KARAKALPAK_PREFIX) & np.strings.isalpha(prefixes)
+        )
+        
+        reasons = np.where(np.strings.isdigit(np.strings.slice(clean, 2, None)), '', 'passport_digits').astype(object)
+        reasons[~valid_prefix] = 'passport_prefix'
+        reasons[np.strings.str_len(clean) != 9] = 'passport_length'
+        reasons[clean == ''] = 'passport_empty'
+        return clean, reasons
+    
+    @staticmethod
+    def phones(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Telefon: faqat raqamlar - 998901234567
+        
+        Raqam bo'lmagan hamma belgi olib tashlanadi ('+998 (90) 123.45.67' ham
+        to'g'ri). + faqat ko'rsatishda qo'shiladi (format_phone_display).
+        """
+        clean = BatchValidators.text(values)
+        
+        # Excel da raqam sifatida saqlangan (aralash ustunda float qoladi): 998901234567.0
+        excel_float = np.strings.endswith(clean, '.0')
+        if excel_float.any():
+            clean = np.where(excel_float, np.strings.slice(clean, 0, -2), clean)
+        
+        clean = BatchValidators.remove(clean, ' ', '-', '(', ')', '+', '.')
+        
+        # Qolgan boshqa belgilar (kam uchraydi) - regex faqat shu qatorlarga
+        other = ~np.strings.isdigit(clean) & (clean != '')
+        if other.any():
+            clean = clean.astype(object)
+            clean[other] = pd.Series(clean[other]).str.replace(r'\D', '', regex=True).to_numpy()
+            clean = clean.astype(str)
+        
+        # 9 ta raqam bo'lsa (901234567) - 998 qo'shiladi
+        lengths = np.strings.str_len(clean)
+        short = ~np.strings.startswith(clean, '998') & (lengths == 9)
+        clean = np.where(short, np.strings.add('998', clean), clean)
+        lengths = np.where(short, 12, lengths)
+        
+        reasons = np.where(lengths != 12, 'phone_length', '').astype(object)
+        reasons[~np.strings.startswith(clean, '998')] = 'phone_format'
+        reasons[clean == ''] = 'phone_empty'
+        return clean, reasons
+    
+    @staticmethod
+    def pinfls(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """PINFL: 14 ta raqam, birinchi raqam VALID_PINFL_FIRST_DIGITS da va nazorat raqami"""
+        clean = BatchValidators.text(values).astype(object)
+        reasons = np.full(len(clean), '', dtype=object)
+        
+        # Float ko'rinishida kelgan qiymatlar: '30101990000014.0'
+        dotted = np.strings.find(clean.astype(str), '.') >= 0
+        if dotted.any():
+            numbers = pd.to_numeric(pd.Series(clean[dotted]), errors='coerce').to_numpy()
+            integral = ~np.isnan(numbers) & (numbers % 1 == 0)
+            converted = clean[dotted]
+            converted[integral] = numbers[integral].astype(np.int64).astype(str)
+            clean[dotted] = converted
+            reasons[np.flatnonzero(dotted)[~integral]] = 'pinfl_convert'
+        
+        clean = BatchValidators.remove(clean.astype(str), ' ', '-')
+        
+        ok = reasons == ''
+        reasons[ok & ~np.strings.isdigit(clean)] = 'pinfl_digits'
+        reasons[(reasons == '') & (np.strings.str_len(clean) != 14)] = 'pinfl_length'
+        reasons[(reasons == '') & ~np.isin(clean.astype('U1'), VALID_PINFL_FIRST_DIGITS)] = 'pinfl_first_digit'
+        
+        # Nazorat raqami: (N, 14) raqamlar matritsasi @ vaznlar
+        candidates = np.flatnonzero(reasons == '')
+        if len(candidates):
+            digits = clean[candidates].astype('U14').view(np.uint32).reshape(-1, 14).astype(np.int64) - ord('0')
+            checksum_ok = (digits[:, :13] @ PINFL_WEIGHTS) % 10 == digits[:, 13]
+            reasons[candidates[~checksum_ok]] = 'pinfl_checksum'
+        
+        reasons[(clean == '') | (np.strings.lower(clean) == 'nan')] = 'pinfl_empty'
+        return clean, reasons
+    
+    @staticmethod
+    def duplicates(values: np.ndarray, mask: np.ndarray, seen: Optional[Set] = None) -> np.ndarray:
+        """
+        Oldingi (to'g'ri) qatorda uchragan qiymatlarni belgilash
+        
+        seen - oldingi bo'laklarda ko'rilgan qiymatlar (fayl bo'laklab o'qilganda)
+        """
+        positions = np.flatnonzero(mask)
+        candidates = pd.Series(values[positions])
+        repeated = candidates.duplicated(keep='first').to_numpy()
+        if seen:
+            repeated = repeated | candidates.isin(seen).to_numpy()
+        if seen is not None:
+            seen.update(candidates[~repeated].tolist())
+        
+        result = np.zeros(len(values), dtype=bool)
+        result[positions[repeated]] = True
+        return result
+    
+    @staticmethod
+    def first_reason(*reasons: np.ndarray) -> np.ndarray:
+        """Har bir qator uchun birinchi xatolik kodi (tekshiruv tartibida)"""
+        result = reasons[0]
+        for other in reasons[1:]:
+            result = np.where(result != '', result, other)
+        return result.astype(object)
+
+
+if __name__ == "__main__":
+    # Tezlikni o'lchash: python -m utils.validators
+    import time
+
+    count = 100_000
+    rng = np.random.default_rng(0)
+    bases = rng.integers(3 * 10**12, 7 * 10**12, count).astype(str)
+    checks = [str(int(np.dot([int(d) for d in base], PINFL_WEIGHTS)) % 10) for base in bases]
+
+    df = pd.DataFrame({
+        'code_str': [f"AKB{600 + i}" for i in range(count)],
+        'passport_series': ['AA1234567'] * count,
+        'phone_number': [f"+998 90 {i % 10_000_000:07d}" for i in range(count)],
+        'passport_pinfl': [base + check for base, check in zip(bases, checks)],
+    })
+    df.loc[::97, 'passport_pinfl'] = '30101990000010'
+
+    started = time.perf_counter()
+    codes, code_reasons = BatchValidators.required(df['code_str'], 'code_empty')
+    _, passport_reasons = BatchValidators.passport_series(df['passport_series'])
+    _, phone_reasons = BatchValidators.phones(df['phone_number'])
+    pinfls, pinfl_reasons = BatchValidators.pinfls(df['passport_pinfl'])
+    reasons = BatchValidators.first_reason(code_reasons, passport_reasons, phone_reasons, pinfl_reasons)
+    reasons[BatchValidators.duplicates(pinfls, reasons == '')] = 'pinfl_duplicate'
+    elapsed = time.perf_counter() - started
+
+    print(f"{count} qator: {elapsed * 1000:.0f} ms ({count / elapsed:,.0f} qator/s)")
+    print(pd.Series(reasons[reasons != '']).value_counts().to_dict())